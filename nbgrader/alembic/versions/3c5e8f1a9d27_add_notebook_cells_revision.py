@@ -0,0 +1,24 @@
+"""add notebook cells revision
+
+Revision ID: 3c5e8f1a9d27
+Revises: f1d3c8a2b5e9
+Create Date: 2026-10-18 23:41:09.518226
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e8f1a9d27'
+down_revision = 'f1d3c8a2b5e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('notebook', sa.Column('cells_revision', sa.String(32), nullable=True))
+
+
+def downgrade():
+    op.drop_column('notebook', 'cells_revision')
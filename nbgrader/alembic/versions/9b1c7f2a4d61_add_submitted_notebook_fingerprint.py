@@ -0,0 +1,24 @@
+"""add submitted notebook fingerprint
+
+Revision ID: 9b1c7f2a4d61
+Revises: e43177bfe90b
+Create Date: 2026-10-18 09:12:31.482713
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1c7f2a4d61'
+down_revision = 'e43177bfe90b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('submitted_notebook', sa.Column('fingerprint', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('submitted_notebook', 'fingerprint')
@@ -0,0 +1,114 @@
+"""add score rollup table
+
+Revision ID: f1d3c8a2b5e9
+Revises: 9b1c7f2a4d61
+Create Date: 2026-10-18 11:02:47.195334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d3c8a2b5e9'
+down_revision = '9b1c7f2a4d61'
+branch_labels = None
+depends_on = None
+
+
+_GRADE_SCORE = """
+    CASE
+        WHEN grade.manual_score IS NOT NULL
+            THEN grade.manual_score + COALESCE(grade.extra_credit, 0.0)
+        WHEN grade.auto_score IS NOT NULL
+            THEN grade.auto_score + COALESCE(grade.extra_credit, 0.0)
+        ELSE 0.0
+    END
+"""
+
+_ROLLUP_QUERY = """
+    SELECT
+        {key} AS entity_id,
+        SUM({score}) AS score,
+        SUM(CASE WHEN grade_cells.cell_type = 'code' THEN {score} ELSE 0.0 END) AS code_score,
+        SUM(CASE WHEN grade_cells.cell_type = 'markdown' THEN {score} ELSE 0.0 END) AS written_score,
+        {task_score} AS task_score,
+        MAX(CASE WHEN grade.needs_manual_grade THEN 1 ELSE 0 END) AS needs_manual_grade,
+        MAX(CASE WHEN grade_cells.cell_type = 'code' AND grade.auto_score < grade_cells.max_score
+            THEN 1 ELSE 0 END) AS failed_tests
+    FROM grade
+    JOIN submitted_notebook ON submitted_notebook.id = grade.notebook_id
+    JOIN submitted_assignment ON submitted_assignment.id = submitted_notebook.assignment_id
+    LEFT OUTER JOIN grade_cells ON grade_cells.id = grade.cell_id
+    {task_join}
+    GROUP BY {key}
+"""
+
+_TASK_SCORE = "SUM(CASE WHEN task_cells.cell_type = 'markdown' THEN {score} ELSE 0.0 END)"
+_TASK_JOIN = "LEFT OUTER JOIN task_cells ON task_cells.id = grade.cell_id"
+
+_LEVEL_KEYS = (
+    ('notebook', 'submitted_notebook.id'),
+    ('assignment', 'submitted_notebook.assignment_id'),
+    ('student', 'submitted_assignment.student_id'),
+)
+
+
+def _get_or_create_table(*args):
+    ctx = op.get_context()
+    con = op.get_bind()
+    table_exists = ctx.dialect.has_table(con, args[0])
+
+    if not table_exists:
+        table = op.create_table(*args)
+    else:
+        table = sa.sql.table(*args)
+    return table
+
+
+def upgrade():
+    """
+    This migration adds the score rollup table and fills it with the
+    scores computed from the existing grades
+    """
+    score_rollup = _get_or_create_table(
+        'score_rollup',
+        sa.Column('level', sa.String(16), primary_key=True),
+        sa.Column('entity_id', sa.String(128), primary_key=True),
+        sa.Column('score', sa.Float(), nullable=False, default=0.0),
+        sa.Column('code_score', sa.Float(), nullable=False, default=0.0),
+        sa.Column('written_score', sa.Float(), nullable=False, default=0.0),
+        sa.Column('task_score', sa.Float(), nullable=False, default=0.0),
+        sa.Column('needs_manual_grade', sa.Boolean(), nullable=False, default=False),
+        sa.Column('failed_tests', sa.Boolean(), nullable=False, default=False),
+    )
+
+    # the table may already have been created (empty) by the gradebook
+    connection = op.get_bind()
+    connection.execute(sa.text("DELETE FROM score_rollup"))
+
+    # the task cells table only exists if it was created by the gradebook
+    if op.get_context().dialect.has_table(connection, 'task_cells'):
+        task_score = _TASK_SCORE.format(score=_GRADE_SCORE)
+        task_join = _TASK_JOIN
+    else:
+        task_score = '0.0'
+        task_join = ''
+
+    rows = []
+    for level, key in _LEVEL_KEYS:
+        query = _ROLLUP_QUERY.format(
+            key=key, score=_GRADE_SCORE, task_score=task_score, task_join=task_join)
+        for row in connection.execute(sa.text(query)):
+            values = dict(row._mapping)
+            values['level'] = level
+            values['needs_manual_grade'] = bool(values['needs_manual_grade'])
+            values['failed_tests'] = bool(values['failed_tests'])
+            rows.append(values)
+
+    if len(rows) > 0:
+        op.bulk_insert(score_rollup, rows)
+
+
+def downgrade():
+    op.drop_table('score_rollup')
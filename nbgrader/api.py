@@ -2,26 +2,30 @@ from __future__ import division
 
 from . import utils
 
+import os
 import datetime
+import threading
+import contextlib
 import subprocess as sp
 
 from sqlalchemy import (create_engine, ForeignKey, Column, String, Text,
                         DateTime, Interval, Float, Enum, UniqueConstraint,
-                        Boolean, inspect, text)
-from sqlalchemy.orm import (sessionmaker, scoped_session, relationship,
+                        Boolean, inspect, text, event, insert, delete)
+from sqlalchemy.orm import (sessionmaker, scoped_session, relationship, with_polymorphic,
                             column_property, declarative_base)
 from sqlalchemy.orm.exc import NoResultFound, FlushError
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.exc import IntegrityError, StatementError
 from sqlalchemy.sql import and_, or_
-from sqlalchemy import select, func, exists, case, literal_column, union_all
+from sqlalchemy import select, update, func, exists, case, literal_column, union_all, true
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.engine import make_url
 
 from tornado.log import app_log
 
 from uuid import uuid4
 from .dbutil import _temp_alembic_ini
-from typing import List, Any, Optional, Union
+from typing import List, Any, Optional, Union, Dict, Iterator
 from .auth import Authenticator
 
 
@@ -140,6 +144,10 @@ class Notebook(Base):
     #: The json string representation of the kernelspec for this notebook
     kernelspec = Column(String(1024), nullable=True)
 
+    #: A token which changes whenever a cell of this notebook is added,
+    #: modified or removed, so that the cell definitions can be cached
+    cells_revision = Column(String(32), nullable=True, default=new_uuid)
+
     _base_cells = relationship("BaseCell", back_populates="notebook")
 
     #: A collection of grade cells contained within this notebook, represented
@@ -702,6 +710,13 @@ class SubmittedNotebook(Base):
     #: by the :class:`~nbgrader.plugins.LateSubmissionPlugin`.
     late_submission_penalty = Column(Float(0))
 
+    #: (Optional) A JSON object with hashes of everything the autograded
+    #: version of this notebook was produced from (the submitted notebook, the
+    #: source notebook, the test cells, the autograder configuration and the
+    #: other files of the assignment). Used by incremental autograding to skip
+    #: submissions whose inputs did not change.
+    fingerprint = Column(Text(), nullable=True)
+
     def to_dict(self):
         """Convert the submitted notebook object to a JSON-friendly dictionary
         representation. Note that this includes a key for ``student`` which is
@@ -926,6 +941,66 @@ class Course(Base):
     def __repr__(self):
         return "Course<{}>".format(self.id)
 
+class ScoreRollup(Base):
+    """Precomputed scores of a submitted notebook, a submitted assignment or a
+    student, so that the gradebook views do not need to recompute the scores
+    from the individual grades. Entities without any grades do not have a row.
+
+    The table is only in use once it has been built, by
+    :meth:`~nbgrader.api.Gradebook.rebuild_score_rollup` (which also adds a
+    row of level "enabled" marking it as built), or by a gradebook reading
+    it. From then on, the rows are maintained by every
+    :class:`~nbgrader.api.Gradebook` whenever grades are written.
+
+    """
+
+    __tablename__ = "score_rollup"
+
+    #: The kind of entity the scores belong to, one of "notebook" (a submitted
+    #: notebook), "assignment" (a submitted assignment) or "student"
+    level = Column(String(16), primary_key=True)
+
+    #: Unique id of the submitted notebook, submitted assignment or student
+    entity_id = Column(String(128), primary_key=True)
+
+    #: The sum of :attr:`~nbgrader.api.Grade.score` of every grade
+    score = Column(Float(), nullable=False, default=0.0)
+
+    #: The sum of the scores of the grades of code grade cells
+    code_score = Column(Float(), nullable=False, default=0.0)
+
+    #: The sum of the scores of the grades of markdown grade cells
+    written_score = Column(Float(), nullable=False, default=0.0)
+
+    #: The sum of the scores of the grades of task cells
+    task_score = Column(Float(), nullable=False, default=0.0)
+
+    #: Whether any of the grades needs to be manually graded
+    needs_manual_grade = Column(Boolean, nullable=False, default=False)
+
+    #: Whether any of the grades is the result of failed autograder tests
+    failed_tests = Column(Boolean, nullable=False, default=False)
+
+    def to_dict(self):
+        """Convert the score rollup object to a JSON-friendly dictionary
+        representation.
+
+        """
+        return {
+            "level": self.level,
+            "entity_id": self.entity_id,
+            "score": self.score,
+            "code_score": self.code_score,
+            "written_score": self.written_score,
+            "task_score": self.task_score,
+            "needs_manual_grade": self.needs_manual_grade,
+            "failed_tests": self.failed_tests
+        }
+
+    def __repr__(self):
+        return "ScoreRollup<{} {}>".format(self.level, self.entity_id)
+
+
 ## Needs manual grade
 
 SubmittedNotebook.needs_manual_grade = column_property(
@@ -1295,16 +1370,227 @@ SubmittedAssignment.late_submission_penalty = column_property(
 
 
 
+# Score rollups
+
+#: The columns of :class:`~nbgrader.api.ScoreRollup` that hold aggregated values
+SCORE_ROLLUP_FIELDS = (
+    "score", "code_score", "written_score", "task_score",
+    "needs_manual_grade", "failed_tests")
+
+
+#: The level of the row of :class:`~nbgrader.api.ScoreRollup` marking that the
+#: table has been built and must be maintained
+SCORE_ROLLUP_ENABLED = "enabled"
+
+
+def _score_rollup_key(level):
+    if level == "notebook":
+        return SubmittedNotebook.id
+    elif level == "assignment":
+        return SubmittedNotebook.assignment_id
+    elif level == "student":
+        return SubmittedAssignment.student_id
+    raise ValueError("Invalid score rollup level: {}".format(level))
+
+
+def _score_rollup_select(level, entity_ids=None):
+    """Build the query aggregating the grades of each entity of the given
+    level, optionally restricted to some entity ids."""
+    grade_cells = GradeCell.__table__
+    task_cells = TaskCell.__table__
+    key = _score_rollup_key(level)
+    zero = literal_column("0.0")
+
+    query = select(
+        key.label("entity_id"),
+        func.sum(Grade.score).label("score"),
+        func.sum(case((grade_cells.c.cell_type == "code", Grade.score), else_=zero)).label("code_score"),
+        func.sum(case((grade_cells.c.cell_type == "markdown", Grade.score), else_=zero)).label("written_score"),
+        func.sum(case((task_cells.c.cell_type == "markdown", Grade.score), else_=zero)).label("task_score"),
+        func.max(case((Grade.needs_manual_grade, 1), else_=0)).label("needs_manual_grade"),
+        func.max(case((and_(
+            grade_cells.c.cell_type == "code",
+            Grade.auto_score < grade_cells.c.max_score), 1), else_=0)).label("failed_tests")
+    ).select_from(Grade)\
+     .join(SubmittedNotebook, SubmittedNotebook.id == Grade.notebook_id)\
+     .join(SubmittedAssignment, SubmittedAssignment.id == SubmittedNotebook.assignment_id)\
+     .outerjoin(grade_cells, grade_cells.c.id == Grade.cell_id)\
+     .outerjoin(task_cells, task_cells.c.id == Grade.cell_id)\
+     .group_by(key)
+
+    if entity_ids is not None:
+        query = query.where(key.in_(entity_ids))
+
+    return query
+
+
+def _score_rollup_rows(connection, level, entity_ids=None):
+    rows = []
+    for row in connection.execute(_score_rollup_select(level, entity_ids)):
+        values = row._asdict()
+        values["level"] = level
+        values["needs_manual_grade"] = bool(values["needs_manual_grade"])
+        values["failed_tests"] = bool(values["failed_tests"])
+        rows.append(values)
+    return rows
+
+
+def _refresh_score_rollup(connection, level, entity_ids=None):
+    """Recompute the score rollup rows of the given level (all of them if no
+    entity ids are given) and return the number of rows written."""
+    statement = delete(ScoreRollup).where(ScoreRollup.level == level)
+    if entity_ids is not None:
+        statement = statement.where(ScoreRollup.entity_id.in_(entity_ids))
+    connection.execute(statement)
+
+    rows = _score_rollup_rows(connection, level, entity_ids)
+    if len(rows) > 0:
+        connection.execute(insert(ScoreRollup), rows)
+    return len(rows)
+
+
+class _EngineRegistry(object):
+    """A process-wide registry of the SQLAlchemy engines (and thus connection
+    pools) of the gradebooks opened with ``shared_engine=True``, keyed by
+    database URL, which also remembers which databases already had their
+    schema checked.
+
+    The engine of a SQLite database file is recreated whenever the file is
+    deleted or replaced, so that pooled connections never point to a stale
+    file. Forked processes must call :meth:`reset` before using the registry,
+    since they must not share connections with their parent.
+
+    """
+
+    #: The maximum number of engines kept open
+    max_engines = 8
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._engines = {}
+        self._checked = set()
+        self._pid = os.getpid()
+        self.counters = {"engines": 0, "sessions": 0, "schema_checks": 0}
+
+    @staticmethod
+    def _file_identity(db_url: str) -> Any:
+        url = make_url(db_url)
+        if not url.drivername.startswith("sqlite"):
+            return None
+        try:
+            st = os.stat(url.database)
+        except (OSError, TypeError):
+            return False
+        return (st.st_dev, st.st_ino)
+
+    @staticmethod
+    def is_shareable(db_url: str) -> bool:
+        """In-memory SQLite databases only live as long as their connection,
+        so they can not be shared."""
+        url = make_url(db_url)
+        return not (url.drivername.startswith("sqlite") and url.database in (None, "", ":memory:"))
+
+    def get_engine(self, db_url: str) -> Any:
+        """Get the shared engine of a database, and whether the schema of the
+        database still has to be checked."""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+
+            identity = self._file_identity(db_url)
+            entry = self._engines.pop(db_url, None)
+            if entry is not None and entry[1] != identity:
+                entry[0].dispose()
+                self._checked.discard(db_url)
+                entry = None
+            if entry is None:
+                entry = (create_engine(db_url, echo=False, future=True), identity)
+                self.counters["engines"] += 1
+
+            # keep the engines in least recently used order
+            self._engines[db_url] = entry
+            while len(self._engines) > self.max_engines:
+                old_url = next(iter(self._engines))
+                self._engines.pop(old_url)[0].dispose()
+                self._checked.discard(old_url)
+
+            return entry[0], db_url not in self._checked
+
+    def mark_checked(self, db_url: str) -> None:
+        """Remember that the schema of a database was checked, updating the
+        identity of the database file which may just have been created."""
+        with self._lock:
+            entry = self._engines.get(db_url)
+            if entry is not None:
+                self._engines[db_url] = (entry[0], self._file_identity(db_url))
+                self._checked.add(db_url)
+
+    def _reset(self) -> None:
+        for engine, _ in self._engines.values():
+            # the connections belong to the parent process, so they must be
+            # dropped without being closed
+            engine.dispose(close=False)
+        self._engines.clear()
+        self._checked.clear()
+        self._pid = os.getpid()
+        for key in self.counters:
+            self.counters[key] = 0
+
+    def reset(self) -> None:
+        """Forget all the engines, without closing their connections. This
+        must be called by forked processes."""
+        with self._lock:
+            self._reset()
+
+    def dispose(self) -> None:
+        """Close all the engines."""
+        with self._lock:
+            for engine, _ in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+            self._checked.clear()
+
+
+_engine_registry = _EngineRegistry()
+
+
+def gradebook_stats() -> Dict[str, int]:
+    """Get the number of database engines created, of gradebooks opened,
+    and of database schema checks run by this process.
+
+    Returns
+    -------
+    stats:
+        A dictionary with keys ``engines``, ``sessions`` and ``schema_checks``
+
+    """
+    return dict(_engine_registry.counters)
+
+
+def reset_engine_registry() -> None:
+    """Forget the shared database engines of the parent process. This must be
+    called by forked processes before they open any gradebook."""
+    _engine_registry.reset()
+
+
 class Gradebook(object):
     """The gradebook object to interface with the database holding
     nbgrader grades.
 
     """
 
+    #: An optional (reentrant) inter-process lock which, when set, is held
+    #: for the whole lifetime of every gradebook instance. This is used by
+    #: :class:`~nbgrader.converters.BaseConverter` worker processes to
+    #: serialize database access when converting submissions in parallel.
+    process_lock = None
+
     def __init__(self,
                  db_url: str,
                  course_id: str = "default_course",
-                 authenticator: Optional[Authenticator] = None):
+                 authenticator: Optional[Authenticator] = None,
+                 use_score_rollup: bool = False,
+                 shared_engine: bool = False):
         """Initialize the connection to the database.
 
         Parameters
@@ -1317,26 +1603,71 @@ class Gradebook(object):
         authenticator:
             An authenticator instance for communicating with an external
             database.
+        use_score_rollup:
+            Whether :meth:`~nbgrader.api.Gradebook.student_dicts`,
+            :meth:`~nbgrader.api.Gradebook.submission_dicts` and
+            :meth:`~nbgrader.api.Gradebook.notebook_submission_dicts` should
+            read the precomputed scores of the :class:`~nbgrader.api.ScoreRollup`
+            table instead of aggregating the individual grades.
+        shared_engine:
+            Whether to use the engine (and connection pool) shared by all the
+            gradebooks of the process opened with this option, and to only
+            check the schema of the database the first time it is opened. See
+            also :meth:`~nbgrader.api.Gradebook.session`.
 
         """
+        self.use_score_rollup = use_score_rollup
+        self._score_rollup_enabled = None
+        self.shared_engine = shared_engine and _EngineRegistry.is_shareable(db_url)
+        self._lock = self.process_lock
+        if self._lock is not None:
+            self._lock.acquire()
+
+        try:
+            self._connect(db_url, course_id)
+        except BaseException:
+            self._release_lock()
+            raise
+
+        self.authenticator = authenticator
+
+    def _connect(self, db_url: str, course_id: str) -> None:
         # create the connection to the database
-        self.engine = create_engine(db_url, echo=False, future=True)
-        self.db = scoped_session(sessionmaker(autoflush=True, bind=self.engine, future=True))
-
-        # this creates all the tables in the database if they don't already exist
-        db_exists = len(inspect(self.engine).get_table_names()) > 0
-        Base.metadata.create_all(bind=self.engine)
-
-        # set the alembic version if it doesn't exist
-        if not db_exists:
-            alembic_version = get_alembic_version()
-            self.db.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL);"))
-            self.db.execute(text("INSERT INTO alembic_version (version_num) VALUES ('{}');".format(alembic_version)))
-            self.db.commit()
+        if self.shared_engine:
+            self.engine, check_schema = _engine_registry.get_engine(db_url)
+        else:
+            self.engine, check_schema = create_engine(db_url, echo=False, future=True), True
+            _engine_registry.counters["engines"] += 1
+        _engine_registry.counters["sessions"] += 1
+        session_factory = sessionmaker(autoflush=True, bind=self.engine, future=True)
+        event.listen(session_factory, "after_flush", self._update_score_rollup)
+        event.listen(session_factory, "after_flush", self._update_cells_revision)
+        self.db = scoped_session(session_factory)
+
+        if check_schema:
+            _engine_registry.counters["schema_checks"] += 1
+
+            # this creates all the tables in the database if they don't already exist
+            db_exists = len(inspect(self.engine).get_table_names()) > 0
+            Base.metadata.create_all(bind=self.engine)
+
+            # set the alembic version if it doesn't exist
+            if not db_exists:
+                alembic_version = get_alembic_version()
+                self.db.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL);"))
+                self.db.execute(text("INSERT INTO alembic_version (version_num) VALUES ('{}');".format(alembic_version)))
+                self.db.commit()
+
+            if self.shared_engine:
+                _engine_registry.mark_checked(db_url)
 
         self.check_course(course_id=course_id)
         self.course_id = course_id
-        self.authenticator = authenticator
+
+    def _release_lock(self) -> None:
+        if self._lock is not None:
+            lock, self._lock = self._lock, None
+            lock.release()
 
     def __enter__(self) -> 'Gradebook':
         return self
@@ -1353,8 +1684,212 @@ class Gradebook(object):
         are too many open connections to the database.
 
         """
-        self.db.remove()
-        self.engine.dispose()
+        try:
+            self.db.remove()
+            if not self.shared_engine:
+                self.engine.dispose()
+        finally:
+            self._release_lock()
+
+    @classmethod
+    @contextlib.contextmanager
+    def session(cls, db_url: str, course_id: str = "default_course", **kwargs: Any) -> Iterator['Gradebook']:
+        """Open a lightweight gradebook, which uses the database engine shared
+        by the whole process and only checks the schema of the database the
+        first time it is opened, and close it afterwards. This is meant for
+        code that opens the gradebook many times, e.g. once per notebook::
+
+            with Gradebook.session(db_url) as gb:
+                gb.find_assignment("ps1")
+
+        Parameters
+        ----------
+        db_url:
+            The URL to the database
+        course_id:
+            identifier of the course
+        kwargs:
+            Other arguments of :class:`~nbgrader.api.Gradebook`
+
+        """
+        gb = cls(db_url, course_id, shared_engine=True, **kwargs)
+        try:
+            yield gb
+        finally:
+            gb.close()
+
+    def _is_score_rollup_enabled(self, connection) -> bool:
+        """Whether the score rollup has been built (and thus must be
+        maintained); this is only queried once per gradebook."""
+        if self._score_rollup_enabled is None:
+            self._score_rollup_enabled = connection.execute(
+                select(ScoreRollup.level)
+                .where(ScoreRollup.level == SCORE_ROLLUP_ENABLED)
+                .limit(1)).first() is not None
+        return self._score_rollup_enabled
+
+    def _ensure_score_rollup(self) -> None:
+        """Build the score rollup before reading it, if it has not been built
+        yet."""
+        if not self._is_score_rollup_enabled(self.db.connection()):
+            self.rebuild_score_rollup()
+
+    def _update_score_rollup(self, session, flush_context):
+        """Keep the score rollup of everything touched by a flush up to date,
+        within the same transaction, if the score rollup is in use."""
+        notebook_ids = set()
+        assignment_ids = set()
+        student_ids = set()
+        master_notebook_ids = set()
+
+        def collect(obj, get):
+            if isinstance(obj, Grade):
+                notebook_ids.add(get(obj, "notebook_id"))
+            elif isinstance(obj, SubmittedNotebook):
+                notebook_ids.add(get(obj, "id"))
+                assignment_ids.add(get(obj, "assignment_id"))
+            elif isinstance(obj, SubmittedAssignment):
+                assignment_ids.add(get(obj, "id"))
+                student_ids.add(get(obj, "student_id"))
+            elif isinstance(obj, Student):
+                student_ids.add(get(obj, "id"))
+            elif isinstance(obj, (GradeCell, TaskCell)):
+                master_notebook_ids.add(get(obj, "notebook_id"))
+
+        for obj in session.new:
+            collect(obj, getattr)
+        for obj in session.dirty:
+            if session.is_modified(obj, include_collections=False):
+                collect(obj, getattr)
+        # deleted rows can not be loaded anymore, so only look at what is
+        # already known about them
+        for obj in session.deleted:
+            collect(obj, lambda o, name: inspect(o).dict.get(name))
+
+        if not (notebook_ids or assignment_ids or student_ids or master_notebook_ids):
+            return
+
+        connection = session.connection()
+        if not (self.use_score_rollup or self._is_score_rollup_enabled(connection)):
+            return
+
+        master_notebook_ids.discard(None)
+        if master_notebook_ids:
+            notebook_ids.update(connection.scalars(
+                select(SubmittedNotebook.id)
+                .where(SubmittedNotebook.notebook_id.in_(master_notebook_ids))))
+        notebook_ids.discard(None)
+        if notebook_ids:
+            assignment_ids.update(connection.scalars(
+                select(SubmittedNotebook.assignment_id)
+                .where(SubmittedNotebook.id.in_(notebook_ids))))
+        assignment_ids.discard(None)
+        if assignment_ids:
+            student_ids.update(connection.scalars(
+                select(SubmittedAssignment.student_id)
+                .where(SubmittedAssignment.id.in_(assignment_ids))))
+        student_ids.discard(None)
+
+        for level, entity_ids in (
+                ("notebook", notebook_ids),
+                ("assignment", assignment_ids),
+                ("student", student_ids)):
+            if entity_ids:
+                _refresh_score_rollup(connection, level, entity_ids)
+
+    def _update_cells_revision(self, session, flush_context):
+        """Change the cells revision of every notebook whose cells were
+        touched by a flush, within the same transaction."""
+        notebook_ids = set()
+        for obj in session.new:
+            if isinstance(obj, (BaseCell, SourceCell)):
+                notebook_ids.add(obj.notebook_id)
+        for obj in session.dirty:
+            if isinstance(obj, (BaseCell, SourceCell)) and \
+                    session.is_modified(obj, include_collections=False):
+                notebook_ids.add(obj.notebook_id)
+        # deleted rows can not be loaded anymore
+        for obj in session.deleted:
+            if isinstance(obj, (BaseCell, SourceCell)):
+                notebook_ids.add(inspect(obj).dict.get("notebook_id"))
+        notebook_ids.discard(None)
+
+        if notebook_ids:
+            session.connection().execute(
+                update(Notebook)
+                .where(Notebook.id.in_(notebook_ids))
+                .values(cells_revision=new_uuid()))
+
+    def rebuild_score_rollup(self) -> int:
+        """Recompute the whole :class:`~nbgrader.api.ScoreRollup` table from
+        the individual grades, and mark it as built, so that all gradebooks
+        maintain it from then on.
+
+        Returns
+        -------
+        num_rows:
+            The number of score rollup rows that were written
+
+        """
+        try:
+            connection = self.db.connection()
+            num_rows = 0
+            for level in ("notebook", "assignment", "student"):
+                num_rows += _refresh_score_rollup(connection, level)
+            connection.execute(delete(ScoreRollup).where(ScoreRollup.level == SCORE_ROLLUP_ENABLED))
+            connection.execute(insert(ScoreRollup), [{"level": SCORE_ROLLUP_ENABLED, "entity_id": ""}])
+            self.db.commit()
+            self._score_rollup_enabled = True
+        except (IntegrityError, FlushError, StatementError) as e:
+            app_log.exception("Rolling back session due to database error %s" % e)
+            self.db.rollback()
+            raise InvalidEntry(*e.args)
+        return num_rows
+
+    def check_score_rollup(self) -> List[Dict[str, Any]]:
+        """Compare the :class:`~nbgrader.api.ScoreRollup` table with the
+        scores computed from the individual grades.
+
+        Returns
+        -------
+        inconsistencies:
+            A list of dictionaries, one per stale, missing or extraneous
+            score rollup value, with keys ``level``, ``entity_id``, ``field``,
+            ``stored`` and ``expected`` (``stored`` is None for missing rows
+            and ``expected`` is None for rows that should not exist). It is
+            empty if the table has not been built yet.
+
+        """
+        connection = self.db.connection()
+        inconsistencies = []
+        if not self._is_score_rollup_enabled(connection):
+            return inconsistencies
+        for level in ("notebook", "assignment", "student"):
+            expected = {
+                row["entity_id"]: row
+                for row in _score_rollup_rows(connection, level)}
+            stored = {
+                row.entity_id: row.to_dict()
+                for row in self.db.query(ScoreRollup).filter(ScoreRollup.level == level)}
+
+            for entity_id in sorted(set(expected) | set(stored)):
+                for field in SCORE_ROLLUP_FIELDS:
+                    stored_value = stored[entity_id][field] if entity_id in stored else None
+                    expected_value = expected[entity_id][field] if entity_id in expected else None
+                    if isinstance(stored_value, float) and isinstance(expected_value, float):
+                        consistent = abs(stored_value - expected_value) < 1e-9
+                    else:
+                        consistent = stored_value == expected_value
+                    if not consistent:
+                        inconsistencies.append({
+                            "level": level,
+                            "entity_id": entity_id,
+                            "field": field,
+                            "stored": stored_value,
+                            "expected": expected_value
+                        })
+
+        return inconsistencies
 
     def check_course(self, course_id: str = "default_course", **kwargs: dict) -> Course:
         """Set the course id
@@ -1489,6 +2024,63 @@ class Gradebook(object):
 
         return student
 
+    def _find_all(self, column: Any, keys: List[str], chunk_size: int = 500) -> Dict[str, Any]:
+        """Find the rows whose ``column`` is one of ``keys``, by key, querying
+        them in chunks (to stay below the database limit on parameters)."""
+        found = {}
+        keys = list(keys)
+        for i in range(0, len(keys), chunk_size):
+            chunk = keys[i:i + chunk_size]
+            for row in self.db.query(column.class_).filter(column.in_(chunk)):
+                found[getattr(row, column.key)] = row
+        return found
+
+    def update_or_create_students(self, students: Dict[str, dict]) -> List[Student]:
+        """Update existing students, and create the ones that don't exist.
+
+        This is equivalent to calling :meth:`update_or_create_student` for
+        each student, but the existing students are looked up all at once,
+        and the changes are committed in a single transaction: if one of them
+        fails, none is applied. The students are then added to the course
+        with a single call to the authenticator.
+
+        Parameters
+        ----------
+        students:
+            additional keyword arguments for the :class:`~nbgrader.api.Student`
+            objects, by student id
+
+        Returns
+        -------
+        students
+
+        """
+        existing = self._find_all(Student.id, students.keys())
+        result = []
+        try:
+            for student_id, kwargs in students.items():
+                student = existing.get(student_id)
+                if student is None:
+                    student = Student(id=student_id, **kwargs)
+                    self.db.add(student)
+                else:
+                    for attr in kwargs:
+                        setattr(student, attr, kwargs[attr])
+                result.append(student)
+            self.db.commit()
+        except (IntegrityError, FlushError, StatementError) as e:
+            app_log.exception("Rolling back session due to database error %s" % e)
+            self.db.rollback()
+            raise InvalidEntry(*e.args)
+        except Exception:
+            self.db.rollback()
+            raise
+
+        if self.authenticator and students:
+            self.authenticator.add_students_to_course(list(students), self.course_id)
+
+        return result
+
     def remove_student(self, student_id):
         """Deletes an existing student from the gradebook, including any
         submissions the might be associated with that student.
@@ -1613,6 +2205,53 @@ class Gradebook(object):
 
         return assignment
 
+    def update_or_create_assignments(self, assignments: Dict[str, dict]) -> List[Assignment]:
+        """Update existing assignments, and create the ones that don't exist.
+
+        This is equivalent to calling :meth:`update_or_create_assignment` for
+        each assignment, but the existing assignments are looked up all at
+        once, and the changes are committed in a single transaction: if one of
+        them fails, none is applied.
+
+        Parameters
+        ----------
+        assignments:
+            additional keyword arguments for the :class:`~nbgrader.api.Assignment`
+            objects, by assignment name
+
+        Returns
+        -------
+        assignments
+
+        """
+        existing = self._find_all(Assignment.name, assignments.keys())
+        result = []
+        try:
+            for name, kwargs in assignments.items():
+                kwargs = dict(kwargs)
+                if 'duedate' in kwargs:
+                    kwargs['duedate'] = utils.parse_utc(kwargs['duedate'])
+                assignment = existing.get(name)
+                if assignment is None:
+                    if 'course_id' not in kwargs:
+                        kwargs['course_id'] = self.course_id
+                    assignment = Assignment(name=name, **kwargs)
+                    self.db.add(assignment)
+                else:
+                    for attr in kwargs:
+                        setattr(assignment, attr, kwargs[attr])
+                result.append(assignment)
+            self.db.commit()
+        except (IntegrityError, FlushError, StatementError) as e:
+            app_log.exception("Rolling back session due to database error %s" % e)
+            self.db.rollback()
+            raise InvalidEntry(*e.args)
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return result
+
     def remove_assignment(self, name):
         """Deletes an existing assignment from the gradebook, including any
         submissions the might be associated with that assignment.
@@ -1697,6 +2336,33 @@ class Gradebook(object):
 
         return notebook
 
+    def find_notebook_cells_revision(self, name: str, assignment: str) -> Optional[str]:
+        """Find the :attr:`~nbgrader.api.Notebook.cells_revision` of a
+        notebook in an assignment, without loading the notebook.
+
+        Parameters
+        ----------
+        name:
+            the name of the notebook
+        assignment:
+            the name of the assignment
+
+        Returns
+        -------
+        revision
+
+        """
+
+        try:
+            revision = self.db.query(Notebook.cells_revision)\
+                .join(Assignment, Assignment.id == Notebook.assignment_id)\
+                .filter(Notebook.name == name, Assignment.name == assignment)\
+                .one()[0]
+        except NoResultFound:
+            raise MissingEntry("No such notebook: {}/{}".format(assignment, name))
+
+        return revision
+
     def update_or_create_notebook(self, name, assignment, **kwargs):
         """Update an existing notebook, or create it if it doesn't exist.
 
@@ -2218,6 +2884,90 @@ class Gradebook(object):
 
         return source_cell
 
+    # Bulk updates of the cells of a notebook
+
+    def update_or_create_notebook_cells(self,
+                                        notebook: str,
+                                        assignment: str,
+                                        grade_cells: Optional[Dict[str, dict]] = None,
+                                        solution_cells: Optional[Dict[str, dict]] = None,
+                                        task_cells: Optional[Dict[str, dict]] = None,
+                                        source_cells: Optional[Dict[str, dict]] = None
+                                        ) -> Dict[str, int]:
+        """Replace the cells of a notebook of an assignment with new cell
+        definitions.
+
+        The existing cells of the notebook are loaded at once and compared
+        with the new definitions: existing cells are updated, new cells are
+        created and the cells that are not part of the new definitions are
+        deleted, all in a single transaction. This is equivalent to (but much
+        faster than) calling :meth:`update_or_create_grade_cell` and the like
+        for every cell, and then removing the cells that do not exist anymore.
+
+        Parameters
+        ----------
+        notebook:
+            the name of an existing notebook
+        assignment:
+            the name of an existing assignment
+        grade_cells:
+            a dictionary mapping the names of the grade cells to keyword
+            arguments for :class:`~nbgrader.api.GradeCell`, or None to leave
+            the grade cells unchanged
+        solution_cells:
+            the same, for :class:`~nbgrader.api.SolutionCell`
+        task_cells:
+            the same, for :class:`~nbgrader.api.TaskCell`
+        source_cells:
+            the same, for :class:`~nbgrader.api.SourceCell`
+
+        Returns
+        -------
+        counts : dict
+            The number of ``created``, ``updated`` and ``removed`` cells
+
+        """
+        notebook = self.find_notebook(notebook, assignment)
+
+        # one query for the grade, solution and task cells, and one for the
+        # source cells
+        existing = {GradeCell: {}, SolutionCell: {}, TaskCell: {}, SourceCell: {}}
+        cells = self.db.query(with_polymorphic(BaseCell, [GradeCell, SolutionCell, TaskCell]))\
+            .filter(BaseCell.notebook_id == notebook.id)
+        for cell in cells:
+            existing[type(cell)][cell.name] = cell
+        for cell in self.db.query(SourceCell).filter(SourceCell.notebook_id == notebook.id):
+            existing[SourceCell][cell.name] = cell
+
+        counts = {"created": 0, "updated": 0, "removed": 0}
+        for cls, new_cells in [(GradeCell, grade_cells),
+                               (SolutionCell, solution_cells),
+                               (TaskCell, task_cells),
+                               (SourceCell, source_cells)]:
+            if new_cells is None:
+                continue
+            old_cells = existing[cls]
+            for name, kwargs in new_cells.items():
+                if name in old_cells:
+                    for attr in kwargs:
+                        setattr(old_cells[name], attr, kwargs[attr])
+                    counts["updated"] += 1
+                else:
+                    self.db.add(cls(name=name, notebook=notebook, **kwargs))
+                    counts["created"] += 1
+            for name in set(old_cells) - set(new_cells):
+                self.db.delete(old_cells[name])
+                counts["removed"] += 1
+
+        try:
+            self.db.commit()
+        except (IntegrityError, FlushError, StatementError) as e:
+            app_log.exception("Rolling back session due to database error %s" % e)
+            self.db.rollback()
+            raise InvalidEntry(*e.args)
+
+        return counts
+
     # Submissions
 
     def add_submission(self, assignment: str, student: str, **kwargs: dict) -> SubmittedAssignment:
@@ -2693,6 +3443,84 @@ class Gradebook(object):
 
         return comment
 
+    def submission_notebook_grades(self, notebook: str, assignment: str, student: str) -> Dict[str, Any]:
+        """Find the grades and comments of every cell in a student's submitted
+        notebook, along with the scores of the notebook, using a single
+        query. This is equivalent to (but much faster than) calling
+        :meth:`find_grade` and :meth:`find_comment` for every cell, and
+        :meth:`find_submission_notebook`.
+
+        Parameters
+        ----------
+        notebook:
+            the name of a notebook
+        assignment:
+            the name of an assignment
+        student:
+            the unique id of a student
+
+        Returns
+        -------
+        grades : dict
+            A dictionary with the keys ``score``, ``max_score`` and
+            ``late_submission_penalty`` of the notebook, ``grades`` mapping
+            the names of the grade and task cells to dictionaries with their
+            ``score`` and ``max_score``, and ``comments`` mapping the names
+            of the solution and task cells to their comment.
+
+        """
+        grade_cells = GradeCell.__table__
+        task_cells = TaskCell.__table__
+        rows = self.db.query(
+                SubmittedNotebook.late_submission_penalty,
+                BaseCell.name,
+                BaseCell.type,
+                func.coalesce(grade_cells.c.max_score, task_cells.c.max_score),
+                Grade.id,
+                Grade.score,
+                Comment.id,
+                Comment.comment)\
+            .join(Notebook, Notebook.id == SubmittedNotebook.notebook_id)\
+            .join(SubmittedAssignment, SubmittedAssignment.id == SubmittedNotebook.assignment_id)\
+            .join(Assignment, Assignment.id == SubmittedAssignment.assignment_id)\
+            .join(Student, Student.id == SubmittedAssignment.student_id)\
+            .outerjoin(BaseCell.__table__, BaseCell.notebook_id == Notebook.id)\
+            .outerjoin(grade_cells, grade_cells.c.id == BaseCell.id)\
+            .outerjoin(task_cells, task_cells.c.id == BaseCell.id)\
+            .outerjoin(Grade, and_(
+                Grade.cell_id == BaseCell.id,
+                Grade.notebook_id == SubmittedNotebook.id))\
+            .outerjoin(Comment, and_(
+                Comment.cell_id == BaseCell.id,
+                Comment.notebook_id == SubmittedNotebook.id))\
+            .filter(
+                Notebook.name == notebook,
+                Assignment.name == assignment,
+                Student.id == student)\
+            .all()
+
+        if len(rows) == 0:
+            raise MissingEntry("No such submitted notebook: {}/{} for {}".format(
+                assignment, notebook, student))
+
+        result = {
+            "score": 0.0,
+            "max_score": 0.0,
+            "late_submission_penalty": rows[0][0],
+            "grades": {},
+            "comments": {}
+        }
+        for _, name, cell_type, max_score, grade_id, score, comment_id, comment in rows:
+            if cell_type in ("GradeCell", "TaskCell"):
+                result["max_score"] += max_score
+                if grade_id is not None:
+                    result["score"] += score
+                    result["grades"][name] = {"score": score, "max_score": max_score}
+            if comment_id is not None:
+                result["comments"][name] = comment
+
+        return result
+
     def find_comment_by_id(self, comment_id):
         """Find a comment by its unique id.
 
@@ -2714,6 +3542,76 @@ class Gradebook(object):
 
         return comment
 
+    def find_submission_notebook_grades(self, notebook: str, assignment: str, student: str) -> Dict[str, Grade]:
+        """Find all the grades of a notebook in a student's submission for a
+        given assignment, using a single query. This is much faster than
+        calling :meth:`~nbgrader.api.Gradebook.find_grade` for each cell.
+
+        Parameters
+        ----------
+        notebook:
+            the name of a notebook
+        assignment:
+            the name of an assignment
+        student:
+            the unique id of a student
+
+        Returns
+        -------
+        grades
+            A dictionary mapping the names of grade and task cells to their
+            :class:`~nbgrader.api.Grade` objects
+
+        """
+        grades = self.db.query(Grade, BaseCell.name)\
+            .join(BaseCell, BaseCell.id == Grade.cell_id)\
+            .join(SubmittedNotebook, SubmittedNotebook.id == Grade.notebook_id)\
+            .join(Notebook, Notebook.id == SubmittedNotebook.notebook_id)\
+            .join(SubmittedAssignment, SubmittedAssignment.id == SubmittedNotebook.assignment_id)\
+            .join(Assignment, Assignment.id == SubmittedAssignment.assignment_id)\
+            .filter(
+                Notebook.name == notebook,
+                Assignment.name == assignment,
+                SubmittedAssignment.student_id == student)\
+            .all()
+
+        return {name: grade for grade, name in grades}
+
+    def find_submission_notebook_comments(self, notebook: str, assignment: str, student: str) -> Dict[str, Comment]:
+        """Find all the comments of a notebook in a student's submission for a
+        given assignment, using a single query. This is much faster than
+        calling :meth:`~nbgrader.api.Gradebook.find_comment` for each cell.
+
+        Parameters
+        ----------
+        notebook:
+            the name of a notebook
+        assignment:
+            the name of an assignment
+        student:
+            the unique id of a student
+
+        Returns
+        -------
+        comments
+            A dictionary mapping the names of solution and task cells to their
+            :class:`~nbgrader.api.Comment` objects
+
+        """
+        comments = self.db.query(Comment, BaseCell.name)\
+            .join(BaseCell, BaseCell.id == Comment.cell_id)\
+            .join(SubmittedNotebook, SubmittedNotebook.id == Comment.notebook_id)\
+            .join(Notebook, Notebook.id == SubmittedNotebook.notebook_id)\
+            .join(SubmittedAssignment, SubmittedAssignment.id == SubmittedNotebook.assignment_id)\
+            .join(Assignment, Assignment.id == SubmittedAssignment.assignment_id)\
+            .filter(
+                Notebook.name == notebook,
+                Assignment.name == assignment,
+                SubmittedAssignment.student_id == student)\
+            .all()
+
+        return {name: comment for comment, name in comments}
+
     def average_assignment_score(self, assignment_id):
         """Compute the average score for an assignment.
 
@@ -2968,6 +3866,10 @@ class Gradebook(object):
             A list of dictionaries, one per student
 
         """
+        if self.use_score_rollup:
+            self._ensure_score_rollup()
+            return self._student_dicts_from_rollup()
+
         max_scores = self.db.query(
             Assignment.id,
             func.sum(Assignment.max_score).label("max_score")
@@ -3020,6 +3922,10 @@ class Gradebook(object):
             A list of dictionaries, one per submitted assignment
 
         """
+        if self.use_score_rollup:
+            self._ensure_score_rollup()
+            return self._submission_dicts_from_rollup(assignment_id)
+
         # subquery the code scores
         code_scores = self.db.query(
             SubmittedAssignment.id.label("id"),
@@ -3168,6 +4074,10 @@ class Gradebook(object):
             A list of dictionaries, one per submitted notebook
 
         """
+        if self.use_score_rollup:
+            self._ensure_score_rollup()
+            return self._notebook_submission_dicts_from_rollup(notebook_id, assignment_id)
+
         # subquery the code scores
         code_scores = self.db.query(
             SubmittedNotebook.id,
@@ -3321,3 +4231,214 @@ class Gradebook(object):
             "failed_tests", "flagged"
         ]
         return [dict(zip(keys, x)) for x in submissions]
+
+    def grade_dicts(self,
+                    assignments: Optional[List[str]] = None,
+                    students: Optional[List[str]] = None,
+                    batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Generate one dictionary per assignment and student with the overall
+        grade of the student on that assignment (zero if the student did not
+        submit it). The grades of all students are computed with a single
+        aggregate query, whose rows are streamed from the database, so this
+        is suitable for exporting the grades of large courses.
+
+        Parameters
+        ----------
+        assignments:
+            (Optional) the names of the assignments to include, all of them
+            by default
+        students:
+            (Optional) the unique ids of the students to include, all of
+            them by default
+        batch_size:
+            The number of rows fetched from the database at once
+
+        Returns
+        -------
+        grades
+            An iterator of dictionaries with keys ``assignment``, ``duedate``,
+            ``timestamp``, ``student_id``, ``last_name``, ``first_name``,
+            ``email``, ``raw_score``, ``late_submission_penalty``, ``score``
+            and ``max_score``, ordered by assignment and then by student
+
+        """
+        # the maximum scores only depend on the assignment, so they are
+        # computed once per assignment instead of once per row
+        max_scores_query = self.db.query(Assignment.id, Assignment.max_score)
+        if assignments is not None:
+            max_scores_query = max_scores_query.filter(Assignment.name.in_(assignments))
+        max_scores = dict(max_scores_query.all())
+
+        if self.use_score_rollup:
+            self._ensure_score_rollup()
+            scores = select(
+                ScoreRollup.entity_id.label("id"),
+                ScoreRollup.score.label("score")
+            ).where(ScoreRollup.level == "assignment")\
+             .subquery()
+        else:
+            scores = select(
+                SubmittedNotebook.assignment_id.label("id"),
+                func.sum(Grade.score).label("score")
+            ).join(Grade, Grade.notebook_id == SubmittedNotebook.id)\
+             .group_by(SubmittedNotebook.assignment_id)\
+             .subquery()
+
+        penalties = select(
+            SubmittedNotebook.assignment_id.label("id"),
+            func.sum(SubmittedNotebook.late_submission_penalty).label("penalty")
+        ).group_by(SubmittedNotebook.assignment_id)\
+         .subquery()
+
+        query = select(
+            Assignment.id, Assignment.name, Assignment.duedate,
+            SubmittedAssignment.id, SubmittedAssignment.timestamp,
+            Student.id, Student.last_name, Student.first_name, Student.email,
+            func.coalesce(scores.c.score, 0.0),
+            func.coalesce(penalties.c.penalty, 0.0)
+        ).select_from(Assignment)\
+         .join(Student, true())\
+         .outerjoin(SubmittedAssignment, and_(
+             SubmittedAssignment.assignment_id == Assignment.id,
+             SubmittedAssignment.student_id == Student.id))\
+         .outerjoin(scores, scores.c.id == SubmittedAssignment.id)\
+         .outerjoin(penalties, penalties.c.id == SubmittedAssignment.id)\
+         .order_by(
+             Assignment.duedate, Assignment.name,
+             Student.last_name, Student.first_name, Student.id)
+
+        if assignments is not None:
+            query = query.where(Assignment.name.in_(assignments))
+        if students is not None:
+            query = query.where(Student.id.in_(students))
+
+        result = self.db.execute(query, execution_options={"yield_per": batch_size})
+        for row in result:
+            (assignment_id, name, duedate, submission_id, timestamp,
+             student_id, last_name, first_name, email, score, penalty) = row
+
+            grade = {
+                "assignment": name,
+                "duedate": duedate,
+                "timestamp": timestamp,
+                "student_id": student_id,
+                "last_name": last_name,
+                "first_name": first_name,
+                "email": email,
+                "raw_score": 0.0,
+                "late_submission_penalty": 0.0,
+                "score": 0.0,
+                "max_score": max_scores[assignment_id]
+            }
+            if submission_id is not None:
+                grade["raw_score"] = score
+                grade["late_submission_penalty"] = penalty
+                grade["score"] = max(0.0, score - penalty)
+
+            yield grade
+
+    def _student_dicts_from_rollup(self):
+        max_score = self.db.query(
+            func.coalesce(func.sum(Assignment.max_score), 0.0)).scalar()
+
+        students = self.db.query(
+            Student.id, Student.first_name, Student.last_name, Student.email,
+            func.coalesce(ScoreRollup.score, 0.0), Student.lms_user_id
+        ).outerjoin(ScoreRollup, and_(
+            ScoreRollup.level == "student",
+            ScoreRollup.entity_id == Student.id))\
+         .all()
+
+        return [{
+            "id": student_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "score": score,
+            "max_score": max_score,
+            "lms_user_id": lms_user_id
+        } for student_id, first_name, last_name, email, score, lms_user_id in students]
+
+    def _submission_dicts_from_rollup(self, assignment_id):
+        assignment = self.find_assignment(assignment_id)
+        max_scores = {
+            "max_score": assignment.max_score,
+            "max_code_score": assignment.max_code_score,
+            "max_written_score": assignment.max_written_score,
+            "max_task_score": assignment.max_task_score
+        }
+
+        assignments = self.db.query(
+            SubmittedAssignment.id, SubmittedAssignment.timestamp,
+            Student.first_name, Student.last_name, Student.id,
+            ScoreRollup.score, ScoreRollup.code_score,
+            ScoreRollup.written_score, ScoreRollup.task_score,
+            ScoreRollup.needs_manual_grade
+        ).join(Student, Student.id == SubmittedAssignment.student_id)\
+         .join(ScoreRollup, and_(
+             ScoreRollup.level == "assignment",
+             ScoreRollup.entity_id == SubmittedAssignment.id))\
+         .filter(SubmittedAssignment.assignment_id == assignment.id)\
+         .all()
+
+        submissions = []
+        for x in assignments:
+            submission = {
+                "id": x[0],
+                "name": assignment.name,
+                "timestamp": x[1],
+                "first_name": x[2],
+                "last_name": x[3],
+                "student": x[4],
+                "score": x[5],
+                "code_score": x[6],
+                "written_score": x[7],
+                "task_score": x[8],
+                "needs_manual_grade": x[9]
+            }
+            submission.update(max_scores)
+            submissions.append(submission)
+        return submissions
+
+    def _notebook_submission_dicts_from_rollup(self, notebook_id, assignment_id):
+        notebook = self.find_notebook(notebook_id, assignment_id)
+        max_scores = {
+            "max_score": notebook.max_score,
+            "max_code_score": notebook.max_code_score,
+            "max_written_score": notebook.max_written_score,
+            "max_task_score": notebook.max_task_score
+        }
+
+        notebooks = self.db.query(
+            SubmittedNotebook.id, Student.id, Student.first_name, Student.last_name,
+            ScoreRollup.score, ScoreRollup.code_score,
+            ScoreRollup.written_score, ScoreRollup.task_score,
+            ScoreRollup.needs_manual_grade, ScoreRollup.failed_tests,
+            SubmittedNotebook.flagged
+        ).join(SubmittedAssignment, SubmittedAssignment.id == SubmittedNotebook.assignment_id)\
+         .join(Student, Student.id == SubmittedAssignment.student_id)\
+         .join(ScoreRollup, and_(
+             ScoreRollup.level == "notebook",
+             ScoreRollup.entity_id == SubmittedNotebook.id))\
+         .filter(SubmittedNotebook.notebook_id == notebook.id)\
+         .all()
+
+        submissions = []
+        for x in notebooks:
+            submission = {
+                "id": x[0],
+                "name": notebook.name,
+                "student": x[1],
+                "first_name": x[2],
+                "last_name": x[3],
+                "score": x[4],
+                "code_score": x[5],
+                "written_score": x[6],
+                "task_score": x[7],
+                "needs_manual_grade": x[8],
+                "failed_tests": x[9],
+                "flagged": x[10]
+            }
+            submission.update(max_scores)
+            submissions.append(submission)
+        return submissions
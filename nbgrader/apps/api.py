@@ -5,17 +5,34 @@ import os
 import logging
 import warnings
 
+from textwrap import dedent
+
 from traitlets.config import LoggingConfigurable, Config, get_config
-from traitlets import Instance, Enum, Unicode, observe
+from traitlets import Any, Instance, Enum, Unicode, Bool, observe
 
 from ..coursedir import CourseDirectory
 from ..converters import GenerateAssignment, Autograde, GenerateFeedback, GenerateSolution
 from ..exchange import ExchangeFactory, ExchangeError
 from ..api import MissingEntry, Gradebook, Student, SubmittedAssignment
-from ..utils import parse_utc, temp_attrs, capture_log, as_timezone, to_numeric_tz
+from ..utils import parse_utc, temp_attrs, capture_log, as_timezone, to_numeric_tz, full_split, FileCache
 from ..auth import Authenticator
 
 
+# The default directory structure, with one directory per student in the
+# directory of each step of the grading process
+_STUDENT_LAYOUT = ("{nbgrader_step}", "{student_id}", "{assignment_id}")
+
+def _parse_timestamp_file(path):
+    with open(path, 'r') as fh:
+        return parse_utc(fh.read().strip())
+
+
+# Read a timestamp file, or reuse the timestamp parsed the last time it was
+# read if the file did not change since. Raises FileNotFoundError (or
+# NotADirectoryError) if the file does not exist.
+_read_timestamp = FileCache(_parse_timestamp_file)
+
+
 class NbGraderAPI(LoggingConfigurable):
     """A high-level API for using nbgrader."""
 
@@ -40,6 +57,34 @@ class NbGraderAPI(LoggingConfigurable):
         help="Format string for displaying timestamps"
     ).tag(config=True)
 
+    use_score_rollup = Bool(
+        False,
+        help=dedent(
+            """
+            Read the scores of students and submissions from the precomputed
+            score table of the database instead of aggregating the individual
+            grades for each request. This is much faster for large courses. The
+            precomputed scores are built the first time they are read (or with
+            `nbgrader db rebuild-scores`), and are then kept up to date by every
+            command that writes grades; they can be recomputed with
+            `nbgrader db rebuild-scores`.
+            """
+        )
+    ).tag(config=True)
+
+    progress_callback = Any(
+        None,
+        allow_none=True,
+        help=dedent(
+            """
+            An optional function reporting the progress of autograding and of
+            generating or releasing feedback, passed on to the converters and
+            to the exchange (see
+            :attr:`nbgrader.converters.BaseConverter.progress_callback`).
+            """
+        )
+    )
+
     @observe('log_level')
     def _log_level_changed(self, change):
         """Adjust the log level when log_level is set."""
@@ -121,7 +166,9 @@ class NbGraderAPI(LoggingConfigurable):
         :func:`~nbgrader.api.Gradebook.close`.
 
         """
-        return Gradebook(self.coursedir.db_url, self.course_id)
+        return Gradebook(
+            self.coursedir.db_url, self.course_id,
+            use_score_rollup=self.use_score_rollup)
 
     def get_source_assignments(self):
         """Get the names of all assignments in the `source` directory.
@@ -178,6 +225,62 @@ class NbGraderAPI(LoggingConfigurable):
 
         return released
 
+    def _scan_step_directory(self, nbgrader_step, assignment_id, timestamps=False):
+        """Scan the directory of a step of the grading process (e.g.
+        `submitted`) for the students having a directory for an assignment.
+        This takes a single directory listing plus one file system call per
+        student, instead of a glob and several calls per student.
+
+        Arguments
+        ---------
+        nbgrader_step: string
+            The name of the step directory
+        assignment_id: string
+            The name of the assignment. May be * to select for all assignments.
+        timestamps: bool
+            Whether to read the timestamps of the submissions
+
+        Returns
+        -------
+        students: dict or None
+            A dictionary mapping the ids of the students to the timestamps of
+            their submissions (or None if they are not read or do not exist),
+            or None if the course does not use the default directory structure
+
+        """
+        if full_split(self.coursedir.directory_structure) != _STUDENT_LAYOUT:
+            return None
+
+        root = os.path.join(self.coursedir.root, nbgrader_step)
+        try:
+            it = os.scandir(root)
+        except (FileNotFoundError, NotADirectoryError):
+            return {}
+
+        students = {}
+        with it:
+            for entry in it:
+                if not entry.is_dir():
+                    continue
+
+                if assignment_id == "*":
+                    with os.scandir(entry.path) as assignments:
+                        if any(x.is_dir() for x in assignments):
+                            students[entry.name] = None
+                    continue
+
+                path = os.path.join(entry.path, assignment_id)
+                if timestamps:
+                    try:
+                        students[entry.name] = _read_timestamp(os.path.join(path, 'timestamp.txt'))
+                        continue
+                    except (FileNotFoundError, NotADirectoryError):
+                        pass
+                if os.path.isdir(path):
+                    students[entry.name] = None
+
+        return students
+
     def get_submitted_students(self, assignment_id):
         """Get the ids of students that have submitted a given assignment
         (determined by whether or not a submission exists in the `submitted`
@@ -194,28 +297,30 @@ class NbGraderAPI(LoggingConfigurable):
             A set of student ids
 
         """
+        students = self._scan_step_directory(self.coursedir.submitted_directory, assignment_id)
+        if students is not None:
+            return set(students)
+
         # get the names of all student submissions in the `submitted` directory
         filenames = glob.glob(self.coursedir.format_path(
             self.coursedir.submitted_directory,
             student_id='*',
             assignment_id=assignment_id))
 
+        # parse out the student id
+        regex = re.compile(self.coursedir.format_path(
+            self.coursedir.submitted_directory,
+            student_id='(?P<student_id>.*)',
+            assignment_id=".*" if assignment_id == "*" else assignment_id,
+            escape=True))
+
         students = set([])
         for filename in filenames:
             # skip files that aren't directories
             if not os.path.isdir(filename):
                 continue
 
-            # parse out the student id
-            if assignment_id == "*":
-                assignment_id = ".*"
-            regex = self.coursedir.format_path(
-                self.coursedir.submitted_directory,
-                student_id='(?P<student_id>.*)',
-                assignment_id=assignment_id,
-                escape=True)
-
-            matches = re.match(regex, filename)
+            matches = regex.match(filename)
             if matches:
                 students.add(matches.groupdict()['student_id'])
 
@@ -243,12 +348,38 @@ class NbGraderAPI(LoggingConfigurable):
             student_id,
             assignment_id))
 
-        timestamp_pth = os.path.join(assignment_dir, 'timestamp.txt')
-        if os.path.exists(timestamp_pth):
-            with open(timestamp_pth, 'r') as fh:
-                return parse_utc(fh.read().strip())
+        try:
+            return _read_timestamp(os.path.join(assignment_dir, 'timestamp.txt'))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def get_submitted_timestamps(self, assignment_id):
+        """Get the timestamps of all the submissions of a given assignment.
+
+        Arguments
+        ---------
+        assignment_id: string
+            The assignment name
+
+        Returns
+        -------
+        timestamps: dict
+            A dictionary mapping the ids of the students that have submitted
+            the assignment to the timestamps of their submissions (or None if
+            the timestamp does not exist)
+
+        """
+        timestamps = self._scan_step_directory(
+            self.coursedir.submitted_directory, assignment_id, timestamps=True)
+        if timestamps is not None:
+            return timestamps
+
+        return {
+            student_id: self.get_submitted_timestamp(assignment_id, student_id)
+            for student_id in self.get_submitted_students(assignment_id)
+        }
 
-    def get_autograded_students(self, assignment_id):
+    def get_autograded_students(self, assignment_id, submitted=None):
         """Get the ids of students whose submission for a given assignment
         has been autograded. This is determined based on satisfying all of the
         following criteria:
@@ -258,6 +389,14 @@ class NbGraderAPI(LoggingConfigurable):
         3. The timestamp of the autograded submission is the same as the
            timestamp of the original submission (in the `submitted` directory).
 
+        Arguments
+        ---------
+        assignment_id: string
+            The name of the assignment
+        submitted: dict
+            (Optional) The timestamps of the submitted assignments, obtained
+            via self.get_submitted_timestamps().
+
         Returns
         -------
         students: set
@@ -273,19 +412,28 @@ class NbGraderAPI(LoggingConfigurable):
                 .all())
             ag_students = set(ag_timestamps.keys())
 
+        if submitted is None:
+            submitted = self.get_submitted_timestamps(assignment_id)
+        ag_directories = self._scan_step_directory(
+            self.coursedir.autograded_directory, assignment_id)
+
         students = set([])
         for student_id in ag_students:
             # skip files that aren't directories
-            filename = self.coursedir.format_path(
-                self.coursedir.autograded_directory,
-                student_id=student_id,
-                assignment_id=assignment_id)
-            if not os.path.isdir(filename):
-                continue
+            if ag_directories is not None:
+                if student_id not in ag_directories:
+                    continue
+            else:
+                filename = self.coursedir.format_path(
+                    self.coursedir.autograded_directory,
+                    student_id=student_id,
+                    assignment_id=assignment_id)
+                if not os.path.isdir(filename):
+                    continue
 
             # get the timestamps and check whether the submitted timestamp is
             # newer than the autograded timestamp
-            submitted_timestamp = self.get_submitted_timestamp(assignment_id, student_id)
+            submitted_timestamp = submitted.get(student_id)
             autograded_timestamp = ag_timestamps[student_id]
             if submitted_timestamp != autograded_timestamp:
                 continue
@@ -471,7 +619,7 @@ class NbGraderAPI(LoggingConfigurable):
 
         return notebooks
 
-    def get_submission(self, assignment_id, student_id, ungraded=None, students=None):
+    def get_submission(self, assignment_id, student_id, ungraded=None, students=None, submitted=None):
         """Get information about a student's submission of an assignment.
 
         Arguments
@@ -486,6 +634,9 @@ class NbGraderAPI(LoggingConfigurable):
         students: dict
             (Optional) A dictionary of dictionaries, keyed by student id,
             containing information about students.
+        submitted: dict
+            (Optional) The timestamps of the submitted assignments, obtained
+            via self.get_submitted_timestamps().
 
         Returns
         -------
@@ -494,13 +645,18 @@ class NbGraderAPI(LoggingConfigurable):
 
         """
         if ungraded is None:
-            autograded = self.get_autograded_students(assignment_id)
-            ungraded = self.get_submitted_students(assignment_id) - autograded
+            if submitted is None:
+                submitted = self.get_submitted_timestamps(assignment_id)
+            autograded = self.get_autograded_students(assignment_id, submitted=submitted)
+            ungraded = set(submitted) - autograded
         if students is None:
             students = {x['id']: x for x in self.get_students()}
 
         if student_id in ungraded:
-            ts = self.get_submitted_timestamp(assignment_id, student_id)
+            if submitted is not None:
+                ts = submitted.get(student_id)
+            else:
+                ts = self.get_submitted_timestamp(assignment_id, student_id)
             if ts:
                 timestamp = ts.isoformat()
                 display_timestamp = as_timezone(ts, self.timezone).strftime(self.timestamp_format)
@@ -598,7 +754,8 @@ class NbGraderAPI(LoggingConfigurable):
         with self.gradebook as gb:
             db_submissions = gb.submission_dicts(assignment_id)
 
-        ungraded = self.get_submitted_students(assignment_id) - self.get_autograded_students(assignment_id)
+        submitted = self.get_submitted_timestamps(assignment_id)
+        ungraded = set(submitted) - self.get_autograded_students(assignment_id, submitted=submitted)
         students = {x['id']: x for x in self.get_students()}
         submissions = []
         for submission in db_submissions:
@@ -618,7 +775,8 @@ class NbGraderAPI(LoggingConfigurable):
 
         for student_id in ungraded:
             submission = self.get_submission(
-                assignment_id, student_id, ungraded=ungraded, students=students)
+                assignment_id, student_id, ungraded=ungraded, students=students,
+                submitted=submitted)
             submissions.append(submission)
 
         submissions.sort(key=lambda x: x["student"])
@@ -887,6 +1045,17 @@ class NbGraderAPI(LoggingConfigurable):
         self.log.warning(msg)
         return self.generate_assignment(*args, **kwargs)
 
+    def _converter(self, cls):
+        """Create a converter app, which converts the submissions one at a
+        time: forking worker processes (see
+        :attr:`nbgrader.converters.BaseConverter.parallelism`) from a
+        multithreaded process like the formgrader is not safe, and the log of
+        the workers would not be captured."""
+        app = cls(coursedir=self.coursedir, parent=self)
+        app.parallelism = 1
+        app.progress_callback = self.progress_callback
+        return app
+
     def generate_assignment(self, assignment_id, force=True, create=True):
         """Run ``nbgrader generate_assignment`` for a particular assignment.
 
@@ -912,7 +1081,7 @@ class NbGraderAPI(LoggingConfigurable):
 
         """
         with temp_attrs(self.coursedir, assignment_id=assignment_id):
-            app = GenerateAssignment(coursedir=self.coursedir, parent=self)
+            app = self._converter(GenerateAssignment)
             app.force = force
             app.create_assignment = create
             return capture_log(app)
@@ -1036,7 +1205,7 @@ class NbGraderAPI(LoggingConfigurable):
 
         """
         with temp_attrs(self.coursedir, assignment_id=assignment_id, student_id=student_id):
-            app = Autograde(coursedir=self.coursedir, parent=self)
+            app = self._converter(Autograde)
             app.force = force
             app.create_student = create
             return capture_log(app)
@@ -1073,14 +1242,14 @@ class NbGraderAPI(LoggingConfigurable):
             with temp_attrs(self.coursedir,
                             assignment_id=assignment_id,
                             student_id=student_id):
-                app = GenerateFeedback(coursedir=self.coursedir, parent=self)
+                app = self._converter(GenerateFeedback)
                 app.update_config(c)
                 app.force = force
                 return capture_log(app)
         else:
             with temp_attrs(self.coursedir,
                             assignment_id=assignment_id):
-                app = GenerateFeedback(coursedir=self.coursedir, parent=self)
+                app = self._converter(GenerateFeedback)
                 app.update_config(c)
                 app.force = force
                 return capture_log(app)
@@ -1112,6 +1281,7 @@ class NbGraderAPI(LoggingConfigurable):
                     coursedir=self.coursedir,
                     authentictor=self.authenticator,
                     parent=self)
+                app.progress_callback = self.progress_callback
                 return capture_log(app)
         else:
             with temp_attrs(self.coursedir, assignment_id=assignment_id, student_id='*'):
@@ -1119,6 +1289,7 @@ class NbGraderAPI(LoggingConfigurable):
                     coursedir=self.coursedir,
                     authentictor=self.authenticator,
                     parent=self)
+                app.progress_callback = self.progress_callback
                 return capture_log(app)
 
     def fetch_feedback(self, assignment_id, student_id):
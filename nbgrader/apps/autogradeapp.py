@@ -15,6 +15,8 @@ aliases = {
 }
 aliases.update(nbgrader_aliases)
 aliases.update({
+    'jobs': 'BaseConverter.parallelism',
+    'trace-file': 'BaseConverter.trace_file',
 })
 
 flags = {}
@@ -40,6 +42,19 @@ flags.update({
         {'BaseConverter': {'force': True}},
         "Overwrite an assignment/submission if it already exists."
     ),
+    'incremental': (
+        {'Autograde': {'incremental': True}},
+        "Only autograde submissions whose submitted files, source notebooks, "
+        "tests or autograder configuration changed since they were last autograded."
+    ),
+    'profile': (
+        {'BaseConverter': {'profile': True}},
+        "Record how long each phase of autograding takes, and log a summary at the end."
+    ),
+    'explain-skip': (
+        {'Autograde': {'incremental': True, 'explain_skip': True}},
+        "Autograde incrementally, and report why each submission is or is not autograded again."
+    ),
 })
 
 
@@ -84,6 +99,25 @@ class AutogradeApp(NbGrader):
 
             nbgrader autograde "Problem Set 1" --notebook "1*"
 
+        To only re-grade the submissions whose inputs (e.g. the submitted
+        notebooks, or the tests in the source notebooks) changed since they
+        were last graded, and report why each submission was or wasn't graded
+        again:
+
+            nbgrader autograde "Problem Set 1" --incremental --explain-skip
+
+        To grade up to four submissions at the same time, each in its own
+        worker process:
+
+            nbgrader autograde "Problem Set 1" --jobs 4
+
+        To find out where the time goes when autograding, log how long each
+        phase (e.g. starting kernels, executing cells, running each
+        preprocessor) takes, and save a trace of all of them that can be
+        viewed with chrome://tracing or https://ui.perfetto.dev:
+
+            nbgrader autograde "Problem Set 1" --profile --trace-file trace.json
+
         By default, student submissions are re-executed and their output cleared.
         For long running notebooks, it can be useful to disable this with the
         '--no-execute' flag:
@@ -11,8 +11,8 @@ from traitlets import default, Unicode, Bool, List
 from datetime import datetime
 
 from . import NbGrader
-from ..api import Gradebook, MissingEntry, Student, Assignment
-from .. import dbutil
+from ..api import Gradebook, InvalidEntry, MissingEntry, Student, Assignment
+from .. import dbutil, utils
 
 aliases = {
     'log-level': 'Application.log_level',
@@ -155,14 +155,13 @@ class DbGenericImportApp(DbBaseApp):
 
     def db_update_method_name(self):
         """
-        Name of the update method used on the Gradebook for this import app.
+        Name of the update method used on the Gradebook for this import app,
+        which updates (or creates) all the instances of the csv file at once.
 
         Arguments
         ---------
-        instance_id: string
-            Identifies which instance you are updating based on self.primary_key
-        instance: dictionary
-            Contents for the update from the parsed csv rows; unpacked as kwargs
+        instances: dictionary
+            Contents for the update from the parsed csv rows, by instance id
 
         """
         raise NotImplementedError
@@ -181,8 +180,10 @@ class DbGenericImportApp(DbBaseApp):
             This command imports a CSV file into the database. The columns of
             the CSV file must match the names of the columns in the database.
             All columns are optional, except the columns corresponding to the
-            unique identifier of the {}. The keys/column names that are
-            expected are the following:
+            unique identifier of the {}. The whole file is checked before
+            it is imported in a single transaction: if a row is invalid,
+            nothing is imported. The keys/column names that are expected are
+            the following:
 
               - {} (required)
             """.format(self.table_class.__name__, self.primary_key)).strip()
@@ -216,36 +217,76 @@ class DbGenericImportApp(DbBaseApp):
             self.fail("No such file: '%s'", path)
         self.log.info("Importing from: '%s'", path)
 
+        # the whole file is validated before anything is imported
+        instances = self._read_csv(path)
 
         with Gradebook(self.coursedir.db_url, self.course_id, self.authenticator) as gb:
-            with open(path, 'r') as fh:
-                reader = csv.DictReader(fh)
-                reader.fieldnames = self._preprocess_keys(reader.fieldnames)
-                for row in reader:
-                    if self.primary_key not in row:
-                        self.fail("Malformatted CSV file: must contain a column for '%s'" % self.primary_key)
-
-                    # make sure all the keys are actually allowed in the database,
-                    # and that any empty strings are parsed as None
-                    instance = {}
-                    for key, val in row.items():
-                        if key not in self.expected_keys:
-                            continue
-                        if val == '':
-                            instance[key] = None
-                        else:
-                            instance[key] = val
-                    instance_primary_key = instance.pop(self.primary_key)
-
-
-                    self.log.info("Creating/updating %s with %s '%s': %s",
-                                  self.table_class.__name__,
-                                  self.primary_key,
-                                  instance_primary_key,
-                                  instance)
-                    db_update_method = getattr(gb, self.db_update_method_name)
-                    db_update_method(instance_primary_key, **instance)
+            db_update_method = getattr(gb, self.db_update_method_name)
+            try:
+                db_update_method(instances)
+            except InvalidEntry as e:
+                self.fail("Could not import '%s', nothing was imported: %s", path, e)
+
+        self.log.info("Imported %d %s(s)", len(instances), self.table_class.__name__)
 
+    def _read_csv(self, path):
+        """
+        Parse and validate the rows of a csv file, and return the instances
+        to create/update, by primary key.
+        """
+        instances = {}
+        errors = []
+        with open(path, 'r') as fh:
+            reader = csv.DictReader(fh)
+            reader.fieldnames = self._preprocess_keys(reader.fieldnames)
+            if self.primary_key not in reader.fieldnames:
+                self.fail("Malformatted CSV file: must contain a column for '%s'" % self.primary_key)
+
+            for row in reader:
+                # make sure all the keys are actually allowed in the database,
+                # and that any empty strings are parsed as None
+                instance = {}
+                for key, val in row.items():
+                    if key not in self.expected_keys:
+                        continue
+                    if val == '':
+                        instance[key] = None
+                    else:
+                        instance[key] = val
+                instance_primary_key = instance.pop(self.primary_key)
+
+                if instance_primary_key is None:
+                    errors.append("line {}: no {} given".format(reader.line_num, self.primary_key))
+                    continue
+                error = self._validate(instance)
+                if error:
+                    errors.append("line {}: {}".format(reader.line_num, error))
+                    continue
+                if instance_primary_key in instances:
+                    self.log.warning(
+                        "%s with %s '%s' found more than once, the last one is imported",
+                        self.table_class.__name__, self.primary_key, instance_primary_key)
+
+                self.log.debug("Creating/updating %s with %s '%s': %s",
+                               self.table_class.__name__,
+                               self.primary_key,
+                               instance_primary_key,
+                               instance)
+                instances[instance_primary_key] = instance
+
+        if errors:
+            for error in errors:
+                self.log.error("Invalid row in '%s', %s", path, error)
+            self.fail("Could not import '%s', nothing was imported", path)
+
+        return instances
+
+    def _validate(self, instance):
+        """
+        Check the contents of a row, and return an error message if it is
+        not valid.
+        """
+        return None
 
     def _preprocess_keys(self, keys):
         """
@@ -276,7 +317,7 @@ class DbStudentImportApp(DbGenericImportApp):
 
     @property
     def db_update_method_name(self):
-        return "update_or_create_student"
+        return "update_or_create_students"
 
 
 class DbStudentListApp(DbBaseApp):
@@ -400,7 +441,14 @@ class DbAssignmentImportApp(DbGenericImportApp):
 
     @property
     def db_update_method_name(self):
-        return "update_or_create_assignment"
+        return "update_or_create_assignments"
+
+    def _validate(self, instance):
+        try:
+            utils.parse_utc(instance.get('duedate'))
+        except (ValueError, OverflowError):
+            return "invalid duedate '{}'".format(instance['duedate'])
+        return None
 
 class DbAssignmentListApp(DbBaseApp):
 
@@ -517,13 +565,55 @@ class DbUpgradeApp(DbBaseApp):
         dbutil.upgrade(self.coursedir.db_url)
 
 
+class DbRebuildScoresApp(DbBaseApp):
+
+    name = u'nbgrader-db-rebuild-scores'
+    description = u'Recompute the precomputed scores from the individual grades'
+
+    aliases = aliases
+    flags = flags
+
+    def start(self):
+        super(DbRebuildScoresApp, self).start()
+
+        with Gradebook(self.coursedir.db_url, self.course_id, self.authenticator) as gb:
+            num_rows = gb.rebuild_score_rollup()
+        self.log.info("Rebuilt %d precomputed scores", num_rows)
+
+
+class DbCheckScoresApp(DbBaseApp):
+
+    name = u'nbgrader-db-check-scores'
+    description = u'Check that the precomputed scores match the individual grades'
+
+    aliases = aliases
+    flags = flags
+
+    def start(self):
+        super(DbCheckScoresApp, self).start()
+
+        with Gradebook(self.coursedir.db_url, self.course_id, self.authenticator) as gb:
+            inconsistencies = gb.check_score_rollup()
+
+        for x in inconsistencies:
+            self.log.error(
+                "Precomputed %s of %s '%s' is %s, expected %s",
+                x["field"], x["level"], x["entity_id"], x["stored"], x["expected"])
+
+        if len(inconsistencies) > 0:
+            self.fail(
+                "Found %d inconsistent precomputed scores, run `nbgrader db rebuild-scores` to fix them",
+                len(inconsistencies))
+        self.log.info("The precomputed scores are consistent")
+
+
 class DbApp(DbBaseApp):
 
     name = u'nbgrader-db'
     description = u'Perform operations on the nbgrader database'
 
-    subcommands = dict(
-        student=(
+    subcommands = {
+        'student': (
             DbStudentApp,
             dedent(
                 """
@@ -531,7 +621,7 @@ class DbApp(DbBaseApp):
                 """
             ).strip()
         ),
-        assignment=(
+        'assignment': (
             DbAssignmentApp,
             dedent(
                 """
@@ -539,7 +629,7 @@ class DbApp(DbBaseApp):
                 """
             ).strip()
         ),
-        upgrade=(
+        'upgrade': (
             DbUpgradeApp,
             dedent(
                 """
@@ -547,7 +637,23 @@ class DbApp(DbBaseApp):
                 """
             ).strip()
         ),
-    )
+        'rebuild-scores': (
+            DbRebuildScoresApp,
+            dedent(
+                """
+                Recompute the precomputed scores from the individual grades.
+                """
+            ).strip()
+        ),
+        'check-scores': (
+            DbCheckScoresApp,
+            dedent(
+                """
+                Check that the precomputed scores match the individual grades.
+                """
+            ).strip()
+        ),
+    }
 
     @default("classes")
     def _classes_default(self):
@@ -10,6 +10,7 @@ from ..converters import BaseConverter, GenerateFeedback, NbGraderException
 aliases = {}
 aliases.update(nbgrader_aliases)
 aliases.update({
+    'jobs': 'BaseConverter.parallelism',
 })
 
 flags = {}
@@ -23,6 +24,10 @@ flags.update({
         {'BaseConverter': {'force': True}},
         "Overwrite an assignment/submission if it already exists."
     ),
+    'shared-stylesheet': (
+        {'GenerateFeedback': {'shared_stylesheet': True}},
+        "Link the feedback to a single shared stylesheet instead of inlining it."
+    ),
 })
 
 class GenerateFeedbackApp(NbGrader):
@@ -57,6 +62,15 @@ class GenerateFeedbackApp(NbGrader):
 
         To feedback for only the notebooks that start with '1':
             nbgrader generate_feedback "Problem Set 1" --notebook "1*"
+
+        To generate the feedback of up to four submissions at the same time,
+        each in its own worker process:
+            nbgrader generate_feedback "Problem Set 1" --jobs 4
+
+        To write the stylesheets once, to feedback/feedback.css, and link
+        every feedback file to it instead of inlining them (note that
+        `nbgrader release_feedback` only releases the HTML files):
+            nbgrader generate_feedback "Problem Set 1" --shared-stylesheet
         """
 
     @default("classes")
@@ -28,6 +28,14 @@ flags.update({
         {'ExchangeList' : {'remove': True}},
         "Remove an assignment from the exchange."
     ),
+    'rebuild-index': (
+        {'ExchangeList' : {'rebuild_index': True}},
+        "Rescan the inbound (or cache) directory and rewrite its submission index."
+    ),
+    'no-feedback': (
+        {'ExchangeList' : {'check_feedback': False}},
+        "Do not check whether feedback is available for the submitted assignments."
+    ),
     'json': (
         {'ExchangeList' : {'as_json': True}},
         "Print out assignments as json."
@@ -86,6 +94,17 @@ class ListApp(NbGrader):
         `--remove` flag:
 
             nbgrader list --inbound --remove --student=student1
+
+        Listing and collecting submissions is much faster with large courses
+        when the inbound directory has a submission index. To create it, or to
+        repair it if some submissions are missing from the list, run:
+
+            nbgrader list --inbound --rebuild-index
+
+        Checking whether feedback is available for each submission can also be
+        skipped, which makes listing the submissions of large courses faster:
+
+            nbgrader list --inbound --no-feedback
         """
 
     @default("classes")
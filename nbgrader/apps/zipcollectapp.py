@@ -4,10 +4,13 @@ import os
 import sys
 import shutil
 import datetime
+import threading
+import zipfile
 
+from concurrent.futures import ThreadPoolExecutor
 from dateutil.tz import gettz
 from textwrap import dedent
-from traitlets import Bool, Instance, Type, Unicode
+from traitlets import Bool, Dict, Instance, Integer, Type, Unicode
 from traitlets.config.application import catch_config_error, default
 
 from .baseapp import NbGrader
@@ -21,6 +24,8 @@ aliases = {
     'extractor': 'ZipCollectApp.extractor_plugin',
     'collector': 'ZipCollectApp.collector_plugin',
     'zip_ext': 'ExtractorPlugin.zip_ext',
+    'jobs': 'ZipCollectApp.parallelism',
+    'extract-jobs': 'ExtractorPlugin.parallelism',
 }
 flags = {
     'debug': (
@@ -45,6 +50,14 @@ flags = {
         {'ZipCollectApp': {'strict': True}},
         "Skip submitted notebooks with invalid names."
     ),
+    'dry-run': (
+        {'ZipCollectApp': {'dry_run': True}},
+        "Report the files that would be collected without copying them."
+    ),
+    'stream': (
+        {'ExtractorPlugin': {'stream': True}},
+        "Read the submission files directly from the zip archives instead of extracting them."
+    ),
 }
 
 
@@ -105,6 +118,23 @@ class ZipCollectApp(NbGrader):
 
             nbgrader zip_collect --collector=mycollector.MyCustomCollector
 
+        Archives are extracted, and the submission files of the students are
+        copied, in parallel. To change the number of threads used:
+
+            nbgrader zip_collect --jobs=8 --extract-jobs=2 ps1
+
+        Large archives do not need to be extracted: with `--stream`, the
+        submission files are read directly from the zip archives (that do not
+        contain other archives) and only the collected files are written:
+
+            nbgrader zip_collect --stream ps1
+
+        To check which files would be collected (and how many are skipped or
+        replaced by newer submissions) without copying anything to the
+        `submitted_directory`:
+
+            nbgrader zip_collect --dry-run ps1
+
         """
 
     force = Bool(
@@ -185,6 +215,30 @@ class ZipCollectApp(NbGrader):
         )
     ).tag(config=True)
 
+    dry_run = Bool(
+        default_value=False,
+        help=dedent(
+            """
+            Only report the number of files that would be collected, skipped
+            and replaced (per student and in total); no file is copied to the
+            `submitted_directory`. Archives are still extracted.
+            """
+        )
+    ).tag(config=True)
+
+    parallelism = Integer(
+        4,
+        help=dedent(
+            """
+            The number of students whose submission files are copied to the
+            `submitted_directory` at the same time. A value of zero uses one
+            thread per CPU.
+            """
+        )
+    ).tag(config=True)
+
+    streamed_files = Dict().tag(config=False)
+    report = Dict().tag(config=False)
     collector_plugin_inst = Instance(FileNameCollectorPlugin).tag(config=False)
     extractor_plugin_inst = Instance(ExtractorPlugin).tag(config=False)
 
@@ -213,7 +267,8 @@ class ZipCollectApp(NbGrader):
     def _mkdirs_if_missing(self, path):
         if not check_directory(path, write=True, execute=True):
             self.log.warning("Directory not found. Creating: {}".format(path))
-            os.makedirs(path)
+            # students are transferred in parallel, and share parent directories
+            os.makedirs(path, exist_ok=True)
 
     def _clear_existing_files(self, path):
         if not os.listdir(path):
@@ -243,7 +298,7 @@ class ZipCollectApp(NbGrader):
         extracted_path = self._format_collect_path(self.extracted_directory)
         self._mkdirs_if_missing(extracted_path)
         self._clear_existing_files(extracted_path)
-        self.extractor_plugin_inst.extract(archive_path, extracted_path)
+        self.streamed_files = self.extractor_plugin_inst.extract(archive_path, extracted_path) or {}
 
     def process_extracted_files(self):
         """Collect the files in the `extracted_directory` using a given plugin
@@ -258,6 +313,8 @@ class ZipCollectApp(NbGrader):
         for root, _, extracted_files in os.walk(extracted_path):
             for _file in extracted_files:
                 src_files.append(os.path.join(root, _file))
+        # files of the archives that were not extracted
+        src_files.extend(self.streamed_files)
 
         if not src_files:
             self.log.warning(
@@ -266,7 +323,10 @@ class ZipCollectApp(NbGrader):
 
         src_files.sort()
         collected_data = self._collect_files(src_files)
-        self._transfer_files(collected_data)
+        if self.dry_run:
+            self._report(collected_data)
+        else:
+            self._transfer_files(collected_data)
 
     def _collect_files(self, src_files):
         """Collect the files in the `extracted_directory` using a given plugin
@@ -288,6 +348,10 @@ class ZipCollectApp(NbGrader):
                     timestamp: timestamp,
                 }, ...
             }
+
+        Of several submission files with the same `file_id` for a student,
+        the one with the newest timestamp is kept. The number of files
+        collected, skipped and replaced is stored in `report`.
         """
         self.log.info("Start collecting files...")
         released_path = self.coursedir.format_path(
@@ -299,11 +363,16 @@ class ZipCollectApp(NbGrader):
                 "".format(self.coursedir.assignment_id)
             )
 
-        data = dict()
+        # the collected files, by student and submission file, in the order
+        # in which they were first collected
+        index = dict()
+        # the files of a submission usually share their timestamp
+        timestamps = dict()
         invalid_files = 0
         processed_files = 0
+        self.report = dict(collected=0, skipped=0, replaced=0, students={})
         for _file in src_files:
-            self.log.info("Parsing file: {}".format(_file))
+            self.log.debug("Parsing file: {}".format(_file))
             info = self.collector_plugin_inst.collect(_file)
             if not info or info is None:
                 self.log.warning(
@@ -353,62 +422,60 @@ class ZipCollectApp(NbGrader):
                     self.log.warning("Empty timestamp string provided.")
                     timestamp = None
                 try:
-                    timestamp = parse_utc(timestamp)
+                    if timestamp not in timestamps:
+                        timestamps[timestamp] = parse_utc(timestamp)
+                    timestamp = timestamps[timestamp]
                 except ValueError:
                     self.fail(
                         "Invalid timestamp string: {}".format(timestamp))
 
-            student_id = info['student_id']
+            key = (info['student_id'], submission)
+            previous = index.get(key)
 
-            # new student id record
-            if student_id not in data.keys():
-                data[student_id] = dict(
-                    src_files=[_file],
-                    dest_files=[dest_path],
-                    file_ids=[submission],
-                    timestamp=timestamp,
-                )
-
-            # existing student id record, new submission file
-            elif submission not in data[student_id]['file_ids']:
-                data[student_id]['src_files'].append(_file)
-                data[student_id]['dest_files'].append(dest_path)
-                data[student_id]['file_ids'].append(submission)
-                # update timestamp with a newer one if given
-                if timestamp is not None:
-                    old_timestamp = data[student_id]['timestamp']
-                    if old_timestamp is None:
-                        data[student_id]['timestamp'] = timestamp
-                    elif timestamp >= old_timestamp:
-                        data[student_id]['timestamp'] = timestamp
-
-            # existing student id record, duplicate submission file
-            else:
-                ind = data[student_id]['file_ids'].index(submission)
-                old_timestamp = data[student_id]['timestamp']
-                if timestamp is not None and old_timestamp is not None:
-                    # keep if duplicate submission file has a newer timestamp
-                    if timestamp >= old_timestamp:
-                        data[student_id]['src_files'][ind] = _file
-                        data[student_id]['dest_files'][ind] = dest_path
-                        data[student_id]['file_ids'][ind] = submission
-                        data[student_id]['timestamp'] = timestamp
-                        self.log.warning(
-                            "Replacing previously collected submission file "
-                            "with one that has a newer timestamp"
-                        )
-                    else:
-                        self.log.warning(
-                            "Skipped submission file with older timestamp")
-                    invalid_files += 1
+            # new submission file
+            if previous is None:
+                index[key] = dict(src_file=_file, dest_file=dest_path, timestamp=timestamp)
 
+            # duplicate submission file
+            elif timestamp is not None and previous['timestamp'] is not None:
+                # keep if duplicate submission file has a newer timestamp
+                if timestamp >= previous['timestamp']:
+                    index[key] = dict(src_file=_file, dest_file=dest_path, timestamp=timestamp)
+                    self.log.warning(
+                        "Replacing previously collected submission file "
+                        "with one that has a newer timestamp"
+                    )
+                    self._count(info['student_id'], 'replaced')
                 else:
-                    # no way to compare so fail
-                    self.fail(
-                        "Duplicate submission file. No timestamps for comparison")
+                    self.log.warning(
+                        "Skipped submission file with older timestamp")
+                    self._count(info['student_id'], 'skipped')
+                invalid_files += 1
+
+            else:
+                # no way to compare so fail
+                self.fail(
+                    "Duplicate submission file. No timestamps for comparison")
 
             processed_files += 1
 
+        data = dict()
+        for (student_id, submission), collected in index.items():
+            if student_id not in data:
+                data[student_id] = dict(
+                    src_files=[], dest_files=[], file_ids=[], timestamp=None)
+            student = data[student_id]
+            student['src_files'].append(collected['src_file'])
+            student['dest_files'].append(collected['dest_file'])
+            student['file_ids'].append(submission)
+            # the timestamp of the submission is the newest one given
+            timestamp = collected['timestamp']
+            if timestamp is not None and (student['timestamp'] is None or timestamp >= student['timestamp']):
+                student['timestamp'] = timestamp
+            self._count(student_id, 'collected')
+        # files without match information (or invalid names) were skipped too
+        self.report['skipped'] = invalid_files - self.report['replaced']
+
         if invalid_files > 0:
             self.log.warning(
                 "{} files collected, {} files skipped"
@@ -418,6 +485,28 @@ class ZipCollectApp(NbGrader):
             self.log.info("{} files collected".format(processed_files))
         return data
 
+    def _count(self, student_id, key):
+        if student_id not in self.report['students']:
+            self.report['students'][student_id] = dict(collected=0, skipped=0, replaced=0)
+        self.report['students'][student_id][key] += 1
+        self.report[key] += 1
+
+    def _report(self, collected_data):
+        """Log the number of files that would be collected, skipped and
+        replaced, for each student and in total."""
+        self.log.info("Dry run, no file was copied to the submitted directory")
+        for student_id in sorted(self.report['students']):
+            counts = self.report['students'][student_id]
+            timestamp = collected_data.get(student_id, {}).get('timestamp')
+            self.log.info(
+                "{}: {} collected, {} skipped, {} replaced{}".format(
+                    student_id, counts['collected'], counts['skipped'], counts['replaced'],
+                    ", timestamp {}".format(timestamp.isoformat(' ')) if timestamp else ""))
+        self.log.info(
+            "Total: {} files collected for {} students, {} skipped, {} replaced".format(
+                self.report['collected'], len(collected_data),
+                self.report['skipped'], self.report['replaced']))
+
     def _transfer_files(self, collected_data):
         """Transfer collected files to the students `submitted_directory`.
 
@@ -438,31 +527,70 @@ class ZipCollectApp(NbGrader):
             return
 
         self.log.info("Start transfering files...")
-        for student_id, data in collected_data.items():
-            dest_path = self.coursedir.format_path(
-                self.coursedir.submitted_directory, student_id, self.coursedir.assignment_id)
-            self._mkdirs_if_missing(dest_path)
-            self._clear_existing_files(dest_path)
-
-            for i in range(len(data['file_ids'])):
-                src = data['src_files'][i]
-                dest = data['dest_files'][i]
-                self._mkdirs_if_missing(os.path.split(dest)[0])
-                if os.path.exists(dest):
-                    # should never get here, but just in case
-                    self.fail(
-                        "Trying to overwrite existing file: {}".format(dest))
-                self.log.info('Copying from: {}'.format(src))
-                self.log.info('  Copying to: {}'.format(dest))
-                shutil.copy(src, dest)
-
-            dest = os.path.join(dest_path, 'timestamp.txt')
+        self._archives = {}
+        self._archives_lock = threading.Lock()
+        workers = self.parallelism if self.parallelism > 0 else (os.cpu_count() or 1)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(self._transfer_student_files, student_id, data)
+                    for student_id, data in collected_data.items()]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            for archive in self._archives.values():
+                archive.close()
+            self._archives = {}
+
+        self.log.info("Transfered {} files of {} students".format(
+            sum(len(data['file_ids']) for data in collected_data.values()),
+            len(collected_data)))
+
+    def _transfer_student_files(self, student_id, data):
+        dest_path = self.coursedir.format_path(
+            self.coursedir.submitted_directory, student_id, self.coursedir.assignment_id)
+        self._mkdirs_if_missing(dest_path)
+        self._clear_existing_files(dest_path)
+
+        for i in range(len(data['file_ids'])):
+            src = data['src_files'][i]
+            dest = data['dest_files'][i]
+            self._mkdirs_if_missing(os.path.split(dest)[0])
             if os.path.exists(dest):
-                self.log.info('Found collected timestamp file: {}'.format(dest))
-            elif data['timestamp'] is not None:
-                self.log.info('Creating timestamp: {}'.format(dest))
-                with open(dest, 'w') as fh:
-                    fh.write("{}".format(data['timestamp'].isoformat(' ')))
+                # should never get here, but just in case
+                self.fail(
+                    "Trying to overwrite existing file: {}".format(dest))
+            self.log.debug('Copying from: {}'.format(src))
+            self.log.debug('  Copying to: {}'.format(dest))
+            self._copy_file(src, dest)
+
+        dest = os.path.join(dest_path, 'timestamp.txt')
+        if os.path.exists(dest):
+            self.log.info('Found collected timestamp file: {}'.format(dest))
+        elif data['timestamp'] is not None:
+            self.log.debug('Creating timestamp: {}'.format(dest))
+            with open(dest, 'w') as fh:
+                fh.write("{}".format(data['timestamp'].isoformat(' ')))
+
+    def _copy_file(self, src, dest):
+        if src not in self.streamed_files:
+            shutil.copy(src, dest)
+            return
+
+        # read the file from its archive, which is opened once and shared by
+        # all the threads (zip files support reading members concurrently)
+        archive_path, member = self.streamed_files[src]
+        with self._archives_lock:
+            if archive_path not in self._archives:
+                self._archives[archive_path] = zipfile.ZipFile(archive_path)
+            archive = self._archives[archive_path]
+        with archive.open(member) as fsrc, open(dest, 'wb') as fdst:
+            shutil.copyfileobj(fsrc, fdst)
 
     def init_plugins(self):
         self.log.info(
@@ -1,6 +1,6 @@
 from traitlets import Instance, Type
 from traitlets.config import LoggingConfigurable
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 
 class BaseAuthPlugin(LoggingConfigurable):
@@ -36,6 +36,22 @@ class BaseAuthPlugin(LoggingConfigurable):
         """
         raise NotImplementedError
 
+    def add_students_to_course(self, student_ids: List[str], course_id: str) -> None:
+        """Grants several students access to a given course. Plugins that
+        can do it in a single operation (e.g. a single request) should
+        override this method, which adds the students one at a time.
+
+        Arguments
+        ---------
+        student_ids:
+            The unique ids of the students.
+        course_id:
+            The unique id of the course.
+
+        """
+        for student_id in student_ids:
+            self.add_student_to_course(student_id, course_id)
+
     def remove_student_from_course(self, student_id: str, course_id: str) -> None:  # pragma: no cover
         """Removes a student's access to a given course.
 
@@ -134,6 +150,19 @@ class Authenticator(LoggingConfigurable):
         """
         self.plugin.add_student_to_course(student_id, course_id)
 
+    def add_students_to_course(self, student_ids: List[str], course_id: str) -> None:
+        """Grants several students access to a given course.
+
+        Arguments
+        ---------
+        student_ids:
+            The unique ids of the students.
+        course_id:
+            The unique id of the course.
+
+        """
+        self.plugin.add_students_to_course(student_ids, course_id)
+
     def remove_student_from_course(self, student_id: str, course_id: str) -> None:
         """Removes a student's access to a given course.
 
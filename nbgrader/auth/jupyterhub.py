@@ -1,8 +1,23 @@
 import os
+import time
+import threading
 import requests
 
+from textwrap import dedent
+from traitlets import Float
 from .base import BaseAuthPlugin
-from typing import Optional
+from typing import List, Optional
+
+
+# The sessions used for the requests to the Hub API, so that connections to
+# the Hub are reused (authenticators are created for each operation). Each
+# thread has its own session, since sessions are not thread-safe.
+_sessions = threading.local()
+
+# The courses of the students, by Hub API url, authenticated user and student
+# id, with the time at which they were fetched.
+_courses_cache = {}
+_courses_cache_lock = threading.Lock()
 
 
 class JupyterhubEnvironmentError(Exception):
@@ -34,6 +49,19 @@ def get_jupyterhub_authorization() -> dict:
     }
 
 
+def _get_session() -> requests.Session:
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    return session
+
+
+def clear_courses_cache() -> None:
+    """Forget the courses of the students fetched from the Hub API."""
+    with _courses_cache_lock:
+        _courses_cache.clear()
+
+
 def _query_jupyterhub_api(method: str, api_path: str, post_data: Optional[dict] = None) -> dict:
     """Query Jupyterhub api
 
@@ -58,7 +86,7 @@ def _query_jupyterhub_api(method: str, api_path: str, post_data: Optional[dict]
     user = get_jupyterhub_user()
     auth_header = get_jupyterhub_authorization()
     api_path = api_path.format(authenticated_user=user)
-    req = requests.request(
+    req = _get_session().request(
         url=hub_api_url + api_path,
         method=method,
         headers=auth_header,
@@ -72,7 +100,36 @@ def _query_jupyterhub_api(method: str, api_path: str, post_data: Optional[dict]
 
 class JupyterHubAuthPlugin(BaseAuthPlugin):
 
+    courses_cache_ttl = Float(
+        0.0,
+        help=dedent(
+            """
+            The number of seconds for which the courses of a student fetched
+            from the Hub API are reused (e.g. when the assignments of all the
+            courses are listed). The cache is disabled by default (a value of
+            zero). It is only cleared when students are added to or removed
+            from courses by the same process, so that other processes (e.g.
+            the servers of the students) may see outdated courses for up to
+            this long.
+            """
+        )
+    ).tag(config=True)
+
     def get_student_courses(self, student_id: str) -> Optional[list]:
+        key = (get_jupyterhub_api_url(), os.environ.get('JUPYTERHUB_USER'), student_id)
+        if self.courses_cache_ttl > 0:
+            with _courses_cache_lock:
+                cached = _courses_cache.get(key)
+            if cached is not None and time.monotonic() - cached[0] < self.courses_cache_ttl:
+                return list(cached[1])
+
+        courses = self._get_student_courses(student_id)
+        if self.courses_cache_ttl > 0:
+            with _courses_cache_lock:
+                _courses_cache[key] = (time.monotonic(), courses)
+        return list(courses)
+
+    def _get_student_courses(self, student_id: str) -> list:
         if student_id == "*":
             student_id = "{authenticated_user}"
         response = None
@@ -94,14 +151,39 @@ class JupyterHubAuthPlugin(BaseAuthPlugin):
         return list(courses)
 
     def add_student_to_course(self, student_id: str, course_id: str) -> None:
+        self.add_students_to_course([student_id], course_id)
+
+    def _log_add_error(self, students: str, group_name: str, e: Exception) -> None:
+        # We assume user might be using Jupyterhub but something is not working
+        err_msg = "Student {student} NOT added to the Jupyterhub group {group_name}: ".format(
+            student=students,
+            group_name=group_name
+        )
+        self.log.error(err_msg + str(e))
+        self.log.error("Make sure you set a valid admin_user 'api_token' in your config file before starting the service")
+
+    def _add_users_to_group(self, student_ids: List[str], group_name: str) -> None:
+        _query_jupyterhub_api(
+            method="POST",
+            api_path="/groups/{name}/users".format(name=group_name),
+            post_data={"users": list(student_ids)}
+        )
+        # Saying student could be already here is because the post request
+        # returns 200 even if the student_id was already in the group
+        self.log.info(
+            "Student {student} added or was already in the Jupyterhub group: {group_name}".format(
+                student=", ".join(student_ids),
+                group_name=group_name))
+
+    def add_students_to_course(self, student_ids: List[str], course_id: str) -> None:
         if not course_id:
             self.log.error(
                 "Could not add student to course because the course_id has not "
                 "been provided. Has it been set in the nbgrader_config.py?")
             return
 
+        group_name = "nbgrader-{}".format(course_id)
         try:
-            group_name = "nbgrader-{}".format(course_id)
             jup_groups = _query_jupyterhub_api(
                 method="GET",
                 api_path="/groups",
@@ -117,26 +199,28 @@ class JupyterHubAuthPlugin(BaseAuthPlugin):
                 self.log.info("Jupyterhub group: {group_name} created.".format(
                     group_name=group_name))
 
-            _query_jupyterhub_api(
-                method="POST",
-                api_path="/groups/{name}/users".format(name=group_name),
-                post_data={"users": [student_id]}
-            )
-            # Saying student could be already here is because the post request
-            # returns 200 even if the student_id was already in the group
-            self.log.info(
-                "Student {student} added or was already in the Jupyterhub group: {group_name}".format(
-                    student=student_id,
-                    group_name=group_name))
+        except JupyterhubApiError as e:
+            self._log_add_error(", ".join(student_ids), group_name, e)
+            return
 
+        # all the students are added with a single request
+        clear_courses_cache()
+        try:
+            self._add_users_to_group(student_ids, group_name)
         except JupyterhubApiError as e:
-            # We assume user might be using Jupyterhub but something is not working
-            err_msg = "Student {student} NOT added to the Jupyterhub group {group_name}: ".format(
-                student=student_id,
-                group_name=group_name
-            )
-            self.log.error(err_msg + str(e))
-            self.log.error("Make sure you set a valid admin_user 'api_token' in your config file before starting the service")
+            if len(student_ids) == 1:
+                self._log_add_error(student_ids[0], group_name, e)
+                return
+            # e.g. one of the students is not a Jupyterhub user, so that
+            # the others are added one at a time (to the same group)
+            self.log.warning(
+                "Could not add the students to the Jupyterhub group {group_name} "
+                "at once, adding them one at a time".format(group_name=group_name))
+            for student_id in student_ids:
+                try:
+                    self._add_users_to_group([student_id], group_name)
+                except JupyterhubApiError as e:
+                    self._log_add_error(student_id, group_name, e)
 
     def remove_student_from_course(self, student_id: str, course_id: str) -> None:
         if not course_id:
@@ -147,6 +231,7 @@ class JupyterHubAuthPlugin(BaseAuthPlugin):
 
         try:
             group_name = "nbgrader-{}".format(course_id)
+            clear_courses_cache()
             _query_jupyterhub_api(
                 method="DELETE",
                 api_path="/groups/{name}/users".format(name=group_name),
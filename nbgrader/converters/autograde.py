@@ -1,4 +1,7 @@
 import os
+import re
+import json
+import hashlib
 import shutil
 
 from textwrap import dedent
@@ -10,8 +13,12 @@ from .base import BaseConverter, NbGraderException
 from ..preprocessors import (
     AssignLatePenalties, ClearOutput, DeduplicateIds, OverwriteCells, SaveAutoGrades,
     Execute, LimitOutput, OverwriteKernelspec, CheckCellMetadata)
-from ..api import Gradebook, MissingEntry
+from ..preprocessors.execute import shutdown_kernel_pools
+from ..preprocessors.overwritecells import load_master_cells
+from ..api import Gradebook, MissingEntry, Notebook
 from .. import utils
+from ..tracing import span
+import typing
 
 
 class Autograde(BaseConverter):
@@ -39,7 +46,33 @@ class Autograde(BaseConverter):
         )
     ).tag(config=True)
 
+    incremental = Bool(
+        False,
+        help=dedent(
+            """
+            Whether to only re-autograde submissions whose inputs changed since
+            they were last autograded. The inputs of each submitted notebook are
+            fingerprinted by hashing the submitted notebook, the source version
+            of the notebook, the test cells and other master cells saved in the
+            database, the configuration of the autograding preprocessors and
+            the other files of the assignment. Submissions that have not been
+            autograded yet are always processed.
+            """
+        )
+    ).tag(config=True)
+
+    explain_skip = Bool(
+        False,
+        help=dedent(
+            """
+            When autograding incrementally, log why each submission is (or is
+            not) autograded again.
+            """
+        )
+    ).tag(config=True)
+
     _sanitizing = True
+    _fingerprints = Dict({})
 
     @property
     def _input_directory(self) -> str:
@@ -70,6 +103,141 @@ class Autograde(BaseConverter):
 
     preprocessors = List([])
 
+    def _config_hash(self) -> str:
+        config = {}
+        for pp in self.sanitize_preprocessors + self.autograde_preprocessors:
+            for cls in pp.mro():
+                if cls.__name__ in self.config:
+                    config[cls.__name__] = self.config[cls.__name__]
+        config["preprocessors"] = [
+            [pp.__name__ for pp in self.sanitize_preprocessors],
+            [pp.__name__ for pp in self.autograde_preprocessors]
+        ]
+        data = json.dumps(config, sort_keys=True, default=repr)
+        return hashlib.sha256(utils.to_bytes(data)).hexdigest()
+
+    def _files_hash(self, assignment_id: str, student_id: str) -> str:
+        m = hashlib.sha256()
+        paths = [
+            self._format_source(assignment_id, student_id),
+            self.coursedir.format_path(self.coursedir.source_directory, '.', assignment_id)
+        ]
+        for path in paths:
+            for filename in sorted(utils.find_all_files(path, self.coursedir.ignore + ["*.ipynb"])):
+                m.update(utils.to_bytes(os.path.relpath(filename, path)))
+                m.update(utils.to_bytes(utils.compute_file_hash(filename)))
+        return m.hexdigest()
+
+    def _master_hash(self, notebook: Notebook) -> str:
+        cells = {
+            "duedate": str(notebook.assignment.duedate),
+            "kernelspec": notebook.kernelspec,
+            "source_cells": sorted(
+                [x.name, x.cell_type, x.locked, x.checksum, x.source]
+                for x in notebook.source_cells),
+            "grade_cells": sorted(
+                [x.name, x.max_score, x.cell_type] for x in notebook.grade_cells),
+            "task_cells": sorted(
+                [x.name, x.max_score] for x in notebook.task_cells),
+        }
+        data = json.dumps(cells, sort_keys=True, default=repr)
+        return hashlib.sha256(utils.to_bytes(data)).hexdigest()
+
+    def compute_fingerprints(self, assignment_id: str, student_id: str) -> typing.Dict[str, typing.Dict[str, str]]:
+        """Compute the fingerprint of each submitted notebook of a submission,
+        as a dictionary mapping notebook names to a dictionary of hashes of
+        each of the inputs of autograding.
+
+        """
+        fingerprints = {}
+        config_hash = self._config_hash()
+        files_hash = self._files_hash(assignment_id, student_id)
+        source_path = self.coursedir.format_path(self.coursedir.source_directory, '.', assignment_id)
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
+            for notebook_filename in self.notebooks:
+                notebook_id = os.path.splitext(os.path.basename(notebook_filename))[0]
+                try:
+                    notebook = gb.find_notebook(notebook_id, assignment_id)
+                except MissingEntry:
+                    continue
+
+                source = os.path.join(source_path, notebook_id + ".ipynb")
+                fingerprints[notebook_id] = {
+                    "submission": utils.compute_file_hash(notebook_filename),
+                    "source": utils.compute_file_hash(source) if os.path.exists(source) else None,
+                    "master": self._master_hash(notebook),
+                    "config": config_hash,
+                    "files": files_hash
+                }
+
+        return fingerprints
+
+    def _changed_inputs(self, assignment_id: str, student_id: str) -> typing.List[str]:
+        """Compare the current fingerprints of a submission with the ones
+        saved when it was last autograded, and return a description of what
+        changed (an empty list if nothing did)."""
+        changes = []
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
+            for notebook_id, fingerprint in sorted(self._fingerprints.items()):
+                try:
+                    submission = gb.find_submission_notebook(notebook_id, assignment_id, student_id)
+                except MissingEntry:
+                    changes.append("{} has not been autograded".format(notebook_id))
+                    continue
+
+                if submission.fingerprint is None:
+                    changes.append("{} has no saved fingerprint".format(notebook_id))
+                    continue
+
+                old = json.loads(submission.fingerprint)
+                changed = sorted(k for k in fingerprint if old.get(k) != fingerprint[k])
+                if changed:
+                    changes.append("{} changed ({})".format(notebook_id, ", ".join(changed)))
+
+        return changes
+
+    def init_destination(self, assignment_id: str, student_id: str) -> bool:
+        if not self.incremental or self.force:
+            should_process = super(Autograde, self).init_destination(assignment_id, student_id)
+            if should_process:
+                self._fingerprints = self.compute_fingerprints(assignment_id, student_id)
+            return should_process
+
+        self._fingerprints = self.compute_fingerprints(assignment_id, student_id)
+        changes = self._changed_inputs(assignment_id, student_id)
+        if self.explain_skip:
+            if changes:
+                self.log.info(
+                    "Autograding assignment '%s' for student '%s': %s",
+                    assignment_id, student_id, "; ".join(changes))
+            else:
+                self.log.info(
+                    "Assignment '%s' for student '%s' is unchanged since it was last autograded",
+                    assignment_id, student_id)
+
+        # if any of the inputs changed, then replace the existing autograded
+        # version just like --force would; otherwise, fall back on the usual
+        # checks for missing files and timestamps
+        force = self.force
+        self.force = len(changes) > 0
+        try:
+            return super(Autograde, self).init_destination(assignment_id, student_id)
+        finally:
+            self.force = force
+
+    def _save_fingerprint(self, notebook_filename: str) -> None:
+        notebook_id = os.path.splitext(os.path.basename(notebook_filename))[0]
+        if notebook_id not in self._fingerprints:
+            return
+
+        resources = self.init_single_notebook_resources(notebook_filename)
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
+            submission = gb.find_submission_notebook(
+                notebook_id, resources['nbgrader']['assignment'],
+                resources['nbgrader']['student'])
+            submission.fingerprint = json.dumps(self._fingerprints[notebook_id], sort_keys=True)
+            gb.db.commit()
+
     def init_assignment(self, assignment_id: str, student_id: str) -> None:
         super(Autograde, self).init_assignment(assignment_id, student_id)
         # try to get the student from the database, and throw an error if it
@@ -80,11 +248,11 @@ class Autograde(BaseConverter):
             if 'id' in student:
                 del student['id']
             self.log.info("Creating/updating student with ID '%s': %s", student_id, student)
-            with Gradebook(self.coursedir.db_url, self.coursedir.course_id) as gb:
+            with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
                 gb.update_or_create_student(student_id, **student)
 
         else:
-            with Gradebook(self.coursedir.db_url, self.coursedir.course_id) as gb:
+            with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
                 try:
                     gb.find_student(student_id)
                 except MissingEntry:
@@ -93,7 +261,7 @@ class Autograde(BaseConverter):
                     raise NbGraderException(msg)
 
         # make sure the assignment exists
-        with Gradebook(self.coursedir.db_url, self.coursedir.course_id) as gb:
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
             try:
                 gb.find_assignment(assignment_id)
             except MissingEntry:
@@ -104,7 +272,7 @@ class Autograde(BaseConverter):
         # try to read in a timestamp from file
         src_path = self._format_source(assignment_id, student_id)
         timestamp = self.coursedir.get_existing_timestamp(src_path)
-        with Gradebook(self.coursedir.db_url, self.coursedir.course_id) as gb:
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
             if timestamp:
                 submission = gb.update_or_create_submission(
                     assignment_id, student_id, timestamp=timestamp)
@@ -125,18 +293,19 @@ class Autograde(BaseConverter):
         source_files = list(source_files - exclude_files)
 
         # copy them to the build directory
-        for filename in source_files:
-            dest = os.path.join(dest_path, os.path.relpath(filename, source_path))
-            if not os.path.exists(os.path.dirname(dest)):
-                os.makedirs(os.path.dirname(dest))
-            if os.path.exists(dest):
-                os.remove(dest)
-            self.log.info("Copying %s -> %s", filename, dest)
-            shutil.copy(filename, dest)
+        with span("copy_files", "submission", assignment=assignment_id, student=student_id):
+            for filename in source_files:
+                dest = os.path.join(dest_path, os.path.relpath(filename, source_path))
+                if not os.path.exists(os.path.dirname(dest)):
+                    os.makedirs(os.path.dirname(dest))
+                if os.path.exists(dest):
+                    os.remove(dest)
+                self.log.info("Copying %s -> %s", filename, dest)
+                shutil.copy(filename, dest)
 
         # ignore notebooks that aren't in the database
         notebooks = []
-        with Gradebook(self.coursedir.db_url, self.coursedir.course_id) as gb:
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
             for notebook in self.notebooks:
                 notebook_id = os.path.splitext(os.path.basename(notebook))[0]
                 try:
@@ -154,7 +323,7 @@ class Autograde(BaseConverter):
 
         # check for missing notebooks and give them a score of zero if they
         # do not exist
-        with Gradebook(self.coursedir.db_url, self.coursedir.course_id) as gb:
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
             assignment = gb.find_assignment(assignment_id)
             for notebook in assignment.notebooks:
                 path = os.path.join(self.coursedir.format_path(
@@ -170,6 +339,34 @@ class Autograde(BaseConverter):
                         grade.needs_manual_grade = False
                     gb.db.commit()
 
+    def _load_master_cells(self) -> None:
+        # load the master cells of the notebooks once, before the worker
+        # processes are forked, so that all the workers share them
+        regexp = self._format_source("(?P<assignment_id>.*)", "(?P<student_id>.*)", escape=True)
+        assignment_ids = set()
+        for assignment in self.assignments:
+            m = re.match(regexp, assignment)
+            if m is not None:
+                assignment_ids.add(m.group('assignment_id'))
+
+        with Gradebook.session(self.coursedir.db_url, self.coursedir.course_id) as gb:
+            for assignment_id in sorted(assignment_ids):
+                try:
+                    notebooks = gb.find_assignment(assignment_id).notebooks
+                except MissingEntry:
+                    continue
+                for notebook in notebooks:
+                    load_master_cells(gb, notebook.name, assignment_id)
+
+    def convert_notebooks(self) -> None:
+        if self._num_jobs() > 1:
+            self._load_master_cells()
+        try:
+            super(Autograde, self).convert_notebooks()
+        finally:
+            # shut down any kernels pre-started by the Execute preprocessor
+            shutdown_kernel_pools()
+
     def _init_preprocessors(self) -> None:
         self.exporter._preprocessors = []
         if self._sanitizing:
@@ -184,14 +381,17 @@ class Autograde(BaseConverter):
         self.log.info("Sanitizing %s", notebook_filename)
         self._sanitizing = True
         self._init_preprocessors()
-        super(Autograde, self).convert_single_notebook(notebook_filename)
+        with span("sanitize", "notebook", notebook=notebook_filename):
+            super(Autograde, self).convert_single_notebook(notebook_filename)
 
         notebook_filename = os.path.join(self.writer.build_directory, os.path.basename(notebook_filename))
         self.log.info("Autograding %s", notebook_filename)
         self._sanitizing = False
         self._init_preprocessors()
         try:
-            with utils.setenv(NBGRADER_EXECUTION='autograde'):
+            with utils.setenv(NBGRADER_EXECUTION='autograde'), \
+                    span("autograde", "notebook", notebook=notebook_filename):
                 super(Autograde, self).convert_single_notebook(notebook_filename)
+            self._save_fingerprint(notebook_filename)
         finally:
             self._sanitizing = True
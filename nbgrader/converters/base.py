@@ -5,17 +5,24 @@ import shutil
 import sqlalchemy
 import traceback
 import importlib
+import collections
+import multiprocessing
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from rapidfuzz import fuzz
 from traitlets.config import LoggingConfigurable, Config
-from traitlets import Bool, List, Dict, Integer, Instance, Type, Any
-from traitlets import default, validate
+from traitlets import Bool, List, Dict, Integer, Instance, Type, Any, Unicode
+from traitlets import default, validate, TraitError
 from textwrap import dedent
 from nbconvert.exporters import Exporter, NotebookExporter
 from nbconvert.writers import FilesWriter
 
+from ..api import Gradebook, gradebook_stats, reset_engine_registry
 from ..coursedir import CourseDirectory
 from ..utils import find_all_files, rmtree, remove
+from ..tracing import span, start_tracing, stop_tracing, get_tracer
 from ..preprocessors.execute import UnresponsiveKernelError
 from ..nbgraderformat import SchemaTooOldError, SchemaTooNewError
 import typing
@@ -26,6 +33,29 @@ class NbGraderException(Exception):
     pass
 
 
+# the converter used by worker processes when converting in parallel; worker
+# processes are forked, so they inherit this from the parent process
+_worker_converter = None
+
+
+def _init_worker(lock: typing.Any) -> None:
+    """Initialize a forked worker process: serialize database access across
+    workers, give the worker its own database connections, and give the
+    converter its own exporter and writer."""
+    Gradebook.process_lock = lock
+    reset_engine_registry()
+
+    converter = _worker_converter
+    converter.writer = FilesWriter(parent=converter, config=converter.config)
+    converter.exporter = converter.exporter_class(parent=converter, config=converter.config)
+    for pp in converter.preprocessors:
+        converter.exporter.register_preprocessor(pp)
+
+
+def _convert_assignment_in_worker(assignment: str) -> typing.Dict[str, typing.Any]:
+    return _worker_converter.convert_assignment(assignment)
+
+
 class BaseConverter(LoggingConfigurable):
 
     notebooks = List([])
@@ -37,6 +67,53 @@ class BaseConverter(LoggingConfigurable):
 
     force = Bool(False, help="Whether to overwrite existing assignments/submissions").tag(config=True)
 
+    parallelism = Integer(
+        1,
+        help=dedent(
+            """
+            The number of submissions to convert at the same time. When greater
+            than one, submissions are distributed to a pool of worker processes,
+            each with its own exporter, preprocessors and database sessions
+            (database access is serialized between workers). A value of zero
+            uses one worker per CPU. Parallel conversion requires the 'fork'
+            multiprocessing start method; where it is not available,
+            submissions are converted one at a time.
+            """
+        )
+    ).tag(config=True)
+
+    @validate('parallelism')
+    def _validate_parallelism(self, proposal):
+        if proposal['value'] < 0:
+            raise TraitError("parallelism must be non-negative")
+        return proposal['value']
+
+    profile = Bool(
+        False,
+        help=dedent(
+            """
+            Record how long each phase of the conversion takes (initializing
+            the destination, copying files, running each preprocessor on each
+            notebook, executing each cell, starting kernels, writing the
+            results, ...) and log a summary table of the phases (count, total,
+            median and 95th percentile times) at the end of the run.
+            """
+        )
+    ).tag(config=True)
+
+    trace_file = Unicode(
+        "",
+        help=dedent(
+            """
+            When profiling, the file to which the recorded phases are written:
+            as JSON lines (one phase per line) if the file name ends with
+            `.jsonl`, and otherwise in the Chrome trace event format, which can
+            be viewed with `chrome://tracing` or https://ui.perfetto.dev.
+            Relative paths are relative to the course directory.
+            """
+        )
+    ).tag(config=True)
+
     pre_convert_hook = Any(
         None,
         config=True,
@@ -108,6 +185,26 @@ class BaseConverter(LoggingConfigurable):
 
     coursedir = Instance(CourseDirectory, allow_none=True)
 
+    progress_callback = Any(
+        None,
+        allow_none=True,
+        help=dedent(
+            """
+            An optional function reporting the progress of the conversion. It
+            is called (in the main process) before converting the submissions,
+            and then after each submission, as::
+
+                progress_callback(done=done, total=total, item=item)
+
+            where ``item`` is None for the first call, and otherwise a
+            dictionary with the ``assignment_id`` and the ``student_id`` of the
+            submission, whether it was ``processed`` or ``failed``, and the
+            ``wall_time`` it took. It is not configurable, but is set by the
+            applications that run converters (e.g. the formgrader).
+            """
+        )
+    )
+
     def __init__(self, coursedir: CourseDirectory = None, **kwargs: typing.Any) -> None:
         self.coursedir = coursedir
         super(BaseConverter, self).__init__(**kwargs)
@@ -341,113 +438,292 @@ class BaseConverter(LoggingConfigurable):
         """
         self.log.info("Converting notebook %s", notebook_filename)
         resources = self.init_single_notebook_resources(notebook_filename)
-        output, resources = self.exporter.from_filename(notebook_filename, resources=resources)
-        self.write_single_notebook(output, resources)
-
-    def convert_notebooks(self) -> None:
-        errors = []
+        args = dict(
+            assignment=resources['nbgrader']['assignment'],
+            student=resources['nbgrader']['student'],
+            notebook=resources['nbgrader']['notebook'])
+        with span("export", "notebook", **args):
+            output, resources = self.exporter.from_filename(notebook_filename, resources=resources)
+        with span("write", "notebook", **args):
+            self.write_single_notebook(output, resources)
+
+    def _handle_failure(self, gd: typing.Dict[str, str]) -> None:
+        dest = os.path.normpath(self._format_dest(gd['assignment_id'], gd['student_id']))
+        if self.coursedir.notebook_id == "*":
+            if os.path.exists(dest):
+                self.log.warning("Removing failed assignment: {}".format(dest))
+                rmtree(dest)
+        else:
+            for notebook in self.notebooks:
+                filename = os.path.splitext(os.path.basename(notebook))[0] + self.exporter.file_extension
+                path = os.path.join(dest, filename)
+                if os.path.exists(path):
+                    self.log.warning("Removing failed notebook: {}".format(path))
+                    remove(path)
+
+    def convert_assignment(self, assignment: str) -> typing.Dict[str, typing.Any]:
+        """Convert all the notebooks of a single submission (i.e. the
+        directory of one student for one assignment).
+
+        Returns a dictionary describing the outcome, with the keys
+        ``assignment_id``, ``student_id``, ``processed`` (whether the
+        submission was converted at all), ``failed`` (whether the conversion
+        raised a recoverable error), ``wall_time``, ``pid`` (the id of the
+        process that did the conversion), ``gradebook_stats`` and ``spans``
+        (the phases recorded while profiling). Unrecoverable errors are raised
+        as :class:`NbGraderException`.
 
-        def _handle_failure(gd: typing.Dict[str, str]) -> None:
-            dest = os.path.normpath(self._format_dest(gd['assignment_id'], gd['student_id']))
-            if self.coursedir.notebook_id == "*":
-                if os.path.exists(dest):
-                    self.log.warning("Removing failed assignment: {}".format(dest))
-                    rmtree(dest)
-            else:
-                for notebook in self.notebooks:
-                    filename = os.path.splitext(os.path.basename(notebook))[0] + self.exporter.file_extension
-                    path = os.path.join(dest, filename)
-                    if os.path.exists(path):
-                        self.log.warning("Removing failed notebook: {}".format(path))
-                        remove(path)
+        """
+        # initialize the list of notebooks and the exporter
+        self.notebooks = sorted(self.assignments[assignment])
 
-        for assignment in sorted(self.assignments.keys()):
-            # initialize the list of notebooks and the exporter
-            self.notebooks = sorted(self.assignments[assignment])
+        # parse out the assignment and student ids
+        regexp = self._format_source("(?P<assignment_id>.*)", "(?P<student_id>.*)", escape=True)
+        m = re.match(regexp, assignment)
+        if m is None:
+            msg = "Could not match '%s' with regexp '%s'" % (assignment, regexp)
+            self.log.error(msg)
+            raise NbGraderException(msg)
+        gd = m.groupdict()
 
-            # parse out the assignment and student ids
-            regexp = self._format_source("(?P<assignment_id>.*)", "(?P<student_id>.*)", escape=True)
-            m = re.match(regexp, assignment)
-            if m is None:
-                msg = "Could not match '%s' with regexp '%s'" % (assignment, regexp)
-                self.log.error(msg)
-                raise NbGraderException(msg)
-            gd = m.groupdict()
+        result = {
+            'assignment_id': gd['assignment_id'],
+            'student_id': gd['student_id'],
+            'processed': False,
+            'failed': False,
+            'wall_time': 0.0,
+            'pid': os.getpid(),
+            'gradebook_stats': {},
+            'spans': []
+        }
+        start_time = time.time()
+        start_stats = gradebook_stats()
+        tracer = get_tracer()
+        first_span = len(tracer.spans) if tracer else 0
+        args = dict(assignment=gd['assignment_id'], student=gd['student_id'])
 
-            try:
-                # determine whether we actually even want to process this submission
+        try:
+            # determine whether we actually even want to process this submission
+            with span("init_destination", "submission", **args):
                 should_process = self.init_destination(gd['assignment_id'], gd['student_id'])
-                if not should_process:
-                    continue
+            if not should_process:
+                return result
 
+            result['processed'] = True
+            with span("pre_convert_hook", "submission", **args):
                 self.run_pre_convert_hook()
 
-                # initialize the destination
+            # initialize the destination
+            with span("init_assignment", "submission", **args):
                 self.init_assignment(gd['assignment_id'], gd['student_id'])
 
-                # convert all the notebooks
-                for notebook_filename in self.notebooks:
-                    self.convert_single_notebook(notebook_filename)
+            # convert all the notebooks
+            for notebook_filename in self.notebooks:
+                self.convert_single_notebook(notebook_filename)
 
-                # set assignment permissions
+            # set assignment permissions
+            with span("set_permissions", "submission", **args):
                 self.set_permissions(gd['assignment_id'], gd['student_id'])
+            with span("post_convert_hook", "submission", **args):
                 self.run_post_convert_hook()
 
-            except UnresponsiveKernelError:
-                self.log.error(
-                    "While processing assignment %s, the kernel became "
-                    "unresponsive and we could not interrupt it. This probably "
-                    "means that the students' code has an infinite loop that "
-                    "consumes a lot of memory or something similar. nbgrader "
-                    "doesn't know how to deal with this problem, so you will "
-                    "have to manually edit the students' code (for example, to "
-                    "just throw an error rather than enter an infinite loop). ",
-                    assignment)
-                errors.append((gd['assignment_id'], gd['student_id']))
-                _handle_failure(gd)
-
-            except sqlalchemy.exc.OperationalError:
-                _handle_failure(gd)
-                self.log.error(traceback.format_exc())
-                msg = (
-                    "There was an error accessing the nbgrader database. This "
-                    "may occur if you recently upgraded nbgrader. To resolve "
-                    "the issue, first BACK UP your database and then run the "
-                    "command `nbgrader db upgrade`."
-                )
-                self.log.error(msg)
-                raise NbGraderException(msg)
-
-            except SchemaTooOldError:
-                _handle_failure(gd)
-                msg = (
-                    "One or more notebooks in the assignment use an old version \n"
-                    "of the nbgrader metadata format. Please **back up your class files \n"
-                    "directory** and then update the metadata using:\n\nnbgrader update .\n"
-                )
-                self.log.error(msg)
-                raise NbGraderException(msg)
-
-            except SchemaTooNewError:
-                _handle_failure(gd)
-                msg = (
-                    "One or more notebooks in the assignment use an newer version \n"
-                    "of the nbgrader metadata format. Please update your version of \n"
-                    "nbgrader to the latest version to be able to use this notebook.\n"
-                )
-                self.log.error(msg)
-                raise NbGraderException(msg)
-
-            except KeyboardInterrupt:
-                _handle_failure(gd)
-                self.log.error("Canceled")
-                raise
+        except UnresponsiveKernelError:
+            self.log.error(
+                "While processing assignment %s, the kernel became "
+                "unresponsive and we could not interrupt it. This probably "
+                "means that the students' code has an infinite loop that "
+                "consumes a lot of memory or something similar. nbgrader "
+                "doesn't know how to deal with this problem, so you will "
+                "have to manually edit the students' code (for example, to "
+                "just throw an error rather than enter an infinite loop). ",
+                assignment)
+            result['failed'] = True
+            self._handle_failure(gd)
+
+        except sqlalchemy.exc.OperationalError:
+            self._handle_failure(gd)
+            self.log.error(traceback.format_exc())
+            msg = (
+                "There was an error accessing the nbgrader database. This "
+                "may occur if you recently upgraded nbgrader. To resolve "
+                "the issue, first BACK UP your database and then run the "
+                "command `nbgrader db upgrade`."
+            )
+            self.log.error(msg)
+            raise NbGraderException(msg)
 
-            except Exception:
-                self.log.error("There was an error processing assignment: %s", assignment)
-                self.log.error(traceback.format_exc())
-                errors.append((gd['assignment_id'], gd['student_id']))
-                _handle_failure(gd)
+        except SchemaTooOldError:
+            self._handle_failure(gd)
+            msg = (
+                "One or more notebooks in the assignment use an old version \n"
+                "of the nbgrader metadata format. Please **back up your class files \n"
+                "directory** and then update the metadata using:\n\nnbgrader update .\n"
+            )
+            self.log.error(msg)
+            raise NbGraderException(msg)
+
+        except SchemaTooNewError:
+            self._handle_failure(gd)
+            msg = (
+                "One or more notebooks in the assignment use an newer version \n"
+                "of the nbgrader metadata format. Please update your version of \n"
+                "nbgrader to the latest version to be able to use this notebook.\n"
+            )
+            self.log.error(msg)
+            raise NbGraderException(msg)
+
+        except KeyboardInterrupt:
+            self._handle_failure(gd)
+            self.log.error("Canceled")
+            raise
+
+        except Exception:
+            self.log.error("There was an error processing assignment: %s", assignment)
+            self.log.error(traceback.format_exc())
+            result['failed'] = True
+            self._handle_failure(gd)
+
+        finally:
+            result['wall_time'] = time.time() - start_time
+            result['gradebook_stats'] = {
+                key: value - start_stats[key] for key, value in gradebook_stats().items()}
+            if tracer:
+                # the spans are returned with the result, so that those
+                # recorded by worker processes reach the parent process
+                result['spans'] = tracer.drain(first_span)
+
+        return result
+
+    def _num_jobs(self) -> int:
+        jobs = self.parallelism
+        if jobs < 1:
+            jobs = os.cpu_count() or 1
+        jobs = min(jobs, len(self.assignments))
+        if jobs > 1 and "fork" not in multiprocessing.get_all_start_methods():
+            self.log.warning(
+                "Parallel conversion requires the 'fork' start method, which "
+                "is not available on this platform; converting submissions "
+                "one at a time instead.")
+            jobs = 1
+        return max(jobs, 1)
+
+    def _convert_assignments_serial(self, assignments: typing.List[str]) -> typing.Iterator[typing.Tuple[typing.Dict[str, typing.Any], int]]:
+        for i, assignment in enumerate(assignments):
+            yield self.convert_assignment(assignment), len(assignments) - i - 1
+
+    def _convert_assignments_parallel(self, assignments: typing.List[str], jobs: int) -> typing.Iterator[typing.Tuple[typing.Dict[str, typing.Any], int]]:
+        global _worker_converter
+
+        self.log.info("Converting %d submissions with %d worker processes", len(assignments), jobs)
+        context = multiprocessing.get_context("fork")
+        lock = context.RLock()
+
+        # worker processes are forked from this one, so they inherit the
+        # converter (including its configuration and parent application)
+        _worker_converter = self
+        pool = ProcessPoolExecutor(
+            max_workers=jobs, mp_context=context,
+            initializer=_init_worker, initargs=(lock,))
+        futures = [pool.submit(_convert_assignment_in_worker, a) for a in assignments]
+        try:
+            remaining = len(futures)
+            for future in as_completed(futures):
+                remaining -= 1
+                yield future.result(), max(remaining - jobs, 0)
+        finally:
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=True)
+            _worker_converter = None
+
+    def _report_progress(self, done: int, total: int, result: typing.Optional[typing.Dict[str, typing.Any]]) -> None:
+        if self.progress_callback is None:
+            return
+        item = None
+        if result is not None:
+            item = {key: result[key] for key in (
+                'assignment_id', 'student_id', 'processed', 'failed', 'wall_time')}
+        try:
+            self.progress_callback(done=done, total=total, item=item)
+        except Exception:
+            self.log.warning("Could not report the progress of the conversion", exc_info=True)
+
+    def _log_run_summary(self, results: typing.List[typing.Dict[str, typing.Any]], jobs: int, wall_time: float) -> None:
+        processed = [r for r in results if r['processed']]
+        if len(processed) == 0:
+            return
+
+        times = sorted(r['wall_time'] for r in processed)
+        busy = sum(times)
+        utilization = busy / (jobs * wall_time) if wall_time > 0 else 0.0
+        self.log.info(
+            "Converted %d submissions (%d skipped, %d failed) in %.2f seconds "
+            "with %d worker(s)",
+            len(processed), len(results) - len(processed),
+            len([r for r in processed if r['failed']]), wall_time, jobs)
+        self.log.info(
+            "Per-student wall time: mean %.2fs, median %.2fs, max %.2fs; "
+            "worker utilization %.0f%%",
+            busy / len(times), times[len(times) // 2], times[-1], 100 * utilization)
+        stats = collections.Counter()
+        for r in results:
+            stats.update(r['gradebook_stats'])
+        self.log.debug(
+            "Database usage: %d engines created, %d gradebook sessions opened, "
+            "%d schema checks",
+            stats['engines'], stats['sessions'], stats['schema_checks'])
+        for pid, count in sorted(collections.Counter(r['pid'] for r in processed).items()):
+            pid_busy = sum(r['wall_time'] for r in processed if r['pid'] == pid)
+            self.log.debug(
+                "Worker %s converted %d submissions (busy %.2f seconds)", pid, count, pid_busy)
+
+    def _log_profile(self, tracer: typing.Any) -> None:
+        if len(tracer.spans) == 0:
+            return
+        self.log.info("Time spent in each phase:\n%s", tracer.format_summary())
+        if self.trace_file:
+            self.log.info("Writing trace to %s", self.trace_file)
+            tracer.write(self.trace_file)
+
+    def convert_notebooks(self) -> None:
+        if self.profile:
+            tracer = start_tracing()
+            try:
+                self._convert_notebooks(tracer)
+            finally:
+                stop_tracing()
+                self._log_profile(tracer)
+        else:
+            self._convert_notebooks(None)
+
+    def _convert_notebooks(self, tracer: typing.Any) -> None:
+        errors = []
+        results = []
+
+        assignments = sorted(self.assignments.keys())
+        jobs = self._num_jobs()
+        if jobs > 1:
+            outcomes = self._convert_assignments_parallel(assignments, jobs)
+        else:
+            outcomes = self._convert_assignments_serial(assignments)
+
+        start_time = time.time()
+        self._report_progress(0, len(assignments), None)
+        for result, queue_depth in outcomes:
+            results.append(result)
+            if tracer:
+                tracer.extend(result['spans'])
+            if result['failed']:
+                errors.append((result['assignment_id'], result['student_id']))
+            if result['processed']:
+                self.log.info(
+                    "Finished assignment '%s' for student '%s' in %.2f seconds "
+                    "(%d/%d done, %d queued)",
+                    result['assignment_id'], result['student_id'], result['wall_time'],
+                    len(results), len(assignments), queue_depth)
+            self._report_progress(len(results), len(assignments), result)
+
+        self._log_run_summary(results, jobs, time.time() - start_time)
 
         if len(errors) > 0:
             for assignment_id, student_id in errors:
@@ -1,14 +1,64 @@
 import os
 
+from textwrap import dedent
+
 from traitlets.config import Config
-from traitlets import List, default
+from traitlets import Bool, List, default
 from nbconvert.exporters import HTMLExporter
+from nbconvert.exporters.exporter import ResourcesDict
 from nbconvert.preprocessors import CSSHTMLHeaderPreprocessor
+from nbformat import v4
 
 from .base import BaseConverter
 from ..preprocessors import GetGrades
 
 
+class FeedbackHTMLExporter(HTMLExporter):
+    """An HTML exporter which reads each stylesheet included by the feedback
+    template (e.g. the bootstrap stylesheet) only once, instead of once for
+    every rendered notebook."""
+
+    def __init__(self, *args, **kwargs):
+        super(FeedbackHTMLExporter, self).__init__(*args, **kwargs)
+        self._css_sources = {}
+        self._css_markup = {}
+
+    def get_css(self, name):
+        """Get the content of a stylesheet found on the template paths."""
+        if name not in self._css_sources:
+            env = self.environment
+            self._css_sources[name] = env.loader.get_source(env, name)[0]
+        return self._css_sources[name]
+
+    def _init_resources(self, resources):
+        resources = super(FeedbackHTMLExporter, self)._init_resources(resources)
+        include_css = resources["include_css"]
+
+        def cached_include_css(name):
+            if name not in self._css_markup:
+                self._css_markup[name] = include_css(name)
+            return self._css_markup[name]
+
+        resources["include_css"] = cached_include_css
+        return resources
+
+
+class CachedCSSHTMLHeaderPreprocessor(CSSHTMLHeaderPreprocessor):
+    """A :class:`~nbconvert.preprocessors.CSSHTMLHeaderPreprocessor` which
+    generates the pygments stylesheet only once, instead of once for every
+    notebook."""
+
+    def __init__(self, *args, **kwargs):
+        super(CachedCSSHTMLHeaderPreprocessor, self).__init__(*args, **kwargs)
+        self._headers = {}
+
+    def _generate_header(self, resources):
+        key = (self.highlight_class, str(self.style), resources["config_dir"])
+        if key not in self._headers:
+            self._headers[key] = super(CachedCSSHTMLHeaderPreprocessor, self)._generate_header(resources)
+        return list(self._headers[key])
+
+
 class GenerateFeedback(BaseConverter):
 
     @property
@@ -21,9 +71,27 @@ class GenerateFeedback(BaseConverter):
 
     preprocessors = List([
         GetGrades,
-        CSSHTMLHeaderPreprocessor
+        CachedCSSHTMLHeaderPreprocessor
     ]).tag(config=True)
 
+    shared_stylesheet = Bool(
+        False,
+        help=dedent(
+            """
+            Write the stylesheets of the feedback (bootstrap and the syntax
+            highlighting styles) once, to a `feedback.css` file at the root of
+            the feedback directory, and link to it from every feedback file,
+            instead of inlining them into each file. This makes the feedback
+            files much smaller, but they are not self-contained anymore: this
+            is meant for feedback that is served from the feedback directory,
+            since `nbgrader release_feedback` only copies the HTML files.
+            """
+        )
+    ).tag(config=True)
+
+    #: The name of the shared stylesheet
+    stylesheet_name = "feedback.css"
+
     @default("classes")
     def _classes_default(self):
         classes = super(GenerateFeedback, self)._classes_default()
@@ -32,7 +100,7 @@ class GenerateFeedback(BaseConverter):
 
     @default("export_class")
     def _exporter_class_default(self):
-        return HTMLExporter
+        return FeedbackHTMLExporter
 
     @default("permissions")
     def _permissions_default(self):
@@ -57,12 +125,51 @@ class GenerateFeedback(BaseConverter):
         c = Config()
         if 'template_name' not in self.config.HTMLExporter:
             c.HTMLExporter.template_name = 'feedback'
-            
+
         if 'extra_template_basedirs' not in self.config.HTMLExporter:
             template_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server_extensions', 'formgrader', 'templates'))
             c.HTMLExporter.extra_template_basedirs = [template_path]
-        
+
         extra_static_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'server_extensions', 'formgrader', 'static', 'components', 'bootstrap', 'css'))
         c.HTMLExporter.extra_template_paths = [extra_static_path]
 
         self.update_config(c)
+
+    @property
+    def _stylesheet_path(self):
+        return os.path.abspath(os.path.join(
+            self.coursedir.root, self.coursedir.feedback_directory, self.stylesheet_name))
+
+    def write_stylesheet(self):
+        """Write the shared stylesheet of the feedback files."""
+        env = self.exporter.environment
+        css = [env.loader.get_source(env, 'bootstrap.min.css')[0]]
+
+        # the syntax highlighting styles, as they would have been inlined
+        resources = ResourcesDict()
+        resources['config_dir'] = ''
+        for pp in self.exporter._preprocessors:
+            if isinstance(pp, CSSHTMLHeaderPreprocessor):
+                _, resources = pp.preprocess(v4.new_notebook(), resources)
+                css.extend(resources['inlining']['css'])
+
+        path = self._stylesheet_path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.log.info("Writing shared stylesheet to %s", path)
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write('\n'.join(css))
+        os.chmod(path, int(str(self.permissions), 8))
+
+    def init_single_notebook_resources(self, notebook_filename):
+        resources = super(GenerateFeedback, self).init_single_notebook_resources(notebook_filename)
+        if self.shared_stylesheet:
+            dest = self._format_dest(
+                resources['nbgrader']['assignment'], resources['nbgrader']['student'])
+            href = os.path.relpath(self._stylesheet_path, os.path.abspath(dest))
+            resources['nbgrader']['stylesheet'] = href.replace(os.path.sep, '/')
+        return resources
+
+    def convert_notebooks(self):
+        if self.shared_stylesheet:
+            self.write_stylesheet()
+        super(GenerateFeedback, self).convert_notebooks()
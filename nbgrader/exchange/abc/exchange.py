@@ -5,7 +5,7 @@ from textwrap import dedent
 from dateutil.tz import gettz
 from dateutil.parser import parse
 from traitlets.config import LoggingConfigurable
-from traitlets import Unicode, Instance, validate, TraitError
+from traitlets import Any, Unicode, Instance, validate, TraitError
 
 from nbgrader.coursedir import CourseDirectory
 from nbgrader.auth import Authenticator
@@ -48,6 +48,33 @@ class Exchange(LoggingConfigurable):
     coursedir = Instance(CourseDirectory, allow_none=True)
     authenticator = Instance(Authenticator, allow_none=True)
 
+    progress_callback = Any(
+        None,
+        allow_none=True,
+        help=dedent(
+            """
+            An optional function reporting the progress of exchange operations
+            that handle many files (e.g. releasing feedback), called after
+            each file as::
+
+                progress_callback(done=done, total=total, item=item)
+
+            where ``item`` is a dictionary describing the file (e.g. with its
+            ``student_id``). It is not configurable, but is set by the
+            applications that use the exchange (e.g. the formgrader).
+            """
+        )
+    )
+
+    def report_progress(self, done, total, item=None):
+        """Call :attr:`progress_callback`, if it is set."""
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(done=done, total=total, item=item)
+        except Exception:
+            self.log.warning("Could not report the progress", exc_info=True)
+
     def __init__(self, coursedir=None, authenticator=None, **kwargs):
         self.coursedir = coursedir
         self.authenticator = authenticator
@@ -0,0 +1,120 @@
+import os
+import errno
+import shutil
+import tempfile
+
+from stat import S_IRUSR, S_IRGRP, S_IROTH, S_IWGRP, S_IWOTH, S_ISREG
+
+from nbgrader.utils import compute_file_hash
+
+
+class BlobStore(object):
+    """A content-addressed store of the files copied to the exchange.
+
+    Every file is stored once, under the SHA-256 digest of its content, and
+    the copies of the file are hardlinks to the stored blob. Submissions that
+    contain the same (possibly large) data files, like the resubmissions of an
+    assignment, then share their files instead of copying them again. Since
+    the copies are ordinary hardlinks, everything reading the submissions
+    keeps working unchanged.
+
+    Since the blob directory of a course is writable by every student, a
+    file is only linked to a blob owned by the current user which nobody else
+    can write to; the blobs of other users could have been created with
+    another content, or changed later. The copies share the mode and times
+    of their blob, which must not be changed (see :meth:`is_linked`).
+
+    Whenever a hardlink cannot be created (e.g. because the destination is on
+    another file system, or because the blob belongs to another user), the
+    file is copied instead.
+
+    """
+
+    #: The mode of new blobs
+    mode = S_IRUSR | S_IRGRP | S_IROTH
+
+    def __init__(self, directory: str, log=None) -> None:
+        self.directory = directory
+        self.log = log
+
+    def _debug(self, msg: str, *args) -> None:
+        if self.log is not None:
+            self.log.debug(msg, *args)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    @staticmethod
+    def is_linked(path: str) -> bool:
+        """Whether a file shares its inode with a blob (or any other file),
+        in which case changing its mode or times would change them for all
+        the copies."""
+        return os.lstat(path).st_nlink > 1
+
+    @staticmethod
+    def _check_blob(blob: str) -> os.stat_result:
+        st = os.lstat(blob)
+        if not S_ISREG(st.st_mode) or st.st_uid != os.geteuid() or st.st_mode & (S_IWGRP | S_IWOTH):
+            raise PermissionError(
+                errno.EPERM, "Blob is not owned by the current user or is writable by others", blob)
+        return st
+
+    def store(self, src: str) -> str:
+        """Store a file, if it is not stored yet, and return the path of its
+        blob. Raises an :class:`OSError` if the blob exists but cannot be
+        trusted (see :class:`BlobStore`)."""
+        blob = self.blob_path(compute_file_hash(src))
+        if not os.path.lexists(blob):
+            fd, tmp_path = tempfile.mkstemp(prefix=".tmp", dir=self.directory)
+            os.close(fd)
+            try:
+                shutil.copyfile(src, tmp_path)
+                os.chmod(tmp_path, self.mode)
+                # concurrent writers store the same content, so whichever
+                # replace comes last is fine
+                os.replace(tmp_path, blob)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        self._check_blob(blob)
+        return blob
+
+    def copy(self, src: str, dst: str) -> str:
+        """Copy a file by hardlinking it to its blob, or by copying it if
+        that is not possible. This has the signature of the ``copy_function``
+        of :func:`shutil.copytree`. A linked copy keeps the mode and times of
+        its blob."""
+        try:
+            blob = self.store(src)
+            st = self._check_blob(blob)
+            os.link(blob, dst)
+            if not os.path.samestat(st, os.lstat(dst)):
+                raise OSError(errno.EAGAIN, "Blob was replaced while linking it", blob)
+        except OSError as e:
+            self._debug("Could not link %s to the blob store, copying it: %s", src, e)
+            if os.path.lexists(dst):
+                os.remove(dst)
+            shutil.copy2(src, dst)
+        return dst
+
+    def prune(self) -> int:
+        """Remove the blobs that no copy links to anymore.
+
+        Returns
+        -------
+        removed:
+            The number of removed blobs
+
+        """
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_nlink == 1:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError as e:
+                self._debug("Could not remove blob %s: %s", entry.path, e)
+        return removed
@@ -1,5 +1,4 @@
 import os
-import glob
 import shutil
 import sys
 from collections import defaultdict
@@ -54,8 +53,9 @@ class ExchangeCollect(Exchange, ABCExchangeCollect):
         if not check_mode(self.inbound_path, read=True, execute=True):
             self.fail("You don't have read permissions for the directory: {}".format(self.inbound_path))
         student_id = self.coursedir.student_id if self.coursedir.student_id else '*'
-        pattern = os.path.join(self.inbound_path, '{}+{}+*'.format(student_id, self.coursedir.assignment_id))
-        records = [self._path_to_record(f) for f in glob.glob(pattern)]
+        pattern = '{}+{}+*'.format(student_id, self.coursedir.assignment_id)
+        paths, _ = self.find_submissions(self.inbound_path, pattern)
+        records = [self._path_to_record(f) for f in paths]
         usergroups = groupby(records, lambda item: item['username'])
 
         with Gradebook(self.coursedir.db_url, self.coursedir.course_id) as gb:
@@ -93,6 +93,11 @@ class ExchangeCollect(Exchange, ABCExchangeCollect):
         for rec in self.src_records:
             student_id = rec['username']
             src_path = os.path.join(self.inbound_path, rec['filename'])
+            if not os.path.isdir(src_path):
+                self.log.warning(
+                    "Submission %s is in the submission index but does not exist, "
+                    "run `nbgrader list --inbound --rebuild-index` to repair the index", src_path)
+                continue
 
             # Cross check the student id with the owner of the submitted directory
             if self.check_owner and pwd is not None: # check disabled under windows
@@ -15,6 +15,9 @@ from nbgrader.exchange.abc import Exchange as ABCExchange
 from nbgrader.exchange import ExchangeError
 from nbgrader.utils import check_directory, ignore_patterns, self_owned
 
+from .blobs import BlobStore
+from .index import SubmissionIndex
+
 
 class Exchange(ABCExchange):
     root = Unicode(
@@ -43,11 +46,42 @@ class Exchange(ABCExchange):
         )
     ).tag(config=True)
 
+    use_submission_index = Bool(
+        True,
+        help=dedent(
+            """
+            Whether to find submissions through the submission index of the
+            inbound and cache directories (when they have one) rather than by
+            scanning these directories. The index of a directory is created,
+            or repaired when it disagrees with the directory, by running
+            `nbgrader list --inbound --rebuild-index` (or `--cached`).
+            """
+        )
+    ).tag(config=True)
+
+    use_blob_store = Bool(
+        False,
+        help=dedent(
+            """
+            Whether to deduplicate the files of submissions through a
+            content-addressed blob store. The files of the submissions in the
+            inbound directory (and in the cache) are then hardlinks to the
+            blobs, so that resubmissions and data files shared between
+            submissions only take disk space and copy time once. The blob
+            store of the exchange is created when releasing an assignment
+            with this option enabled.
+            """
+        )
+    ).tag(config=True)
+
     def set_perms(self, dest, fileperms, dirperms):
         all_dirs = []
         for dirname, _, filenames in os.walk(dest):
             for filename in filenames:
-                os.chmod(os.path.join(dirname, filename), fileperms)
+                filename = os.path.join(dirname, filename)
+                # the mode of files linked to a blob is shared by all copies
+                if not BlobStore.is_linked(filename):
+                    os.chmod(filename, fileperms)
             all_dirs.append(dirname)
 
         for dirname in all_dirs[::-1]:
@@ -84,12 +118,13 @@ class Exchange(ABCExchange):
         return total_size
 
 
-    def do_copy(self, src, dest, log=None):
+    def do_copy(self, src, dest, log=None, blob_store=None):
         """
         Copy the src dir to the dest dir, omitting excluded
         file/directories, non included files, and too large files, as
         specified by the options coursedir.ignore, coursedir.include
-        and coursedir.max_file_size.
+        and coursedir.max_file_size. If a blob store is given, the files
+        are hardlinked to its blobs instead of being copied.
         """
         dir_size = self.get_size(src)
         max_dir_size = self.coursedir.max_dir_size
@@ -101,7 +136,8 @@ class Exchange(ABCExchange):
                         ignore=ignore_patterns(exclude=self.coursedir.ignore,
                                                include=self.coursedir.include,
                                                max_file_size=self.coursedir.max_file_size,
-                                               log=self.log))
+                                               log=self.log),
+                        copy_function=blob_store.copy if blob_store else shutil.copy2)
         # copytree copies access mode too - so we must add go+rw back to it if
         # we are in groupshared.
         if self.coursedir.groupshared:
@@ -116,6 +152,8 @@ class Exchange(ABCExchange):
 
                 for filename in filenames:
                     filename = os.path.join(dirname, filename)
+                    if BlobStore.is_linked(filename):
+                        continue
                     st_mode = os.stat(filename).st_mode
                     if st_mode & 0o660 != 0o660:
                         try:
@@ -144,6 +182,45 @@ class Exchange(ABCExchange):
 
         raise ExchangeError(msg)
 
+    def find_submissions(self, directory, pattern):
+        """Find the submission directories in a directory whose names match a
+        glob pattern, using the submission index of the directory if it has one.
+
+        Returns
+        -------
+        paths: list
+            The sorted paths of the submission directories
+        records: dict
+            The submission index records of the paths, empty if the directory
+            is not indexed
+
+        """
+        if self.use_submission_index:
+            index = SubmissionIndex(directory, log=self.log)
+            records = index.records(pattern)
+            if records is not None:
+                records = {
+                    os.path.join(directory, filename): record
+                    for filename, record in records.items()}
+                return sorted(records), records
+
+        return sorted(glob.glob(os.path.join(directory, pattern))), {}
+
+    def get_blob_store(self, path, create=False, mode=None):
+        """Get the blob store in a directory, or None if the blob store is
+        disabled, or if the directory does not exist (and should not be
+        created) or is not writable."""
+        if not self.use_blob_store:
+            return None
+        if create and not os.path.isdir(path):
+            os.makedirs(path)
+            if mode is not None:
+                os.chmod(path, mode)
+        if not check_directory(path, write=True, execute=True):
+            self.log.warning("Not using the blob store, it does not exist or is not writable: %s", path)
+            return None
+        return BlobStore(path, log=self.log)
+
     def ensure_directory(self, path, mode):
         """Ensure that the path exists, has the right mode and is self owned."""
         if not os.path.isdir(path):
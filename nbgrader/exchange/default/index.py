@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import fnmatch
+import tempfile
+
+from typing import Dict, List, Optional, Tuple
+
+
+class SubmissionIndex(object):
+    """An append-only manifest of the submissions stored in an inbound or
+    cache directory of the exchange.
+
+    The manifest is a JSON lines file stored in the directory itself. Every
+    submission appends a single line to it, with the notebooks of the
+    submission, so that listing or collecting submissions only needs to list
+    the directory and read that file instead of scanning every submission
+    directory, which can be very slow on network file systems. When the
+    manifest and the directory disagree, :meth:`rebuild` rescans the
+    directory and atomically replaces the manifest.
+
+    Since students can write to the manifest of the inbound directory, it is
+    only used as a cache: the submissions are always the ones that exist in
+    the directory, the ones missing from the manifest are scanned, and only
+    valid submission names are accepted from it (the student, assignment and
+    timestamp are taken from the name).
+
+    """
+
+    #: Name of the manifest file inside the indexed directory
+    filename = ".nbgrader_submissions.jsonl"
+
+    _regexp = re.compile(
+        r"(?P<student_id>[^+]*)\+(?P<assignment_id>[^+]*)\+(?P<timestamp>[^+]*)(?P<random_string>\+.*)?$")
+
+    def __init__(self, directory: str, log=None) -> None:
+        self.directory = directory
+        self.path = os.path.join(directory, self.filename)
+        self.log = log
+
+    def _warn(self, msg: str, *args) -> None:
+        if self.log is not None:
+            self.log.warning(msg, *args)
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.path)
+
+    def _parse(self, entry: dict) -> dict:
+        filename = entry["filename"]
+        m = self._regexp.match(filename)
+        if m is None or not self._is_name(filename):
+            raise ValueError("invalid submission name")
+        notebooks = entry.get("notebooks", [])
+        if not isinstance(notebooks, list) or not all(
+                isinstance(x, str) and x.endswith(".ipynb") and self._is_name(x)
+                for x in notebooks):
+            raise ValueError("invalid notebooks")
+        return {
+            "op": "add",
+            "filename": filename,
+            "student_id": m.group("student_id"),
+            "assignment_id": m.group("assignment_id"),
+            "timestamp": m.group("timestamp"),
+            "notebooks": notebooks
+        }
+
+    @staticmethod
+    def _is_name(filename: str) -> bool:
+        # the name of an entry of the directory, not a path
+        return not (
+            os.sep in filename or (os.altsep and os.altsep in filename)
+            or "\0" in filename or filename in ("", ".", ".."))
+
+    def _read(self) -> Optional[Dict[str, dict]]:
+        try:
+            fh = open(self.path, "r")
+        except (FileNotFoundError, PermissionError):
+            return None
+
+        records = {}
+        with fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                    if entry.get("op", "add") != "add":
+                        # anyone can append to the manifest, so removals
+                        # are not recorded: removed submissions do not exist
+                        continue
+                    record = self._parse(entry)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    # an invalid or partially written line (e.g. after
+                    # a crash)
+                    self._warn("Ignoring invalid entry in %s: %r", self.path, line)
+                    continue
+                records[record["filename"]] = record
+
+        return records
+
+    def records(self, pattern: Optional[str] = None) -> Optional[Dict[str, dict]]:
+        """Read the manifest, and complete it with the submissions of the
+        directory which are missing from it.
+
+        Arguments
+        ---------
+        pattern:
+            A glob pattern that the names of the submissions must match
+
+        Returns
+        -------
+        records:
+            A dictionary mapping the names of the existing submission
+            directories to their records, or None if the directory is not
+            indexed
+
+        """
+        indexed = self._read()
+        if indexed is None:
+            return None
+        try:
+            names = os.listdir(self.directory)
+        except PermissionError:
+            # e.g. a student reading the inbound directory, who cannot see
+            # the submissions missing from the manifest either
+            names = [filename for filename in indexed
+                     if os.path.isdir(os.path.join(self.directory, filename))]
+
+        records = {}
+        for filename in names:
+            if pattern is not None and not fnmatch.fnmatchcase(filename, pattern):
+                continue
+            if filename in indexed:
+                records[filename] = indexed[filename]
+                continue
+            try:
+                record = self.make_record(filename)
+            except OSError:
+                # not a directory
+                continue
+            if record is not None:
+                self._warn(
+                    "Submission %s is missing from the submission index of %s, "
+                    "run `nbgrader list --rebuild-index` (with --inbound or "
+                    "--cached) to repair the index", filename, self.directory)
+                records[filename] = record
+        return records
+
+    def _append(self, entries: List[dict]) -> bool:
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            # the directory is not indexed
+            return False
+        try:
+            # a single write in append mode, so that concurrent submissions
+            # never interleave their entries
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        return True
+
+    def make_record(self, filename: str) -> Optional[dict]:
+        """Create the record of a submission directory from its name and the
+        notebooks it contains, or return None if the name is not the one of a
+        submission."""
+        m = self._regexp.match(filename)
+        if m is None:
+            return None
+        path = os.path.join(self.directory, filename)
+        notebooks = sorted(
+            entry.name for entry in os.scandir(path)
+            if entry.name.endswith(".ipynb") and entry.is_file())
+        return {
+            "op": "add",
+            "filename": filename,
+            "student_id": m.group("student_id"),
+            "assignment_id": m.group("assignment_id"),
+            "timestamp": m.group("timestamp"),
+            "notebooks": notebooks
+        }
+
+    def add(self, filename: str) -> bool:
+        """Record a new submission directory.
+
+        Arguments
+        ---------
+        filename:
+            The name of the submission directory
+
+        Returns
+        -------
+        added:
+            Whether the submission was recorded
+
+        """
+        record = self.make_record(filename)
+        if record is None:
+            return False
+        return self._append([record])
+
+    def scan(self) -> Dict[str, dict]:
+        """Scan the directory for submissions, ignoring the manifest."""
+        records = {}
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            record = self.make_record(entry.name)
+            if record is not None:
+                records[entry.name] = record
+        return records
+
+    def rebuild(self, mode: int = 0o644) -> Tuple[List[str], List[str]]:
+        """Rescan the directory and atomically replace the manifest.
+
+        Arguments
+        ---------
+        mode:
+            The permissions of the new manifest
+
+        Returns
+        -------
+        missing, stale:
+            The submissions that were missing from the previous manifest and
+            the ones that it listed but do not exist anymore
+
+        """
+        old_records = self._read() or {}
+        records = self.scan()
+
+        fd, tmp_path = tempfile.mkstemp(prefix=self.filename, dir=self.directory)
+        try:
+            with os.fdopen(fd, "w") as fh:
+                for filename in sorted(records):
+                    fh.write(json.dumps(records[filename]) + "\n")
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        missing = sorted(set(records) - set(old_records))
+        stale = sorted(set(old_records) - set(records))
+        return missing, stale
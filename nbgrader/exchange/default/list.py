@@ -2,37 +2,113 @@ import os
 import glob
 import shutil
 import re
-import hashlib
+
+from stat import S_IRUSR, S_IWUSR, S_IRGRP, S_IWGRP, S_IWOTH
+from textwrap import dedent
+
+from traitlets import Bool
 
 from nbgrader.exchange.abc import ExchangeList as ABCExchangeList
-from nbgrader.utils import notebook_hash, make_unique_key
+from nbgrader.utils import notebook_hash, make_unique_key, compute_file_hash, FileCache
 from .exchange import Exchange
+from .index import SubmissionIndex
+
+
+# The checksums of feedback files, which are only computed again if a file
+# changed since
+_checksum = FileCache(compute_file_hash)
 
 
-def _checksum(path):
-    m = hashlib.md5()
-    m.update(open(path, 'rb').read())
-    return m.hexdigest()
+def _has_file(listings, directory, filename):
+    """Check whether a file exists in a directory, which is listed only once
+    per set of listings. Students cannot list the feedback directory of the
+    exchange (it is only executable, so that each student can only open their
+    own feedback), in which case the file is checked directly."""
+    if directory not in listings:
+        try:
+            listings[directory] = set(os.listdir(directory))
+        except OSError:
+            listings[directory] = None
+    if listings[directory] is None:
+        return os.path.isfile(os.path.join(directory, filename))
+    return filename in listings[directory]
 
 
 class ExchangeList(ABCExchangeList, Exchange):
 
+    rebuild_index = Bool(
+        False,
+        help=dedent(
+            """
+            Rescan the inbound (or cache) directories and rewrite their
+            submission index before listing. This creates the index if it does
+            not exist yet, and repairs it if it disagrees with the directory.
+            """
+        )
+    ).tag(config=True)
+
+    check_feedback = Bool(
+        True,
+        help=dedent(
+            """
+            Whether to check, for each submitted assignment, whether feedback
+            has been released or already fetched. Turning this off makes
+            listing the inbound (or cached) submissions of large courses much
+            faster; the feedback status of the submissions is then unknown
+            (None).
+            """
+        )
+    ).tag(config=True)
+
     def init_src(self):
         pass
 
+    def _rebuild_index(self, directory):
+        if self.inbound:
+            # students may only append to the index of the inbound directory
+            if self.coursedir.groupshared:
+                mode = S_IRUSR | S_IWUSR | S_IRGRP | S_IWGRP | S_IWOTH
+            else:
+                mode = S_IRUSR | S_IWUSR | S_IWGRP | S_IWOTH
+        else:
+            mode = S_IRUSR | S_IWUSR | S_IRGRP
+        missing, stale = SubmissionIndex(directory, log=self.log).rebuild(mode=mode)
+        for filename in missing:
+            self.log.info("Added missing submission to the index: %s", filename)
+        for filename in stale:
+            self.log.info("Removed nonexistent submission from the index: %s", filename)
+        self.log.info(
+            "Rebuilt the submission index of %s (%d added, %d removed)",
+            directory, len(missing), len(stale))
+
     def init_dest(self):
         course_id = self.coursedir.course_id if self.coursedir.course_id else '*'
         assignment_id = self.coursedir.assignment_id if self.coursedir.assignment_id else '*'
         student_id = self.coursedir.student_id if self.coursedir.student_id else '*'
 
-        if self.inbound:
-            pattern = os.path.join(self.root, course_id, 'inbound', '{}+{}+*'.format(student_id, assignment_id))
-        elif self.cached:
-            pattern = os.path.join(self.cache, course_id, '{}+{}+*'.format(student_id, assignment_id))
+        self.submission_records = {}
+        if self.inbound or self.cached:
+            if self.inbound:
+                directories = glob.glob(os.path.join(self.root, course_id, 'inbound'))
+            else:
+                directories = glob.glob(os.path.join(self.cache, course_id))
+            if self.rebuild_index:
+                for directory in directories:
+                    self._rebuild_index(directory)
+
+            pattern = '{}+{}+*'.format(student_id, assignment_id)
+            self.assignments = []
+            for directory in directories:
+                paths, records = self.find_submissions(directory, pattern)
+                self.assignments.extend(paths)
+                self.submission_records.update(records)
+            self.assignments.sort()
+
         else:
+            if self.rebuild_index:
+                self.fail("The submission index can only be rebuilt with --inbound or --cached.")
             pattern = os.path.join(self.root, course_id, 'outbound', '{}'.format(assignment_id))
-
-        self.assignments = sorted(glob.glob(pattern))
+            self.assignments = sorted(glob.glob(pattern))
 
     def parse_assignment(self, assignment):
         if self.inbound:
@@ -49,7 +125,7 @@ class ExchangeList(ABCExchangeList, Exchange):
 
     def format_inbound_assignment(self, info):
         msg = "{course_id} {student_id} {assignment_id} {timestamp}".format(**info)
-        if info['status'] == 'submitted':
+        if info['status'] == 'submitted' and self.check_feedback:
             if info['has_local_feedback'] and not info['feedback_updated']:
                 msg += " (feedback already fetched)"
             elif info['has_exchange_feedback']:
@@ -73,6 +149,10 @@ class ExchangeList(ABCExchangeList, Exchange):
         else:
             courses = None
 
+        # the files of the feedback directories of the exchange, which are
+        # listed once rather than checked for every notebook
+        listings = {}
+
         assignments = []
         for path in self.assignments:
             info = self.parse_assignment(path)
@@ -97,11 +177,18 @@ class ExchangeList(ABCExchangeList, Exchange):
             if self.remove:
                 info['status'] = 'removed'
 
-            notebooks = sorted(glob.glob(os.path.join(info['path'], '*.ipynb')))
+            if path in self.submission_records:
+                notebooks = [
+                    os.path.join(path, notebook)
+                    for notebook in self.submission_records[path]['notebooks']]
+            else:
+                notebooks = sorted(glob.glob(os.path.join(info['path'], '*.ipynb')))
             if not notebooks:
                 self.log.warning("No notebooks found in {}".format(info['path']))
 
             info['notebooks'] = []
+            if info['status'] == 'submitted' and self.check_feedback:
+                submission_secret = self._read_submission_secret(path)
             for notebook in notebooks:
                 nb_info = {
                     'notebook_id': os.path.splitext(os.path.split(notebook)[1])[0],
@@ -111,68 +198,23 @@ class ExchangeList(ABCExchangeList, Exchange):
                     info['notebooks'].append(nb_info)
                     continue
 
-                nb_info['has_local_feedback'] = False
-                nb_info['has_exchange_feedback'] = False
-                nb_info['local_feedback_path'] = None
-                nb_info['feedback_updated'] = False
-
-                # Check whether feedback has been fetched already.
-                local_feedback_dir = os.path.join(
-                    assignment_dir, 'feedback', info['timestamp'])
-                local_feedback_path = os.path.join(
-                    local_feedback_dir, '{0}.html'.format(nb_info['notebook_id']))
-                has_local_feedback = os.path.isfile(local_feedback_path)
-                if has_local_feedback:
-                    local_feedback_checksum = _checksum(local_feedback_path)
+                if self.check_feedback:
+                    nb_info.update(self._notebook_feedback(
+                        info, notebook, nb_info['notebook_id'], assignment_dir,
+                        submission_secret, listings))
                 else:
-                    local_feedback_checksum = None
-
-                # Also look to see if there is feedback available to fetch.
-
-                # Check if a secret is provided
-                # If not, fall back to using make_unique_key
-                submission_secret_path = os.path.join(path, "submission_secret.txt")
-                if os.path.isfile(submission_secret_path):
-                    with open(submission_secret_path) as fh:
-                        submission_secret = fh.read()
-                    nb_hash = notebook_hash(secret=submission_secret, notebook_id=nb_info["notebook_id"])
-                    exchange_feedback_path = os.path.join(
-                        self.root, info['course_id'], 'feedback', '{0}.html'.format(nb_hash))
-                    has_exchange_feedback = os.path.isfile(exchange_feedback_path)
-                else:
-                    unique_key = make_unique_key(
-                        info['course_id'],
-                        info['assignment_id'],
-                        nb_info['notebook_id'],
-                        info['student_id'],
-                        info['timestamp'])
-                    self.log.debug("Unique key is: {}".format(unique_key))
-                    nb_hash = notebook_hash(notebook, unique_key)
-                    exchange_feedback_path = os.path.join(
-                        self.root, info['course_id'], 'feedback', '{0}.html'.format(nb_hash))
-                    has_exchange_feedback = os.path.isfile(exchange_feedback_path)
-                    if not has_exchange_feedback:
-                        # Try looking for legacy feedback.
-                        nb_hash = notebook_hash(notebook)
-                        exchange_feedback_path = os.path.join(
-                            self.root, info['course_id'], 'feedback', '{0}.html'.format(nb_hash))
-                        has_exchange_feedback = os.path.isfile(exchange_feedback_path)
-
-                if has_exchange_feedback:
-                    exchange_feedback_checksum = _checksum(exchange_feedback_path)
-                else:
-                    exchange_feedback_checksum = None
-
-                nb_info['has_local_feedback'] = has_local_feedback
-                nb_info['has_exchange_feedback'] = has_exchange_feedback
-                if has_local_feedback:
-                    nb_info['local_feedback_path'] = local_feedback_path
-                if has_local_feedback and has_exchange_feedback:
-                    nb_info['feedback_updated'] = exchange_feedback_checksum != local_feedback_checksum
+                    nb_info['has_local_feedback'] = None
+                    nb_info['has_exchange_feedback'] = None
+                    nb_info['local_feedback_path'] = None
+                    nb_info['feedback_updated'] = None
                 info['notebooks'].append(nb_info)
 
             if info['status'] == 'submitted':
-                if info['notebooks']:
+                if not self.check_feedback:
+                    has_local_feedback = None
+                    has_exchange_feedback = None
+                    feedback_updated = None
+                elif info['notebooks']:
                     has_local_feedback = all([nb['has_local_feedback'] for nb in info['notebooks']])
                     has_exchange_feedback = all([nb['has_exchange_feedback'] for nb in info['notebooks']])
                     feedback_updated = any([nb['feedback_updated'] for nb in info['notebooks']])
@@ -199,28 +241,86 @@ class ExchangeList(ABCExchangeList, Exchange):
 
         # partition the assignments into groups for course/student/assignment
         if self.inbound or self.cached:
-            _get_key = lambda info: (info['course_id'], info['student_id'], info['assignment_id'])
-            _match_key = lambda info, key: (
-                info['course_id'] == key[0] and
-                info['student_id'] == key[1] and
-                info['assignment_id'] == key[2])
-            assignment_keys = sorted(list(set([_get_key(info) for info in assignments])))
-            assignment_submissions = []
-            for key in assignment_keys:
-                submissions = [x for x in assignments if _match_key(x, key)]
-                submissions = sorted(submissions, key=lambda x: x['timestamp'])
-                info = {
-                    'course_id': key[0],
-                    'student_id': key[1],
-                    'assignment_id': key[2],
-                    'status': submissions[0]['status'],
-                    'submissions': submissions
-                }
-                assignment_submissions.append(info)
-            assignments = assignment_submissions
+            assignments = self.group_submissions(assignments)
 
         return assignments
 
+    def feedback_directory(self, course_id):
+        """The directory of the exchange to which feedback is released."""
+        return os.path.join(self.root, course_id, 'feedback')
+
+    def _read_submission_secret(self, path):
+        submission_secret_path = os.path.join(path, "submission_secret.txt")
+        if not os.path.isfile(submission_secret_path):
+            return None
+        with open(submission_secret_path) as fh:
+            return fh.read()
+
+    def _notebook_feedback(self, info, notebook, notebook_id, assignment_dir, submission_secret, listings):
+        """Determine whether feedback for a submitted notebook has been fetched
+        already, and whether feedback is available to fetch."""
+        feedback_file = '{0}.html'.format(notebook_id)
+
+        # Check whether feedback has been fetched already.
+        local_feedback_path = os.path.join(
+            assignment_dir, 'feedback', info['timestamp'], feedback_file)
+        has_local_feedback = os.path.isfile(local_feedback_path)
+
+        # Also look to see if there is feedback available to fetch.
+        exchange_feedback_dir = self.feedback_directory(info['course_id'])
+
+        # Check if a secret is provided
+        # If not, fall back to using make_unique_key
+        if submission_secret is not None:
+            nb_hash = notebook_hash(secret=submission_secret, notebook_id=notebook_id)
+        else:
+            unique_key = make_unique_key(
+                info['course_id'],
+                info['assignment_id'],
+                notebook_id,
+                info['student_id'],
+                info['timestamp'])
+            self.log.debug("Unique key is: {}".format(unique_key))
+            nb_hash = notebook_hash(notebook, unique_key)
+            if not _has_file(listings, exchange_feedback_dir, '{0}.html'.format(nb_hash)):
+                # Try looking for legacy feedback.
+                nb_hash = notebook_hash(notebook)
+        exchange_feedback_file = '{0}.html'.format(nb_hash)
+        has_exchange_feedback = _has_file(listings, exchange_feedback_dir, exchange_feedback_file)
+
+        # the feedback files are only compared when both exist
+        feedback_updated = False
+        if has_local_feedback and has_exchange_feedback:
+            exchange_feedback_path = os.path.join(exchange_feedback_dir, exchange_feedback_file)
+            feedback_updated = _checksum(exchange_feedback_path) != _checksum(local_feedback_path)
+
+        return {
+            'has_local_feedback': has_local_feedback,
+            'has_exchange_feedback': has_exchange_feedback,
+            'local_feedback_path': local_feedback_path if has_local_feedback else None,
+            'feedback_updated': feedback_updated
+        }
+
+    def group_submissions(self, assignments):
+        """Group the submissions by course, student and assignment, sorted by
+        their timestamps."""
+        groups = {}
+        for info in assignments:
+            key = (info['course_id'], info['student_id'], info['assignment_id'])
+            groups.setdefault(key, []).append(info)
+
+        assignment_submissions = []
+        for key in sorted(groups):
+            submissions = sorted(groups[key], key=lambda x: x['timestamp'])
+            assignment_submissions.append({
+                'course_id': key[0],
+                'student_id': key[1],
+                'assignment_id': key[2],
+                'status': submissions[0]['status'],
+                'submissions': submissions
+            })
+        return assignment_submissions
+
     def list_files(self):
         """List files."""
         assignments = self.parse_assignments()
@@ -251,7 +351,31 @@ class ExchangeList(ABCExchangeList, Exchange):
             for info in assignments:
                 self.log.info(self.format_outbound_assignment(info))
 
+        removed = {}
         for assignment in self.assignments:
             shutil.rmtree(assignment)
+            directory, filename = os.path.split(assignment)
+            removed.setdefault(directory, []).append(filename)
+
+        if self.inbound or self.cached:
+            for directory, filenames in removed.items():
+                # the removed submissions are not listed anymore, but rebuild
+                # the index so that it does not keep growing
+                if SubmissionIndex(directory, log=self.log).exists():
+                    try:
+                        self._rebuild_index(directory)
+                    except OSError as e:
+                        self.log.warning("Could not update the submission index of %s: %s", directory, e)
+
+                # remove the blobs that were only used by the removed submissions
+                if self.inbound:
+                    blobs_path = os.path.join(os.path.dirname(directory), 'blobs')
+                else:
+                    blobs_path = os.path.join(directory, '.blobs')
+                blob_store = self.get_blob_store(blobs_path) if os.path.isdir(blobs_path) else None
+                if blob_store is not None:
+                    removed_blobs = blob_store.prune()
+                    if removed_blobs > 0:
+                        self.log.info("Removed %d unused blobs from %s", removed_blobs, blobs_path)
 
         return assignments
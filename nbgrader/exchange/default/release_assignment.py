@@ -4,7 +4,7 @@ from stat import (
     S_IRUSR, S_IWUSR, S_IXUSR,
     S_IRGRP, S_IWGRP, S_IXGRP,
     S_IROTH, S_IWOTH, S_IXOTH,
-    S_ISGID, ST_MODE
+    S_ISGID, S_ISVTX, ST_MODE
 )
 
 
@@ -91,6 +91,14 @@ class ExchangeReleaseAssignment(Exchange, ABCExchangeReleaseAssignment):
             self.inbound_path,
             S_ISGID|S_IRUSR|S_IWUSR|S_IXUSR|S_IWGRP|S_IXGRP|S_IWOTH|S_IXOTH|(S_IRGRP if self.coursedir.groupshared else 0)
         )
+        if self.use_blob_store:
+            # 1733: students can add blobs but neither list nor delete the
+            # blobs of others
+            # groupshared: +0040
+            self.ensure_directory(
+                os.path.join(self.course_path, 'blobs'),
+                S_ISVTX|S_IRUSR|S_IWUSR|S_IXUSR|S_IWGRP|S_IXGRP|S_IWOTH|S_IXOTH|(S_IRGRP if self.coursedir.groupshared else 0)
+            )
 
     def copy_files(self):
         if os.path.isdir(self.dest_path):
@@ -38,7 +38,8 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
             exclude_students = set()
 
         html_files = glob.glob(os.path.join(self.src_path, "*.html"))
-        for html_file in html_files:
+        self.report_progress(0, len(html_files))
+        for done, html_file in enumerate(html_files, 1):
             regexp = re.escape(os.path.sep).join([
                 self.coursedir.format_path(
                     self.coursedir.feedback_directory,
@@ -51,13 +52,20 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
             if m is None:
                 msg = "Could not match '%s' with regexp '%s'" % (html_file, regexp)
                 self.log.error(msg)
+                self.report_progress(done, len(html_files))
                 continue
 
             gd = m.groupdict()
             student_id = gd['student_id']
             notebook_id = gd['notebook_id']
+            item = {
+                'assignment_id': self.coursedir.assignment_id,
+                'student_id': student_id,
+                'notebook_id': notebook_id
+            }
             if student_id in exclude_students:
                 self.log.debug("Skipping student '{}'".format(student_id))
+                self.report_progress(done, len(html_files), item)
                 continue
 
             feedback_dir = os.path.split(html_file)[0]
@@ -73,3 +81,4 @@ class ExchangeReleaseFeedback(Exchange, ABCExchangeReleaseFeedback):
                 student_id, self.coursedir.course_id, self.coursedir.assignment_id, notebook_id, timestamp))
             shutil.copy(html_file, dest)
             self.log.info("Feedback released to: {}".format(dest))
+            self.report_progress(done, len(html_files), item)
@@ -12,6 +12,7 @@ from nbgrader.exchange.abc import ExchangeSubmit as ABCExchangeSubmit
 from traitlets import Bool
 
 from .exchange import Exchange
+from .index import SubmissionIndex
 from nbgrader.utils import get_username, check_mode, find_all_notebooks
 
 
@@ -120,6 +121,20 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
                     "".format(self.coursedir.assignment_id, diff_msg)
                 )
 
+    def update_index(self, directory, filename):
+        """Record a submission in the submission index of a directory."""
+        try:
+            SubmissionIndex(directory, log=self.log).add(filename)
+        except OSError as e:
+            self.log.warning("Could not update the submission index of %s: %s", directory, e)
+
+    def remove_submitted_metadata(self, path):
+        """Remove the metadata files that were copied along with the
+        submission, so that writing them does not modify a shared blob."""
+        for filename in ("timestamp.txt", "submission_secret.txt"):
+            if os.path.lexists(os.path.join(path, filename)):
+                os.remove(os.path.join(path, filename))
+
     def copy_files(self):
         self.init_release()
         submission_secret = secrets.token_hex(64)
@@ -135,7 +150,9 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
 
         # copy to the real location
         self.check_filename_diff()
-        self.do_copy(self.src_path, dest_path)
+        blob_store = self.get_blob_store(os.path.join(self.root, self.coursedir.course_id, 'blobs'))
+        self.do_copy(self.src_path, dest_path, blob_store=blob_store)
+        self.remove_submitted_metadata(dest_path)
         with open(os.path.join(dest_path, "timestamp.txt"), "w") as fh:
             fh.write(self.timestamp)
         with open(os.path.join(dest_path, "submission_secret.txt"), "w") as fh:
@@ -151,14 +168,22 @@ class ExchangeSubmit(Exchange, ABCExchangeSubmit):
             S_IRUSR|S_IWUSR|S_IXUSR|S_IRGRP|S_IWGRP|S_IXGRP|S_IROTH|S_IWOTH|S_IXOTH
         )
 
+        # record the submission in the index of the inbound directory, if
+        # the instructor created one
+        self.update_index(self.inbound_path, self.assignment_filename)
+
         # also copy to the cache
         if not os.path.isdir(self.cache_path):
             os.makedirs(self.cache_path)
-        self.do_copy(self.src_path, cache_path)
+        blob_store = self.get_blob_store(
+            os.path.join(self.cache_path, '.blobs'), create=True, mode=S_IRUSR|S_IWUSR|S_IXUSR)
+        self.do_copy(self.src_path, cache_path, blob_store=blob_store)
+        self.remove_submitted_metadata(cache_path)
         with open(os.path.join(cache_path, "timestamp.txt"), "w") as fh:
             fh.write(self.timestamp)
         with open(os.path.join(cache_path, "submission_secret.txt"), "w") as fh:
             fh.write(submission_secret)
+        self.update_index(self.cache_path, os.path.basename(cache_path))
 
         self.log.info("Submitted as: {} {} {}".format(
             self.coursedir.course_id, self.coursedir.assignment_id, str(self.timestamp)
@@ -1,6 +1,6 @@
 from .base import BasePlugin
 from .latesubmission import LateSubmissionPlugin
-from .export import ExportPlugin, CsvExportPlugin
+from .export import ExportPlugin, CsvExportPlugin, JsonLinesExportPlugin, ParquetExportPlugin
 from .zipcollect import ExtractorPlugin, FileNameCollectorPlugin
 
 __all__ = [
@@ -8,5 +8,7 @@ __all__ = [
     "ExportPlugin",
     "ExtractorPlugin",
     "FileNameCollectorPlugin",
+    "JsonLinesExportPlugin",
     "LateSubmissionPlugin",
+    "ParquetExportPlugin",
 ]
@@ -1,7 +1,10 @@
-from traitlets import Unicode, List
+import csv
+import json
+
+from traitlets import Unicode, List, Integer
 
 from .base import BasePlugin
-from ..api import MissingEntry, Gradebook
+from ..api import Gradebook
 
 
 class ExportPlugin(BasePlugin):
@@ -15,6 +18,51 @@ class ExportPlugin(BasePlugin):
     assignment = List(
         [], help="list of assignments to export").tag(config=True)
 
+    #: The names of the fields of each exported grade
+    keys = [
+        "assignment",
+        "duedate",
+        "timestamp",
+        "student_id",
+        "last_name",
+        "first_name",
+        "email",
+        "raw_score",
+        "late_submission_penalty",
+        "score",
+        "max_score"
+    ]
+
+    def get_grades(self, gradebook: Gradebook):
+        """Get the grades of the students and assignments selected with
+        ``self.student`` and ``self.assignment``, one dictionary (with the
+        keys listed in ``self.keys``) per student and assignment. The grades
+        are streamed from the database, so they should be written out one at
+        a time rather than collected in memory.
+
+        Arguments
+        ---------
+        gradebook:
+            An instance of the gradebook
+
+        """
+        if len(self.student) == 0:
+            allstudents = None
+        else:
+            # make sure studentID(s) are a list of strings
+            allstudents = [str(item) for item in self.student]
+            self.log.info("Exporting only students: %s", allstudents)
+
+        if len(self.assignment) == 0:
+            allassignments = None
+        else:
+            # make sure assignment(s) are a list of strings
+            allassignments = [str(item) for item in self.assignment]
+            self.log.info("Exporting only assignments: %s", allassignments)
+
+        return gradebook.grade_dicts(
+            assignments=allassignments, students=allstudents)
+
     def export(self, gradebook: Gradebook) -> None:
         """Export grades to another format.
 
@@ -41,92 +89,83 @@ class CsvExportPlugin(ExportPlugin):
         else:
             dest = self.to
 
-        if len(self.student) == 0:
-            allstudents = []
-        else:
-            # make sure studentID(s) are a list of strings
-            allstudents = [str(item) for item in self.student]
+        self.log.info("Exporting grades to %s", dest)
+        with open(dest, "w", newline="") as fh:
+            writer = csv.writer(fh, lineterminator="\n")
+            writer.writerow(self.keys)
 
-        if len(self.assignment) == 0:
-            allassignments = []
+            # write each grade as soon as it comes out of the database, so
+            # that the whole grade matrix never has to be held in memory
+            for score in self.get_grades(gradebook):
+                writer.writerow(
+                    ['' if score[key] is None else str(score[key]) for key in self.keys])
+
+
+class JsonLinesExportPlugin(ExportPlugin):
+    """JSON lines exporter plugin, which writes one JSON object per grade."""
+
+    def export(self, gradebook: Gradebook) -> None:
+        if self.to == "":
+            dest = "grades.jsonl"
         else:
-            # make sure assignment(s) are a list of strings
-            allassignments = [str(item) for item in self.assignment]
+            dest = self.to
 
         self.log.info("Exporting grades to %s", dest)
-        if allassignments:
-            self.log.info("Exporting only assignments: %s", allassignments)
+        with open(dest, "w") as fh:
+            for score in self.get_grades(gradebook):
+                for key in ("duedate", "timestamp"):
+                    if score[key] is not None:
+                        score[key] = score[key].isoformat()
+                fh.write(json.dumps(score) + "\n")
+
+
+class ParquetExportPlugin(ExportPlugin):
+    """Parquet exporter plugin. This requires pyarrow to be installed."""
+
+    batch_size = Integer(
+        10000,
+        help="The number of grades written to each row group of the Parquet file"
+    ).tag(config=True)
+
+    def _schema(self):
+        import pyarrow as pa
+
+        return pa.schema([
+            ("assignment", pa.string()),
+            ("duedate", pa.timestamp("us")),
+            ("timestamp", pa.timestamp("us")),
+            ("student_id", pa.string()),
+            ("last_name", pa.string()),
+            ("first_name", pa.string()),
+            ("email", pa.string()),
+            ("raw_score", pa.float64()),
+            ("late_submission_penalty", pa.float64()),
+            ("score", pa.float64()),
+            ("max_score", pa.float64()),
+        ])
 
-        if allstudents:
-            self.log.info("Exporting only students: %s", allstudents)
+    def export(self, gradebook: Gradebook) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError(
+                "Exporting grades to Parquet requires pyarrow, "
+                "which can be installed with `pip install pyarrow`")
 
-        fh = open(dest, "w")
-        keys = [
-            "assignment",
-            "duedate",
-            "timestamp",
-            "student_id",
-            "last_name",
-            "first_name",
-            "email",
-            "raw_score",
-            "late_submission_penalty",
-            "score",
-            "max_score"
-        ]
-        fh.write(",".join(keys) + "\n")
-        fmt = ",".join(["{" + x + "}" for x in keys]) + "\n"
-
-        # Loop over each assignment in the database
-        for assignment in gradebook.assignments:
-
-            # only continue if assignment is required
-            if allassignments and assignment.name not in allassignments:
-                continue
-
-            # Loop over each student in the database
-            for student in gradebook.students:
-
-                # only continue if student is required
-                if allstudents and student.id not in allstudents:
-                    continue
-
-                # Create a dictionary that will store information 
-                # about this student's submitted assignment
-                score = {}
-                score['assignment'] = assignment.name
-                score['duedate'] = assignment.duedate
-                score['student_id'] = student.id
-                score['last_name'] = student.last_name
-                score['first_name'] = student.first_name
-                score['email'] = student.email
-                score['max_score'] = assignment.max_score
-
-                # Try to find the submission in the database. If it
-                # doesn't exist, the `MissingEntry` exception will be
-                # raised, which means the student didn't submit 
-                # anything, so we assign them a score of zero.
-                try:
-                    submission = gradebook.find_submission(
-                        assignment.name, student.id)
-                except MissingEntry:
-                    score['timestamp'] = ''
-                    score['raw_score'] = 0.0
-                    score['late_submission_penalty'] = 0.0
-                    score['score'] = 0.0
-                else:
-                    penalty = submission.late_submission_penalty
-                    score['timestamp'] = submission.timestamp
-                    score['raw_score'] = submission.score
-                    score['late_submission_penalty'] = penalty
-                    score['score'] = max(0.0, submission.score - penalty)
-
-                for key in score:
-                    if score[key] is None:
-                        score[key] = ''
-                    if not isinstance(score[key], str):
-                        score[key] = str(score[key])
-
-                fh.write(fmt.format(**score))
-
-        fh.close()
+        if self.to == "":
+            dest = "grades.parquet"
+        else:
+            dest = self.to
+
+        self.log.info("Exporting grades to %s", dest)
+        schema = self._schema()
+        with pq.ParquetWriter(dest, schema) as writer:
+            batch = []
+            for score in self.get_grades(gradebook):
+                batch.append(score)
+                if len(batch) == self.batch_size:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    batch = []
+            if len(batch) > 0:
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
@@ -1,10 +1,12 @@
 import os
 import re
 import shutil
+import zipfile
 
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
-from traitlets import Bool, List, Unicode
-from typing import Optional
+from traitlets import Bool, Integer, List, Unicode
+from typing import Dict, Optional, Tuple
 
 from .base import BasePlugin
 from ..utils import unzip
@@ -32,7 +34,71 @@ class ExtractorPlugin(BasePlugin):
         )
     ).tag(config=True)
 
-    def extract(self, archive_path: str, extracted_path: str) -> None:
+    parallelism = Integer(
+        4,
+        help=dedent(
+            """
+            The number of archive files extracted (or other files copied) at
+            the same time. A value of zero uses one thread per CPU.
+            """
+        )
+    ).tag(config=True)
+
+    stream = Bool(
+        default_value=False,
+        help=dedent(
+            """
+            Do not extract the zip archives that do not contain other archives;
+            instead, the submission files they contain are read directly from
+            the archives when they are collected. The files are collected as
+            if they had been extracted, but only the files that are actually
+            collected are ever written to disk. This requires the collector
+            plugin to only use the names of the submission files.
+            """
+        )
+    ).tag(config=True)
+
+    def _num_workers(self) -> int:
+        return self.parallelism if self.parallelism > 0 else (os.cpu_count() or 1)
+
+    def _list_members(self, zfile: str, extract_to: str) -> Optional[Dict[str, Tuple[str, str]]]:
+        """List the files of a zip archive, keyed by the paths they would be
+        extracted to, or return None if the archive cannot be streamed."""
+        if not zipfile.is_zipfile(zfile):
+            return None
+        members = {}
+        with zipfile.ZipFile(zfile) as zf:
+            for name in zf.namelist():
+                # same rules as when extracting the archive
+                if name.startswith('/') or '..' in name.split('/') or name.endswith('/'):
+                    continue
+                if os.path.splitext(name)[1] in self.zip_ext:
+                    # archives within the archive need to be extracted
+                    return None
+                members[os.path.join(extract_to, *name.split('/'))] = (zfile, name)
+        return members
+
+    def _extract_archives(self, archives: list) -> None:
+        # archives that are extracted into the same directory are extracted
+        # one after the other, as they would overwrite each others' files
+        for zfile, extract_to, filename in archives:
+            self.log.info("Extracting from: {}".format(zfile))
+            self.log.info("  Extracting to: {}".format(
+                os.path.join(extract_to, filename)))
+            unzip(
+                zfile,
+                extract_to,
+                zip_ext=self.zip_ext,
+                create_own_folder=True,
+                tree=True
+            )
+
+    def _copy(self, src: str, dest: str) -> None:
+        self.log.debug("Copying from: {}".format(src))
+        self.log.debug("  Copying to: {}".format(dest))
+        shutil.copy(src, dest)
+
+    def extract(self, archive_path: str, extracted_path: str) -> Optional[Dict[str, Tuple[str, str]]]:
         """Extract archive (zip) files and submission files in the
         `archive_directory`. Files are extracted to the `extracted_directory`.
         Non-archive (zip) files found in the `archive_directory` are copied to
@@ -47,12 +113,22 @@ class ExtractorPlugin(BasePlugin):
             Absolute path to the `archive_directory`.
         extracted_path:
             Absolute path to the `extracted_directory`.
+
+        Returns
+        -------
+        streamed_files:
+            When streaming (see `stream`), the files of the archives that were
+            not extracted, keyed by the path they would have been extracted
+            to, as (archive file, name in the archive) tuples.
         """
+        streamed_files = {}
         if not os.listdir(archive_path):
             self.log.warning(
                 "No files found in directory: {}".format(archive_path))
-            return
+            return streamed_files
 
+        archives = {}
+        copies = []
         for root, _, archive_files in os.walk(archive_path):
             if not archive_files:
                 continue
@@ -73,23 +149,33 @@ class ExtractorPlugin(BasePlugin):
                     fname, ext = os.path.splitext(os.path.basename(filename))
                     if ext == '.tar':
                         filename = fname
-                    self.log.info("Extracting from: {}".format(zfile))
-                    self.log.info("  Extracting to: {}".format(
-                        os.path.join(extract_to, filename)))
-                    unzip(
-                        zfile,
-                        extract_to,
-                        zip_ext=self.zip_ext,
-                        create_own_folder=True,
-                        tree=True
-                    )
+                    dest = os.path.join(extract_to, filename)
+                    members = self._list_members(zfile, dest) if self.stream else None
+                    if members is not None:
+                        self.log.info("Streaming from: {} ({} files)".format(zfile, len(members)))
+                        streamed_files.update(members)
+                    else:
+                        archives.setdefault(dest, []).append((zfile, extract_to, filename))
 
                 # move each non-archive file in archive_path
                 else:
-                    dest = os.path.join(extract_to, os.path.basename(zfile))
-                    self.log.info("Copying from: {}".format(zfile))
-                    self.log.info("  Copying to: {}".format(dest))
-                    shutil.copy(zfile, dest)
+                    copies.append((zfile, os.path.join(extract_to, os.path.basename(zfile))))
+
+        with ThreadPoolExecutor(max_workers=self._num_workers()) as pool:
+            futures = [pool.submit(self._extract_archives, a) for a in archives.values()]
+            futures.extend(pool.submit(self._copy, src, dest) for src, dest in copies)
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        self.log.info(
+            "Extracted {} archive files and copied {} other files".format(
+                sum(len(a) for a in archives.values()), len(copies)))
+        return streamed_files
 
 
 class FileNameCollectorPlugin(BasePlugin):
@@ -132,6 +218,14 @@ class FileNameCollectorPlugin(BasePlugin):
         )
     ).tag(config=True)
 
+    def _compiled_regexp(self) -> 're.Pattern':
+        # compiled once (and again if the regexp is changed), as it is
+        # applied to every submitted file
+        regexp = getattr(self, '_regexp', None)
+        if regexp is None or regexp.pattern != self.named_regexp:
+            regexp = self._regexp = re.compile(self.named_regexp)
+        return regexp
+
     def _match(self, filename: str) -> Optional[dict]:
         """Match the named group regular expression to the beginning of the
         filename and return the match groupdict or None if no match.
@@ -143,7 +237,7 @@ class FileNameCollectorPlugin(BasePlugin):
             )
             return None
 
-        match = re.match(self.named_regexp, filename)
+        match = self._compiled_regexp().match(filename)
         if not match or not match.groups():
             self.log.warning(
                 "Regular expression '{}' did not match anything in: {}"
@@ -1,8 +1,15 @@
 from nbconvert.preprocessors import Preprocessor
 from traitlets import List, Unicode, Bool
 
+from ..tracing import span
+
 class NbGraderPreprocessor(Preprocessor):
 
     default_language = Unicode('ipython')
     display_data_priority = List(['text/html', 'application/pdf', 'text/latex', 'image/svg+xml', 'image/png', 'image/jpeg', 'text/plain'])
     enabled = Bool(True, help="Whether to use this preprocessor when running nbgrader").tag(config=True)
+
+    def __call__(self, nb, resources):
+        notebook = (resources or {}).get('nbgrader', {}).get('notebook')
+        with span(type(self).__name__, "preprocessor", notebook=notebook):
+            return super(NbGraderPreprocessor, self).__call__(nb, resources)
@@ -1,11 +1,21 @@
+import collections
+import json
+import multiprocessing.util
+import os
+import time
+
 from nbconvert.preprocessors import ExecutePreprocessor, CellExecutionError
-from traitlets import Bool, List, Dict, Integer, validate, TraitError
+from traitlets import Bool, List, Dict, Integer, Enum, Unicode, validate, TraitError
 from textwrap import dedent
 
 from . import NbGraderPreprocessor
+from ..tracing import span
 from nbconvert.exporters.exporter import ResourcesDict
 from nbformat.notebooknode import NotebookNode
+from jupyter_client.kernelspec import KernelSpecManager, NoSuchKernel, NATIVE_KERNEL_NAME
 from jupyter_client.manager import AsyncKernelManager
+from jupyter_core.utils import run_sync
+from logging import Logger
 from typing import Any, Optional, Tuple
 
 
@@ -13,6 +23,200 @@ class UnresponsiveKernelError(Exception):
     pass
 
 
+class PooledKernel(object):
+    """A kernel owned by a :class:`KernelPool`."""
+
+    def __init__(self, km: AsyncKernelManager) -> None:
+        self.km = km
+        self.kc = None
+        self.uses = 0
+        self.launched = time.monotonic()
+
+
+class KernelPool(object):
+    """A pool of pre-started kernels for a single kernelspec (and process
+    environment).
+
+    Kernels are launched ahead of time so that their startup, as well as any
+    warm-up code (e.g. importing large libraries), overlaps with the execution
+    of the previous notebook. Once a kernel has executed a notebook it is
+    either restarted (the default, which guarantees that no state leaks from
+    one student to the next) or reset, and it is replaced by a brand new
+    kernel after ``max_uses`` notebooks.
+
+    """
+
+    def __init__(self,
+                 kernel_name: str,
+                 size: int,
+                 max_uses: int,
+                 reset_strategy: str,
+                 warmup_code: str,
+                 reset_code: str,
+                 extra_arguments: list,
+                 startup_timeout: int,
+                 log: Logger) -> None:
+        self.kernel_name = kernel_name
+        self.size = size
+        self.max_uses = max_uses
+        self.reset_strategy = reset_strategy
+        self.warmup_code = warmup_code
+        self.reset_code = reset_code
+        self.extra_arguments = extra_arguments
+        self.startup_timeout = startup_timeout
+        self.log = log
+
+        self.idle = collections.deque()
+        self.busy = set()
+
+        # metrics, in seconds
+        self.startup_times = []
+        self.wait_times = []
+        self.execution_times = []
+
+    def _launch(self) -> PooledKernel:
+        km = AsyncKernelManager(kernel_name=self.kernel_name)
+        run_sync(km.start_kernel)(extra_arguments=self.extra_arguments, env=os.environ.copy())
+        kernel = PooledKernel(km)
+        self._warm_up(kernel)
+        self.log.debug("Launched pooled kernel %s (%s)", km.kernel_id, self.kernel_name)
+        return kernel
+
+    def _warm_up(self, kernel: PooledKernel, code: str = "") -> None:
+        # the kernel may still be starting up: the request is queued and
+        # executed as soon as it is ready, before any other request we send
+        kernel.launched = time.monotonic()
+        kernel.kc = kernel.km.client()
+        kernel.kc.start_channels()
+        code = "\n".join(x for x in [code, self.warmup_code] if x)
+        if code:
+            kernel.kc.execute(code, silent=True, store_history=False)
+
+    def _shutdown(self, kernel: PooledKernel) -> None:
+        if kernel.kc is not None:
+            kernel.kc.stop_channels()
+            kernel.kc = None
+        try:
+            run_sync(kernel.km.shutdown_kernel)(now=True)
+        except RuntimeError:
+            pass
+        finally:
+            run_sync(kernel.km.cleanup_resources)()
+
+    def _fill(self) -> None:
+        # kernels that are reset (rather than restarted) are ready again as
+        # soon as they are returned, so there is no need to launch new ones
+        # in their place
+        returning = 0
+        if self.reset_strategy == 'reset':
+            returning = len([k for k in self.busy if k.uses + 1 < self.max_uses])
+        while len(self.idle) + returning < self.size:
+            self.idle.append(self._launch())
+
+    def _run(self, kernel: PooledKernel, code: str) -> None:
+        async def run() -> None:
+            msg_id = kernel.kc.execute(code, silent=True, store_history=False)
+            while True:
+                reply = await kernel.kc.get_shell_msg(timeout=self.startup_timeout)
+                if reply['parent_header'].get('msg_id') == msg_id:
+                    break
+            if reply['content']['status'] != 'ok':
+                raise RuntimeError("Could not prepare pooled kernel: {}".format(
+                    reply['content'].get('evalue', '')))
+
+        run_sync(run)()
+
+    def acquire(self, path: str) -> PooledKernel:
+        """Get a ready kernel whose working directory is ``path``."""
+        start = time.monotonic()
+        kernel = self.idle.popleft() if self.idle else self._launch()
+
+        try:
+            # once the kernel replies, all the queued warm-up code has run
+            run_sync(kernel.kc.wait_for_ready)(timeout=self.startup_timeout)
+            ready = time.monotonic()
+            self._run(kernel, "import os as __os; __os.chdir({!r}); del __os".format(path))
+        except BaseException:
+            self._shutdown(kernel)
+            raise
+        finally:
+            if kernel.kc is not None:
+                kernel.kc.stop_channels()
+                kernel.kc = None
+
+        self.startup_times.append(ready - kernel.launched)
+        self.wait_times.append(ready - start)
+        self.busy.add(kernel)
+
+        # start the next kernels while this one is executing
+        self._fill()
+        return kernel
+
+    def release(self, kernel: PooledKernel, execution_time: float, discard: bool = False) -> None:
+        """Return a kernel to the pool after it has executed a notebook. If
+        ``discard`` is true (e.g. because the execution failed), the kernel is
+        shut down rather than reused."""
+        self.busy.discard(kernel)
+        self.execution_times.append(execution_time)
+        self.log.info(
+            "Kernel startup latency %.2fs (waited %.2fs), cell execution %.2fs",
+            self.startup_times[-1], self.wait_times[-1], execution_time)
+
+        kernel.uses += 1
+        if discard or kernel.uses >= self.max_uses or len(self.idle) >= self.size:
+            self._shutdown(kernel)
+        elif self.reset_strategy == 'restart':
+            run_sync(kernel.km.restart_kernel)(now=True)
+            self._warm_up(kernel)
+            self.idle.append(kernel)
+        else:
+            self._warm_up(kernel, self.reset_code)
+            self.idle.append(kernel)
+
+        self._fill()
+
+    def shutdown(self) -> None:
+        """Shut down all the kernels in the pool."""
+        for kernel in list(self.idle) + list(self.busy):
+            self._shutdown(kernel)
+        self.idle.clear()
+        self.busy.clear()
+
+        if len(self.execution_times) > 0:
+            n = len(self.execution_times)
+            self.log.info(
+                "Kernel pool '%s' ran %d notebooks: mean kernel startup "
+                "latency %.2fs (mean wait %.2fs, max wait %.2fs), mean cell "
+                "execution %.2fs",
+                self.kernel_name, n,
+                sum(self.startup_times) / n, sum(self.wait_times) / n,
+                max(self.wait_times), sum(self.execution_times) / n)
+
+        self.startup_times = []
+        self.wait_times = []
+        self.execution_times = []
+
+
+# kernel pools of this process, keyed by kernelspec name and environment
+_kernel_pools = {}
+
+
+def shutdown_kernel_pools() -> None:
+    """Shut down every kernel pool created by this process."""
+    while _kernel_pools:
+        _, pool = _kernel_pools.popitem()
+        pool.shutdown()
+
+
+def _forget_kernel_pools() -> None:
+    # forked processes must not use (or shut down) their parent's kernels
+    _kernel_pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_kernel_pools)
+
+
 class Execute(NbGraderPreprocessor, ExecutePreprocessor):
 
     timeout = Integer(
@@ -68,10 +272,270 @@ class Execute(NbGraderPreprocessor, ExecutePreprocessor):
         """)
     ).tag(config=True)
 
+    kernel_pool_size = Integer(0, help=dedent(
+        """
+        The number of idle, pre-started kernels to keep ready for each
+        kernelspec. Kernels are started (and run ``kernel_warmup_code``)
+        while the previous notebook executes, which hides kernel startup
+        time when autograding many submissions. Only Python kernels are
+        pooled. Zero disables the pool, starting a fresh kernel for every
+        notebook.
+        """)
+    ).tag(config=True)
+
+    kernel_pool_max_uses = Integer(10, help=dedent(
+        """
+        The number of notebooks a pooled kernel executes before it is shut down
+        and replaced by a newly started kernel.
+        """)
+    ).tag(config=True)
+
+    kernel_reset_strategy = Enum(['restart', 'reset'], default_value='restart', help=dedent(
+        """
+        How a pooled kernel is cleaned up before executing the next notebook.
+        'restart' restarts the kernel process in the background, so no state
+        can leak between students. 'reset' runs ``kernel_reset_code`` in the
+        same process, which is faster but only clears the user namespace
+        (imported modules and other interpreter state are kept).
+        """)
+    ).tag(config=True)
+
+    kernel_reset_code = Unicode("get_ipython().reset(new_session=True, aggressive=True)", help=dedent(
+        """
+        The code used to reset a pooled kernel when ``kernel_reset_strategy``
+        is 'reset'.
+        """)
+    ).tag(config=True)
+
+    kernel_warmup_code = Unicode("", help=dedent(
+        """
+        Code run silently in every pooled kernel before it is used, for
+        example ``import numpy, pandas`` to preload libraries that most
+        submissions import.
+        """)
+    ).tag(config=True)
+
+    max_cell_output_bytes = Integer(-1, help=dedent(
+        """
+        The maximum number of bytes of output (stream text, and the data of
+        rich outputs like images) kept for a single cell. The limit is
+        enforced while the cell executes, as the output arrives from the
+        kernel, so that a submission printing in an endless loop cannot
+        exhaust the memory of the autograder. Output beyond the limit is
+        discarded and replaced by a truncation marker. Errors are always
+        kept. -1 (the default) means no limit; to enable it, set e.g.
+        ``c.Execute.max_cell_output_bytes = 10 * 1024 * 1024`` in
+        ``nbgrader_config.py``.
+        """)
+    ).tag(config=True)
+
+    max_cell_output_lines = Integer(-1, help=dedent(
+        """
+        The maximum number of lines of stream output kept for a single cell,
+        enforced while the cell executes (see ``max_cell_output_bytes``).
+        -1 (the default) means no limit.
+        """)
+    ).tag(config=True)
+
+    max_notebook_output_bytes = Integer(-1, help=dedent(
+        """
+        The maximum number of bytes of output kept for the whole notebook,
+        enforced while the notebook executes (see ``max_cell_output_bytes``).
+        -1 (the default) means no limit.
+        """)
+    ).tag(config=True)
+
+    @validate('kernel_pool_size', 'kernel_pool_max_uses')
+    def _validate_kernel_pool(self, proposal):
+        minimum = 0 if proposal['trait'].name == 'kernel_pool_size' else 1
+        if proposal['value'] < minimum:
+            raise TraitError("{} must be at least {}".format(proposal['trait'].name, minimum))
+        return proposal['value']
+
     def __init__(self, *args, **kwargs):
         # nbconvert < 7.3.1 used the sync version of this, which doesn't work for us.
         kwargs.setdefault('kernel_manager_class', AsyncKernelManager)
         super().__init__(*args, **kwargs)
+        self._execution_time = 0.0
+        self._reset_output_budget(notebook=True)
+
+    def _reset_output_budget(self, notebook: bool = False) -> None:
+        self._cell_output_bytes = 0
+        self._cell_output_lines = 0
+        self._cell_output_truncated = False
+        if notebook:
+            self._notebook_output_bytes = 0
+
+    def _get_kernel_pool(self, nb: NotebookNode) -> Optional[KernelPool]:
+        kernel_name = self.kernel_name or nb.metadata.get('kernelspec', {}).get('name')
+        if not kernel_name or kernel_name == 'python':
+            kernel_name = NATIVE_KERNEL_NAME
+        key = (kernel_name, hash(frozenset(os.environ.items())))
+        if key in _kernel_pools:
+            return _kernel_pools[key]
+
+        try:
+            language = KernelSpecManager().get_kernel_spec(kernel_name).language
+        except NoSuchKernel:
+            return None
+        if language.lower() != 'python':
+            self.log.debug("Not pooling kernels for non-Python kernel '%s'", kernel_name)
+            return None
+
+        pool = KernelPool(
+            kernel_name, self.kernel_pool_size, self.kernel_pool_max_uses,
+            self.kernel_reset_strategy, self.kernel_warmup_code,
+            self.kernel_reset_code,
+            self.extra_arguments + ["--HistoryManager.hist_file=:memory:"],
+            self.startup_timeout, self.log)
+        _kernel_pools[key] = pool
+
+        # make sure kernels are shut down when the process (or a worker
+        # process of a multiprocessing pool) exits
+        multiprocessing.util.Finalize(pool, pool.shutdown, exitpriority=10)
+        return pool
+
+    def preprocess(self,
+                   nb: NotebookNode,
+                   resources: ResourcesDict,
+                   km: Optional[AsyncKernelManager] = None
+                   ) -> Tuple[NotebookNode, ResourcesDict]:
+        self._reset_output_budget(notebook=True)
+        pool = None
+        if km is None and self.kernel_pool_size > 0:
+            pool = self._get_kernel_pool(nb)
+        if pool is None:
+            return super(Execute, self).preprocess(nb, resources, km=km)
+
+        path = (resources or {}).get('metadata', {}).get('path') or os.getcwd()
+        with span("acquire_kernel", "kernel"):
+            kernel = pool.acquire(os.path.abspath(path))
+        self._execution_time = 0.0
+        failed = True
+        try:
+            output = super(Execute, self).preprocess(nb, resources, km=kernel.km)
+            failed = False
+        finally:
+            # the kernel client is not cleaned up when we provide the kernel manager
+            if self.kc is not None:
+                self.kc.stop_channels()
+            self.kc = None
+            self.km = None
+            with span("release_kernel", "kernel"):
+                pool.release(kernel, self._execution_time, discard=failed)
+
+        return output
+
+    def preprocess_cell(self,
+                        cell: NotebookNode,
+                        resources: ResourcesDict,
+                        index: int
+                        ) -> Tuple[NotebookNode, ResourcesDict]:
+        self._reset_output_budget()
+        notebook = (resources or {}).get('nbgrader', {}).get('notebook')
+        start = time.monotonic()
+        try:
+            with span("execute_cell", "cell", notebook=notebook, index=index):
+                return super(Execute, self).preprocess_cell(cell, resources, index)
+        finally:
+            self._execution_time += time.monotonic() - start
+
+    async def async_start_new_kernel(self, **kwargs: Any) -> None:
+        with span("start_kernel", "kernel"):
+            await super(Execute, self).async_start_new_kernel(**kwargs)
+
+    async def async_start_new_kernel_client(self) -> Any:
+        with span("start_kernel_client", "kernel"):
+            return await super(Execute, self).async_start_new_kernel_client()
+
+    @staticmethod
+    def _output_size(data: dict) -> int:
+        size = 0
+        for value in data.values():
+            if not isinstance(value, str):
+                value = json.dumps(value)
+            size += len(value)
+        return size
+
+    def _output_limit(self, size: int, lines: int) -> Optional[str]:
+        """Check whether an output of ``size`` bytes and ``lines`` lines fits
+        in the output budget of the current cell, and if not, return a
+        description of the limit it exceeds."""
+        if self.max_cell_output_lines != -1 and \
+                self._cell_output_lines + lines > self.max_cell_output_lines:
+            return "{} lines per cell".format(self.max_cell_output_lines)
+        if self.max_cell_output_bytes != -1 and \
+                self._cell_output_bytes + size > self.max_cell_output_bytes:
+            return "{} bytes per cell".format(self.max_cell_output_bytes)
+        if self.max_notebook_output_bytes != -1 and \
+                self._notebook_output_bytes + size > self.max_notebook_output_bytes:
+            return "{} bytes per notebook".format(self.max_notebook_output_bytes)
+        return None
+
+    def _truncate_stream(self, text: str) -> str:
+        """Get the beginning of ``text`` that fits in the output budget of
+        the current cell."""
+        if self.max_cell_output_lines != -1:
+            lines = text.splitlines(True)
+            text = "".join(lines[:max(self.max_cell_output_lines - self._cell_output_lines, 0)])
+        max_bytes = []
+        if self.max_cell_output_bytes != -1:
+            max_bytes.append(self.max_cell_output_bytes - self._cell_output_bytes)
+        if self.max_notebook_output_bytes != -1:
+            max_bytes.append(self.max_notebook_output_bytes - self._notebook_output_bytes)
+        if max_bytes:
+            text = text.encode("utf-8")[:max(min(max_bytes), 0)].decode("utf-8", "ignore")
+        return text
+
+    def _count_output(self, size: int, lines: int) -> None:
+        self._cell_output_bytes += size
+        self._cell_output_lines += lines
+        self._notebook_output_bytes += size
+
+    def output(self,
+               outs: list,
+               msg: dict,
+               display_id: Optional[str],
+               cell_index: int
+               ) -> Optional[NotebookNode]:
+        """Handle an output message of the kernel, enforcing the output
+        limits of the cell and of the notebook."""
+        msg_type = msg['msg_type']
+        if msg_type not in ('stream', 'display_data', 'execute_result'):
+            return super(Execute, self).output(outs, msg, display_id, cell_index)
+        if self._cell_output_truncated:
+            return None
+
+        content = msg['content']
+        if msg_type == 'stream':
+            text = content.get('text', '')
+            size = len(text.encode("utf-8"))
+            lines = text.count("\n")
+        else:
+            size = self._output_size(content.get('data', {}))
+            lines = 0
+
+        limit = self._output_limit(size, lines)
+        if limit is None:
+            self._count_output(size, lines)
+            return super(Execute, self).output(outs, msg, display_id, cell_index)
+
+        # keep the beginning of the stream that still fits in the budget
+        if msg_type == 'stream':
+            text = self._truncate_stream(text)
+            if text:
+                self._count_output(len(text.encode("utf-8")), text.count("\n"))
+                msg = dict(msg, content=dict(content, text=text))
+                super(Execute, self).output(outs, msg, display_id, cell_index)
+
+        # and discard the rest of the output of the cell
+        self._cell_output_truncated = True
+        self.log.warning(
+            "Output of cell %d exceeds the limit of %s, truncating it", cell_index, limit)
+        marker = NotebookNode(output_type='stream', name=content.get('name', 'stdout'))
+        marker.text = "\n... Output truncated (exceeded the limit of {}) ...\n".format(limit)
+        outs.append(marker)
+        return None
 
     def on_cell_executed(self, **kwargs):
         cell = kwargs['cell']
@@ -25,21 +25,23 @@ class GetGrades(NbGraderPreprocessor):
         self.db_url = resources['nbgrader']['db_url']
 
         # connect to the database
-        self.gradebook = Gradebook(self.db_url)
+        self.gradebook = Gradebook(self.db_url, shared_engine=True)
 
         with self.gradebook:
+            # fetch the grades and comments of every cell at once
+            self.grades = self.gradebook.submission_notebook_grades(
+                self.notebook_id, self.assignment_id, self.student_id)
+
             # process the cells
             nb, resources = super(GetGrades, self).preprocess(nb, resources)
-            notebook = self.gradebook.find_submission_notebook(
-                self.notebook_id, self.assignment_id, self.student_id)
 
-            late_penalty = notebook.late_submission_penalty
+            late_penalty = self.grades['late_submission_penalty']
             if late_penalty is None:
                 late_penalty = 0
             else:
                 self.log.warning("Late submission penalty: {}".format(late_penalty))
-            resources['nbgrader']['score'] = notebook.score - late_penalty
-            resources['nbgrader']['max_score'] = notebook.max_score
+            resources['nbgrader']['score'] = self.grades['score'] - late_penalty
+            resources['nbgrader']['max_score'] = self.grades['max_score']
             resources['nbgrader']['late_penalty'] = late_penalty
 
         return nb, resources
@@ -52,25 +54,35 @@ class GetGrades(NbGraderPreprocessor):
 
         """
 
-        # retrieve or create the comment object from the database
-        comment = self.gradebook.find_comment(
-            cell.metadata['nbgrader']['grade_id'],
-            self.notebook_id,
-            self.assignment_id,
-            self.student_id)
+        grade_id = cell.metadata['nbgrader']['grade_id']
+        if grade_id in self.grades['comments']:
+            comment = self.grades['comments'][grade_id]
+        else:
+            # not prefetched, so let the gradebook report the missing comment
+            comment = self.gradebook.find_comment(
+                grade_id,
+                self.notebook_id,
+                self.assignment_id,
+                self.student_id).comment
 
         # save it in the notebook
-        cell.metadata.nbgrader['comment'] = comment.comment
+        cell.metadata.nbgrader['comment'] = comment
 
     def _get_score(self, cell: NotebookNode, resources: ResourcesDict) -> None:
-        grade = self.gradebook.find_grade(
-            cell.metadata['nbgrader']['grade_id'],
-            self.notebook_id,
-            self.assignment_id,
-            self.student_id)
-
-        cell.metadata.nbgrader['score'] = grade.score
-        cell.metadata.nbgrader['points'] = grade.max_score
+        grade_id = cell.metadata['nbgrader']['grade_id']
+        if grade_id in self.grades['grades']:
+            grade = self.grades['grades'][grade_id]
+        else:
+            # not prefetched, so let the gradebook report the missing grade
+            found = self.gradebook.find_grade(
+                grade_id,
+                self.notebook_id,
+                self.assignment_id,
+                self.student_id)
+            grade = {'score': found.score, 'max_score': found.max_score}
+
+        cell.metadata.nbgrader['score'] = grade['score']
+        cell.metadata.nbgrader['points'] = grade['max_score']
 
     def preprocess_cell(self,
                         cell: NotebookNode,
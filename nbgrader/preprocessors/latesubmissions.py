@@ -47,7 +47,7 @@ class AssignLatePenalties(NbGraderPreprocessor):
         self.init_plugin()
 
         # connect to the database
-        self.gradebook = Gradebook(self.db_url)
+        self.gradebook = Gradebook(self.db_url, shared_engine=True)
 
         with self.gradebook:
             # process the late submissions
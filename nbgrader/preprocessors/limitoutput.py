@@ -7,7 +7,14 @@ from typing import Tuple
 
 
 class LimitOutput(NbGraderPreprocessor):
-    """Preprocessor for limiting cell output"""
+    """Preprocessor for limiting cell output
+
+    This truncates the outputs once the notebook has been executed. The
+    :class:`~nbgrader.preprocessors.Execute` preprocessor can additionally
+    bound the size of the output while it is produced (its limits are
+    disabled by default).
+
+    """
 
     max_lines = Integer(
         1000,
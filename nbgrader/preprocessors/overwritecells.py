@@ -1,16 +1,80 @@
+from types import MappingProxyType
+
 from nbformat.v4.nbbase import validate
 
 from .. import utils
-from ..api import Gradebook, MissingEntry
+from ..api import Gradebook, MissingEntry, _EngineRegistry
 from . import NbGraderPreprocessor
 from ..nbgraderformat import MetadataValidator
 from nbconvert.exporters.exporter import ResourcesDict
 from nbformat.notebooknode import NotebookNode
 from traitlets import Bool, Unicode
-from typing import Tuple, Any
+from typing import Any, Dict, FrozenSet, Mapping, NamedTuple, Optional, Tuple
 from textwrap import dedent
 
 
+class MasterSourceCell(NamedTuple):
+    """The definition of a source cell in the master version of a notebook."""
+    name: str
+    cell_type: str
+    locked: bool
+    source: str
+    checksum: Optional[str]
+
+
+class MasterCells(NamedTuple):
+    """An immutable snapshot of the cell definitions of the master version
+    of a notebook, as recorded by ``nbgrader generate_assignment``."""
+
+    #: The revision of the cells of the notebook the snapshot was taken from
+    revision: Optional[str]
+
+    #: The source cells, in the order of the notebook
+    source_cells: Mapping[str, MasterSourceCell]
+
+    #: The maximum scores of the grade cells
+    grade_cells: Mapping[str, float]
+
+    #: The maximum scores of the task cells
+    task_cells: Mapping[str, float]
+
+    #: The names of the solution cells
+    solution_cells: FrozenSet[str]
+
+
+# snapshots of the master cells loaded by this process, keyed by database,
+# assignment and notebook; worker processes inherit the snapshots loaded by
+# their parent before they are forked
+_master_cells: Dict[Tuple[str, str, str], MasterCells] = {}
+
+
+def load_master_cells(gradebook: Gradebook, notebook: str, assignment: str) -> MasterCells:
+    """Get the snapshot of the master cells of a notebook, only loading them
+    from the database if they changed since they were last loaded."""
+    key = (str(gradebook.engine.url), assignment, notebook)
+    revision = gradebook.find_notebook_cells_revision(notebook, assignment)
+    snapshot = _master_cells.get(key)
+    if snapshot is not None and snapshot.revision == revision:
+        return snapshot
+
+    source_nb = gradebook.find_notebook(notebook, assignment)
+    snapshot = MasterCells(
+        revision=revision,
+        source_cells=MappingProxyType({
+            cell.name: MasterSourceCell(
+                cell.name, cell.cell_type, cell.locked, cell.source, cell.checksum)
+            for cell in source_nb.source_cells}),
+        grade_cells=MappingProxyType({
+            cell.name: cell.max_score for cell in source_nb.grade_cells}),
+        task_cells=MappingProxyType({
+            cell.name: cell.max_score for cell in source_nb.task_cells}),
+        solution_cells=frozenset(cell.name for cell in source_nb.solution_cells))
+    # in-memory databases with the same URL are different databases
+    if _EngineRegistry.is_shareable(key[0]):
+        _master_cells[key] = snapshot
+    return snapshot
+
+
 class OverwriteCells(NbGraderPreprocessor):
     """A preprocessor to overwrite information about grade and solution cells."""
 
@@ -88,9 +152,11 @@ class OverwriteCells(NbGraderPreprocessor):
         self.db_url = resources['nbgrader']['db_url']
 
         # connect to the database
-        self.gradebook = Gradebook(self.db_url)
+        self.gradebook = Gradebook(self.db_url, shared_engine=True)
 
         with self.gradebook:
+            self.master_cells = load_master_cells(
+                self.gradebook, self.notebook_id, self.assignment_id)
             nb, resources = super(OverwriteCells, self).preprocess(nb, resources)
             if self.add_missing_cells:
                 nb, resources = self.add_missing_grade_cells(nb, resources)
@@ -105,11 +171,10 @@ class OverwriteCells(NbGraderPreprocessor):
         It is assumed such a cell exists because
         presumably the grade_cell exists to grade some work in the solution cell.
         """
-        source_nb = self.gradebook.find_notebook(self.notebook_id, self.assignment_id)
-        source_cells = source_nb.source_cells
-        source_cell_ids = [cell.name for cell in source_cells]
-        grade_cells = {cell.name: cell for cell in source_nb.grade_cells}
-        solution_cell_ids = [cell.name for cell in source_nb.solution_cells]
+        source_cells = list(self.master_cells.source_cells.values())
+        source_cell_ids = list(self.master_cells.source_cells.keys())
+        grade_cells = self.master_cells.grade_cells
+        solution_cell_ids = self.master_cells.solution_cells
 
         # track indices of solution and grade cells in the submitted notebook
         submitted_cell_idxs = dict()
@@ -122,13 +187,13 @@ class OverwriteCells(NbGraderPreprocessor):
         # So we keep track of how many we have added so far
         added_count = 0
 
-        for grade_cell_id, grade_cell in grade_cells.items():
+        for grade_cell_id, max_score in grade_cells.items():
             # If missing, find the previous solution/grade cell, and add the current cell after it.
             if grade_cell_id not in submitted_cell_idxs:
                 self.log.warning(f"Missing grade cell {grade_cell_id} encountered, adding to notebook")
                 source_cell_idx = source_cell_ids.index(grade_cell_id)
                 cell_to_add = source_cells[source_cell_idx]
-                cell_to_add = self.missing_cell_transform(cell_to_add, grade_cell.max_score,
+                cell_to_add = self.missing_cell_transform(cell_to_add, max_score,
                                                           is_solution=grade_cell_id in solution_cell_ids)
                 # First cell was deleted, add it to start
                 if source_cell_idx == 0:
@@ -153,15 +218,12 @@ class OverwriteCells(NbGraderPreprocessor):
         Add missing task cells back to the notebook.
         We can't figure out their original location, so they are added at the end, in their original order.
         """
-        source_nb = self.gradebook.find_notebook(self.notebook_id, self.assignment_id)
-        source_cells = source_nb.source_cells
-        source_cell_ids = [cell.name for cell in source_cells]
+        source_cells = self.master_cells.source_cells
         submitted_ids = [cell["metadata"]["nbgrader"]["grade_id"] for cell in nb.cells if
                          "nbgrader" in cell["metadata"]]
-        for task_cell in source_nb.task_cells:
-            if task_cell.name not in submitted_ids:
-                cell_to_add = source_cells[source_cell_ids.index(task_cell.name)]
-                cell_to_add = self.missing_cell_transform(cell_to_add, task_cell.max_score, is_task=True)
+        for task_cell_id, max_score in self.master_cells.task_cells.items():
+            if task_cell_id not in submitted_ids:
+                cell_to_add = self.missing_cell_transform(source_cells[task_cell_id], max_score, is_task=True)
                 nb.cells.append(cell_to_add)
 
         return nb, resources
@@ -195,12 +257,8 @@ class OverwriteCells(NbGraderPreprocessor):
         if grade_id is None:
             return cell, resources
 
-        try:
-            source_cell = self.gradebook.find_source_cell(
-                grade_id,
-                self.notebook_id,
-                self.assignment_id)
-        except MissingEntry:
+        source_cell = self.master_cells.source_cells.get(grade_id)
+        if source_cell is None:
             self.log.warning("Cell '{}' does not exist in the database".format(grade_id))
             del cell.metadata.nbgrader['grade_id']
             return cell, resources
@@ -217,11 +275,14 @@ class OverwriteCells(NbGraderPreprocessor):
 
         # if it's a grade cell, check that the max score hasn't changed
         if utils.is_grade(cell):
-            grade_cell = self.gradebook.find_graded_cell(
-                grade_id,
-                self.notebook_id,
-                self.assignment_id)
-            old_points = float(grade_cell.max_score)
+            if grade_id in self.master_cells.grade_cells:
+                max_score = self.master_cells.grade_cells[grade_id]
+            elif grade_id in self.master_cells.task_cells:
+                max_score = self.master_cells.task_cells[grade_id]
+            else:
+                raise MissingEntry("No such grade cell: {}/{}/{}".format(
+                    self.assignment_id, self.notebook_id, grade_id))
+            old_points = float(max_score)
             new_points = float(cell.metadata.nbgrader["points"])
 
             if old_points != new_points:
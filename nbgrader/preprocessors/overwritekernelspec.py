@@ -16,7 +16,7 @@ class OverwriteKernelspec(NbGraderPreprocessor):
         assignment_id = resources['nbgrader']['assignment']
         db_url = resources['nbgrader']['db_url']
 
-        with Gradebook(db_url) as gb:
+        with Gradebook.session(db_url) as gb:
             kernelspec = json.loads(
                 gb.find_notebook(notebook_id, assignment_id).kernelspec)
             self.log.debug("Source notebook kernelspec: {}".format(kernelspec))
@@ -12,65 +12,46 @@ class SaveCells(NbGraderPreprocessor):
     """A preprocessor to save information about grade and solution cells."""
 
     def _create_notebook(self, nb: NotebookNode) -> None:
-        notebook_info = None
-
         try:
             notebook = self.gradebook.find_notebook(self.notebook_id, self.assignment_id)
         except MissingEntry:
-            notebook_info = {}
-        else:
-            # pull out existing cell ids
+            notebook = None
+
+        # throw an error if we're trying to modify a notebook that has
+        # submissions associated with it
+        if notebook is not None and len(notebook.submissions) > 0:
             self.old_grade_cells = set(x.name for x in notebook.grade_cells)
             self.old_solution_cells = set(x.name for x in notebook.solution_cells)
             self.old_task_cells = set(x.name for x in notebook.task_cells)
             self.old_source_cells = set(x.name for x in notebook.source_cells)
 
-            # throw an error if we're trying to modify a notebook that has
-            # submissions associated with it
-            if len(notebook.submissions) > 0:
-                changed = set(self.new_grade_cells.keys()) != self.old_grade_cells
-                changed = changed | (set(self.new_solution_cells.keys()) != self.old_solution_cells)
-                changed = changed | (set(self.new_task_cells.keys()) != self.old_task_cells)
-                changed = changed | (set(self.new_source_cells.keys()) != self.old_source_cells)
-                if changed:
-                    raise RuntimeError(
-                        "Cannot add or remove cells for notebook '%s' because there "
-                        "are submissions associated with it" % self.notebook_id)
-
-            else:
-                # clear data about the existing notebook
-                self.log.debug("Removing existing notebook '%s' from the database", self.notebook_id)
-                notebook_info = notebook.to_dict()
-                del notebook_info['name']
-                self.gradebook.remove_notebook(self.notebook_id, self.assignment_id)
-
-        # create the notebook
-        if notebook_info is not None:
-            kernelspec = nb.metadata.get('kernelspec', {})
-            notebook_info['kernelspec'] = json.dumps(kernelspec)
-            self.log.debug("Creating notebook '%s' in the database", self.notebook_id)
-            self.log.debug("Notebook kernelspec: {}".format(kernelspec))
-            self.gradebook.add_notebook(self.notebook_id, self.assignment_id, **notebook_info)
-
-        # save grade cells
-        for name, info in self.new_grade_cells.items():
-            grade_cell = self.gradebook.update_or_create_grade_cell(name, self.notebook_id, self.assignment_id, **info)
-            self.log.debug("Recorded grade cell %s into the gradebook", grade_cell)
-
-        # save solution cells
-        for name, info in self.new_solution_cells.items():
-            solution_cell = self.gradebook.update_or_create_solution_cell(name, self.notebook_id, self.assignment_id, **info)
-            self.log.debug("Recorded solution cell %s into the gradebook", solution_cell)
-
-        # save task cells
-        for name, info in self.new_task_cells.items():
-            task_cell = self.gradebook.update_or_create_task_cell(name, self.notebook_id, self.assignment_id, **info)
-            self.log.debug("Recorded task cell %s into the gradebook from info %s", task_cell, info)
-
-        # save source cells
-        for name, info in self.new_source_cells.items():
-            source_cell = self.gradebook.update_or_create_source_cell(name, self.notebook_id, self.assignment_id, **info)
-            self.log.debug("Recorded source cell %s into the gradebook", source_cell)
+            changed = set(self.new_grade_cells.keys()) != self.old_grade_cells
+            changed = changed | (set(self.new_solution_cells.keys()) != self.old_solution_cells)
+            changed = changed | (set(self.new_task_cells.keys()) != self.old_task_cells)
+            changed = changed | (set(self.new_source_cells.keys()) != self.old_source_cells)
+            if changed:
+                raise RuntimeError(
+                    "Cannot add or remove cells for notebook '%s' because there "
+                    "are submissions associated with it" % self.notebook_id)
+
+        # create or update the notebook
+        kernelspec = nb.metadata.get('kernelspec', {})
+        self.log.debug("Recording notebook '%s' into the database", self.notebook_id)
+        self.log.debug("Notebook kernelspec: {}".format(kernelspec))
+        self.gradebook.update_or_create_notebook(
+            self.notebook_id, self.assignment_id, kernelspec=json.dumps(kernelspec))
+
+        # save all the cells at once, removing the ones that don't exist anymore
+        counts = self.gradebook.update_or_create_notebook_cells(
+            self.notebook_id, self.assignment_id,
+            grade_cells=self.new_grade_cells,
+            solution_cells=self.new_solution_cells,
+            task_cells=self.new_task_cells,
+            source_cells=self.new_source_cells)
+        self.log.debug(
+            "Recorded the cells of notebook '%s' into the gradebook "
+            "(%d created, %d updated, %d removed)", self.notebook_id,
+            counts['created'], counts['updated'], counts['removed'])
 
     def preprocess(self, nb: NotebookNode, resources: ResourcesDict) -> Tuple[NotebookNode, ResourcesDict]:
         # pull information from the resources
@@ -90,7 +71,7 @@ class SaveCells(NbGraderPreprocessor):
         self.new_source_cells = {}
 
         # connect to the database
-        self.gradebook = Gradebook(self.db_url)
+        self.gradebook = Gradebook(self.db_url, shared_engine=True)
 
         with self.gradebook:
             nb, resources = super(SaveCells, self).preprocess(nb, resources)
@@ -102,71 +83,30 @@ class SaveCells(NbGraderPreprocessor):
 
     def _create_grade_cell(self, cell: NotebookNode) -> None:
         grade_id = cell.metadata.nbgrader['grade_id']
-
-        try:
-            grade_cell = self.gradebook.find_grade_cell(grade_id, self.notebook_id, self.assignment_id).to_dict()
-            del grade_cell['name']
-            del grade_cell['notebook']
-            del grade_cell['assignment']
-        except MissingEntry:
-            grade_cell = {}
-
-        grade_cell.update({
+        self.new_grade_cells[grade_id] = {
             'max_score': float(cell.metadata.nbgrader['points']),
             'cell_type': cell.cell_type
-        })
-
-        self.new_grade_cells[grade_id] = grade_cell
+        }
 
     def _create_solution_cell(self, cell: NotebookNode) -> None:
         grade_id = cell.metadata.nbgrader['grade_id']
-
-        try:
-            solution_cell = self.gradebook.find_solution_cell(grade_id, self.notebook_id, self.assignment_id).to_dict()
-            del solution_cell['name']
-            del solution_cell['notebook']
-            del solution_cell['assignment']
-        except MissingEntry:
-            solution_cell = {}
-
-        self.new_solution_cells[grade_id] = solution_cell
+        self.new_solution_cells[grade_id] = {}
 
     def _create_task_cell(self, cell: NotebookNode) -> None:
         grade_id = cell.metadata.nbgrader['grade_id']
-        try:
-            task_cell = self.gradebook.find_task_cell(grade_id, self.notebook_id, self.assignment_id).to_dict()
-            del task_cell['name']
-            del task_cell['notebook']
-            del task_cell['assignment']
-        except MissingEntry:
-            task_cell = {}
-
-        task_cell.update({
+        self.new_task_cells[grade_id] = {
             'max_score': float(cell.metadata.nbgrader['points']),
             'cell_type': cell.cell_type
-        })
-
-        self.new_task_cells[grade_id] = task_cell
+        }
 
     def _create_source_cell(self, cell: NotebookNode) -> None:
         grade_id = cell.metadata.nbgrader['grade_id']
-
-        try:
-            source_cell = self.gradebook.find_source_cell(grade_id, self.notebook_id, self.assignment_id).to_dict()
-            del source_cell['name']
-            del source_cell['notebook']
-            del source_cell['assignment']
-        except MissingEntry:
-            source_cell = {}
-
-        source_cell.update({
+        self.new_source_cells[grade_id] = {
             'cell_type': cell.cell_type,
             'locked': utils.is_locked(cell),
             'source': cell.source,
             'checksum': cell.metadata.nbgrader.get('checksum', None)
-        })
-
-        self.new_source_cells[grade_id] = source_cell
+        }
 
     def preprocess_cell(self,
                         cell: NotebookNode,
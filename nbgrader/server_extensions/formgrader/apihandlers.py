@@ -1,10 +1,13 @@
 import json
 import os
+import time
+import asyncio
 
 from tornado import web
+from tornado.iostream import StreamClosedError
 
 from .base import BaseApiHandler, check_xsrf, check_notebook_dir
-from ...api import MissingEntry
+from ...api import Gradebook, MissingEntry
 
 
 class StatusHandler(BaseApiHandler):
@@ -18,106 +21,129 @@ class GradeCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self):
+    async def get(self):
         submission_id = self.get_argument("submission_id")
+
+        def get_grades(gb):
+            notebook = gb.find_submission_notebook_by_id(submission_id)
+            return [g.to_dict() for g in notebook.grades]
+
         try:
-            notebook = self.gradebook.find_submission_notebook_by_id(submission_id)
+            grades = await self.gradebook_call(get_grades)
         except MissingEntry:
             raise web.HTTPError(404)
-        self.write(json.dumps([g.to_dict() for g in notebook.grades]))
+        self.write(json.dumps(grades))
 
 
 class CommentCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self):
+    async def get(self):
         submission_id = self.get_argument("submission_id")
+
+        def get_comments(gb):
+            notebook = gb.find_submission_notebook_by_id(submission_id)
+            return [c.to_dict() for c in notebook.comments]
+
         try:
-            notebook = self.gradebook.find_submission_notebook_by_id(submission_id)
+            comments = await self.gradebook_call(get_comments)
         except MissingEntry:
             raise web.HTTPError(404)
-        self.write(json.dumps([c.to_dict() for c in notebook.comments]))
+        self.write(json.dumps(comments))
 
 
 class GradeHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, grade_id):
+    async def get(self, grade_id):
         try:
-            grade = self.gradebook.find_grade_by_id(grade_id)
+            grade = await self.gradebook_call(
+                lambda gb: gb.find_grade_by_id(grade_id).to_dict())
         except MissingEntry:
             raise web.HTTPError(404)
-        self.write(json.dumps(grade.to_dict()))
+        self.write(json.dumps(grade))
 
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def put(self, grade_id):
+    async def put(self, grade_id):
+        data = self.get_json_body()
+
+        def update_grade(gb):
+            grade = gb.find_grade_by_id(grade_id)
+            grade.manual_score = data.get("manual_score", None)
+            grade.extra_credit = data.get("extra_credit", None)
+            if grade.manual_score is None and grade.auto_score is None:
+                grade.needs_manual_grade = True
+            else:
+                grade.needs_manual_grade = False
+            gb.db.commit()
+            return grade.to_dict()
+
         try:
-            grade = self.gradebook.find_grade_by_id(grade_id)
+            grade = await self.gradebook_call(update_grade)
         except MissingEntry:
             raise web.HTTPError(404)
-
-        data = self.get_json_body()
-        grade.manual_score = data.get("manual_score", None)
-        grade.extra_credit = data.get("extra_credit", None)
-        if grade.manual_score is None and grade.auto_score is None:
-            grade.needs_manual_grade = True
-        else:
-            grade.needs_manual_grade = False
-        self.gradebook.db.commit()
-        self.write(json.dumps(grade.to_dict()))
+        self.write(json.dumps(grade))
 
 
 class CommentHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, grade_id):
+    async def get(self, grade_id):
         try:
-            comment = self.gradebook.find_comment_by_id(grade_id)
+            comment = await self.gradebook_call(
+                lambda gb: gb.find_comment_by_id(grade_id).to_dict())
         except MissingEntry:
             raise web.HTTPError(404)
-        self.write(json.dumps(comment.to_dict()))
+        self.write(json.dumps(comment))
 
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def put(self, grade_id):
+    async def put(self, grade_id):
+        data = self.get_json_body()
+
+        def update_comment(gb):
+            comment = gb.find_comment_by_id(grade_id)
+            comment.manual_comment = data.get("manual_comment", None)
+            gb.db.commit()
+            return comment.to_dict()
+
         try:
-            comment = self.gradebook.find_comment_by_id(grade_id)
+            comment = await self.gradebook_call(update_comment)
         except MissingEntry:
             raise web.HTTPError(404)
-
-        data = self.get_json_body()
-        comment.manual_comment = data.get("manual_comment", None)
-        self.gradebook.db.commit()
-        self.write(json.dumps(comment.to_dict()))
+        self.write(json.dumps(comment))
 
 
 class FlagSubmissionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, submission_id):
+    async def post(self, submission_id):
+        def flag(gb):
+            submission = gb.find_submission_notebook_by_id(submission_id)
+            submission.flagged = not submission.flagged
+            gb.db.commit()
+            return submission.to_dict()
+
         try:
-            submission = self.gradebook.find_submission_notebook_by_id(submission_id)
+            submission = await self.gradebook_call(flag)
         except MissingEntry:
             raise web.HTTPError(404)
-
-        submission.flagged = not submission.flagged
-        self.gradebook.db.commit()
-        self.write(json.dumps(submission.to_dict()))
+        self.write(json.dumps(submission))
 
 
 class AssignmentCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self):
-        assignments = self.api.get_assignments()
+    async def get(self):
+        assignments = await self.cached_api_call("get_assignments")
         self.write(json.dumps(assignments))
 
 
@@ -125,8 +151,8 @@ class AssignmentHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, assignment_id):
-        assignment = self.api.get_assignment(assignment_id)
+    async def get(self, assignment_id):
+        assignment = await self.cached_api_call("get_assignment", assignment_id)
         if assignment is None:
             raise web.HTTPError(404)
         self.write(json.dumps(assignment))
@@ -134,7 +160,7 @@ class AssignmentHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def put(self, assignment_id):
+    async def put(self, assignment_id):
         data = self.get_json_body()
         duedate = data.get("duedate_notimezone", None)
         timezone = data.get("duedate_timezone", None)
@@ -142,19 +168,24 @@ class AssignmentHandler(BaseApiHandler):
             duedate = duedate + " " + timezone
         assignment = {"duedate": duedate}
         assignment_id = assignment_id.strip()
-        self.gradebook.update_or_create_assignment(assignment_id, **assignment)
-        sourcedir = os.path.abspath(self.coursedir.format_path(self.coursedir.source_directory, '.', assignment_id))
-        if not os.path.isdir(sourcedir):
-            os.makedirs(sourcedir)
-        self.write(json.dumps(self.api.get_assignment(assignment_id)))
+
+        def update_assignment():
+            with Gradebook.session(self.db_url, self.coursedir.course_id) as gb:
+                gb.update_or_create_assignment(assignment_id, **assignment)
+            sourcedir = os.path.abspath(self.coursedir.format_path(self.coursedir.source_directory, '.', assignment_id))
+            if not os.path.isdir(sourcedir):
+                os.makedirs(sourcedir)
+            return self.api.get_assignment(assignment_id)
+
+        self.write(json.dumps(await self.run_exclusive(update_assignment)))
 
 
 class NotebookCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, assignment_id):
-        notebooks = self.api.get_notebooks(assignment_id)
+    async def get(self, assignment_id):
+        notebooks = await self.cached_api_call("get_notebooks", assignment_id)
         self.write(json.dumps(notebooks))
 
 
@@ -162,8 +193,8 @@ class SubmissionCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, assignment_id):
-        submissions = self.api.get_submissions(assignment_id)
+    async def get(self, assignment_id):
+        submissions = await self.cached_api_call("get_submissions", assignment_id)
         self.write(json.dumps(submissions))
 
 
@@ -171,8 +202,8 @@ class SubmissionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, assignment_id, student_id):
-        submission = self.api.get_submission(assignment_id, student_id)
+    async def get(self, assignment_id, student_id):
+        submission = await self.cached_api_call("get_submission", assignment_id, student_id)
         if submission is None:
             raise web.HTTPError(404)
         self.write(json.dumps(submission))
@@ -182,8 +213,8 @@ class SubmittedNotebookCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, assignment_id, notebook_id):
-        submissions = self.api.get_notebook_submissions(assignment_id, notebook_id)
+    async def get(self, assignment_id, notebook_id):
+        submissions = await self.cached_api_call("get_notebook_submissions", assignment_id, notebook_id)
         self.write(json.dumps(submissions))
 
 
@@ -191,8 +222,8 @@ class StudentCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self):
-        students = self.api.get_students()
+    async def get(self):
+        students = await self.cached_api_call("get_students")
         self.write(json.dumps(students))
 
 
@@ -200,8 +231,8 @@ class StudentHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, student_id):
-        student = self.api.get_student(student_id)
+    async def get(self, student_id):
+        student = await self.cached_api_call("get_student", student_id)
         if student is None:
             raise web.HTTPError(404)
         self.write(json.dumps(student))
@@ -209,7 +240,7 @@ class StudentHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def put(self, student_id):
+    async def put(self, student_id):
         data = self.get_json_body()
         student = {
             "last_name": data.get("last_name", None),
@@ -217,16 +248,21 @@ class StudentHandler(BaseApiHandler):
             "email": data.get("email", None),
         }
         student_id = student_id.strip()
-        self.gradebook.update_or_create_student(student_id, **student)
-        self.write(json.dumps(self.api.get_student(student_id)))
+
+        def update_student():
+            with Gradebook.session(self.db_url, self.coursedir.course_id) as gb:
+                gb.update_or_create_student(student_id, **student)
+            return self.api.get_student(student_id)
+
+        self.write(json.dumps(await self.run_exclusive(update_student)))
 
 
 class StudentSubmissionCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, student_id):
-        submissions = self.api.get_student_submissions(student_id)
+    async def get(self, student_id):
+        submissions = await self.cached_api_call("get_student_submissions", student_id)
         self.write(json.dumps(submissions))
 
 
@@ -234,8 +270,8 @@ class StudentNotebookSubmissionCollectionHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def get(self, student_id, assignment_id):
-        submissions = self.api.get_student_notebook_submissions(student_id, assignment_id)
+    async def get(self, student_id, assignment_id):
+        submissions = await self.cached_api_call("get_student_notebook_submissions", student_id, assignment_id)
         self.write(json.dumps(submissions))
 
 
@@ -243,72 +279,147 @@ class AssignHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id):
-        self.write(json.dumps(self.api.generate_assignment(assignment_id)))
+    async def post(self, assignment_id):
+        await self.run_job("generate_assignment", "generate_assignment", assignment_id, wait=True)
 
 
 class UnReleaseHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id):
-        self.write(json.dumps(self.api.unrelease(assignment_id)))
+    async def post(self, assignment_id):
+        await self.run_job("unrelease", "unrelease", assignment_id, wait=True)
 
 
 class ReleaseHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id):
-        self.write(json.dumps(self.api.release_assignment(assignment_id)))
+    async def post(self, assignment_id):
+        await self.run_job("release_assignment", "release_assignment", assignment_id, wait=True)
 
 
 class CollectHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id):
-        self.write(json.dumps(self.api.collect(assignment_id)))
+    async def post(self, assignment_id):
+        await self.run_job("collect", "collect", assignment_id)
 
 
 class AutogradeHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id, student_id):
-        self.write(json.dumps(self.api.autograde(assignment_id, student_id)))
+    async def post(self, assignment_id, student_id):
+        await self.run_job("autograde", "autograde", assignment_id, student_id)
 
 
 class GenerateAllFeedbackHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id):
-        self.write(json.dumps(self.api.generate_feedback(assignment_id)))
+    async def post(self, assignment_id):
+        await self.run_job("generate_feedback", "generate_feedback", assignment_id)
 
 
 class ReleaseAllFeedbackHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id):
-        self.write(json.dumps(self.api.release_feedback(assignment_id)))
+    async def post(self, assignment_id):
+        await self.run_job("release_feedback", "release_feedback", assignment_id)
 
 
 class GenerateFeedbackHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id, student_id):
-        self.write(json.dumps(self.api.generate_feedback(assignment_id, student_id)))
+    async def post(self, assignment_id, student_id):
+        await self.run_job("generate_feedback", "generate_feedback", assignment_id, student_id)
 
 
 class ReleaseFeedbackHandler(BaseApiHandler):
     @web.authenticated
     @check_xsrf
     @check_notebook_dir
-    def post(self, assignment_id, student_id):
-        self.write(json.dumps(self.api.release_feedback(assignment_id, student_id)))
+    async def post(self, assignment_id, student_id):
+        await self.run_job("release_feedback", "release_feedback", assignment_id, student_id)
+
+
+class JobCollectionHandler(BaseApiHandler):
+    @web.authenticated
+    @check_xsrf
+    @check_notebook_dir
+    def get(self):
+        self.write(json.dumps([job.to_dict() for job in self.jobs.list()]))
+
+
+class JobHandler(BaseApiHandler):
+    @web.authenticated
+    @check_xsrf
+    @check_notebook_dir
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise web.HTTPError(404)
+        self.write(json.dumps(job.to_dict()))
+
+
+class JobEventsHandler(BaseApiHandler):
+    """Streams the events of a job (its progress, log messages, and when it
+    is finished, with its result) as server-sent events, until the job is
+    finished. A client that reconnects resumes from the ``Last-Event-ID``
+    it received."""
+
+    #: How often (in seconds) new events are looked for
+    poll_interval = 0.25
+
+    #: How often (in seconds) a comment is sent while there are no new
+    #: events, so that proxies do not close the connection
+    keepalive_interval = 15
+
+    @web.authenticated
+    @check_xsrf
+    @check_notebook_dir
+    async def get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise web.HTTPError(404)
+
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Accel-Buffering", "no")
+        try:
+            start = int(self.request.headers.get("Last-Event-ID", -1)) + 1
+        except ValueError:
+            raise web.HTTPError(400)
+
+        last_sent = time.monotonic()
+        while True:
+            events = job.events(start)
+            if events:
+                for event in events:
+                    self.write("id: {}\nevent: {}\ndata: {}\n\n".format(
+                        event["id"], event["type"], json.dumps(event)))
+                start = events[-1]["id"] + 1
+            elif job.done:
+                # the client already received all the events
+                return
+            elif time.monotonic() - last_sent > self.keepalive_interval:
+                self.write(": keepalive\n\n")
+            else:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            try:
+                await self.flush()
+            except StreamClosedError:
+                return
+            last_sent = time.monotonic()
+            if events and events[-1]["type"] == "finished":
+                return
+            await asyncio.sleep(self.poll_interval)
 
 
 default_handlers = [
@@ -345,4 +456,8 @@ default_handlers = [
 
     (r"/formgrader/api/student_submissions/([^/]+)", StudentSubmissionCollectionHandler),
     (r"/formgrader/api/student_notebook_submissions/([^/]+)/([^/]+)", StudentNotebookSubmissionCollectionHandler),
+
+    (r"/formgrader/api/jobs", JobCollectionHandler),
+    (r"/formgrader/api/job/([^/]+)", JobHandler),
+    (r"/formgrader/api/job/([^/]+)/events", JobEventsHandler),
 ]
@@ -1,11 +1,29 @@
 import os
 import json
+import asyncio
 import functools
+import threading
 
 from tornado import web
+from tornado.ioloop import IOLoop
 from jupyter_server.base.handlers import JupyterHandler
 from ...api import Gradebook
 from ...apps.api import NbGraderAPI
+from ...coursedir import CourseDirectory
+from .cache import ApiCache
+from .jobs import JobLogHandler
+
+# the API objects may be created by several threads at once (see
+# BaseApiHandler.run_in_executor), but creating them reloads the configuration
+# of the formgrader
+_api_lock = threading.Lock()
+
+
+def _copy_coursedir(coursedir):
+    """Copy a course directory, so that an API call can temporarily modify
+    it (e.g. its assignment id) without affecting the other requests."""
+    return CourseDirectory(parent=coursedir.parent, **{
+        name: getattr(coursedir, name) for name in coursedir.trait_names(config=True)})
 
 
 class BaseHandler(JupyterHandler):
@@ -39,6 +57,22 @@ class BaseHandler(JupyterHandler):
             self.settings['nbgrader_gradebook'] = gb
         return gb
 
+    @property
+    def api_cache(self):
+        cache = self.settings.get('nbgrader_api_cache')
+        if cache is None:
+            cache = ApiCache(self.coursedir, parent=self.coursedir.parent)
+            self.settings['nbgrader_api_cache'] = cache
+        return cache
+
+    @property
+    def executor(self):
+        return self.settings['nbgrader_executor']
+
+    @property
+    def jobs(self):
+        return self.settings['nbgrader_jobs']
+
     @property
     def mathjax_url(self):
         return self.settings['mathjax_url']
@@ -50,10 +84,14 @@ class BaseHandler(JupyterHandler):
     @property
     def api(self):
         level = self.log.level
-        self.coursedir.parent.load_config_file()
-        api = NbGraderAPI(
-            self.coursedir, self.authenticator, parent=self.coursedir.parent)
+        with _api_lock:
+            self.coursedir.parent.load_config_file()
+            api = NbGraderAPI(
+                _copy_coursedir(self.coursedir), self.authenticator, parent=self.coursedir.parent)
         api.log_level = level
+        if api.exchange_root and api.course_id:
+            # the released status of the assignments comes from the exchange
+            self.api_cache.watch(os.path.join(api.exchange_root, api.course_id, 'outbound'))
         return api
 
     def render(self, name, **ns):
@@ -88,6 +126,79 @@ class BaseHandler(JupyterHandler):
 
 class BaseApiHandler(BaseHandler):
 
+    async def run_in_executor(self, func, *args):
+        """Run a function in the thread pool of the formgrader, so that it
+        does not block the server."""
+        return await IOLoop.current().run_in_executor(self.executor, func, *args)
+
+    async def run_exclusive(self, func, *args):
+        """Run a function which modifies the course in the job thread (see
+        :class:`~.jobs.JobManager`), so that it does not run at the same time
+        as the jobs or the other modifications."""
+        return await asyncio.wrap_future(self.jobs.call(func, *args))
+
+    async def cached_api_call(self, method, *args):
+        """Call a read method of the API (in the thread pool), or return its
+        cached result if nothing changed since it was last called with the
+        same arguments. Whether the result was cached is reported in the
+        ``X-NbGrader-Cache`` header of the response."""
+        result, hit = await self.run_in_executor(
+            self.api_cache.get, (method,) + args, lambda: getattr(self.api, method)(*args))
+        self.set_header("X-NbGrader-Cache", "hit" if hit else "miss")
+        return result
+
+    async def gradebook_call(self, func):
+        """Call ``func(gradebook)`` in the thread pool, with a gradebook
+        session of its own, and return its result."""
+        def call():
+            with Gradebook.session(self.db_url, self.coursedir.course_id) as gb:
+                return func(gb)
+        return await self.run_in_executor(call)
+
+    async def run_job(self, name, method, *args, wait=False, **kwargs):
+        """Run an action of the API which modifies the course (e.g.
+        ``autograde``) as a background job, and respond with the job (see
+        :class:`~.jobs.Job`) and a 202 status code. If ``wait`` (or the
+        ``wait`` argument of the request) is true, wait for the job to finish
+        (without blocking the server) and respond with its result instead.
+
+        While the job runs, the progress and the log of the action are
+        recorded as events of the job (which can be streamed with
+        :class:`~.apihandlers.JobEventsHandler`). Since every action which
+        modifies the course runs in the job thread, one at a time, and each
+        job uses its own API object, the events (and the log in the result)
+        only come from that action."""
+        def report_progress(job, done, total, item):
+            message = ""
+            if item is not None and item.get("student_id"):
+                message = item["student_id"]
+            job.set_progress(done=done, total=total, message=message, item=item)
+
+        def run(job):
+            api = self.api
+            api.progress_callback = functools.partial(report_progress, job)
+            handler = JobLogHandler(job)
+            api.log.addHandler(handler)
+            try:
+                return getattr(api, method)(*args, **kwargs)
+            finally:
+                api.log.removeHandler(handler)
+
+        job = self.jobs.submit(name, run, **{
+            key: value for key, value in zip(("assignment_id", "student_id"), args)})
+        if wait or self.get_argument("wait", "false").lower() in ("1", "true", "yes"):
+            self.write(json.dumps(await asyncio.wrap_future(job.future)))
+        else:
+            self.set_status(202)
+            self.set_header("Location", "{}/formgrader/api/job/{}".format(self.base_url, job.id))
+            self.write(json.dumps(job.to_dict()))
+
+    def on_finish(self):
+        # any other request may have modified the gradebook or the course
+        if self.request.method not in ("GET", "HEAD"):
+            self.api_cache.invalidate()
+        super(BaseApiHandler, self).on_finish()
+
     def get_json_body(self):
         """Return the body of the request as JSON data."""
         if not self.request.body:
@@ -0,0 +1,174 @@
+import os
+import time
+import threading
+
+from collections import OrderedDict
+from textwrap import dedent
+
+from sqlalchemy.engine import make_url
+from traitlets import Bool, Float, Integer
+from traitlets.config import LoggingConfigurable
+
+
+class ApiCache(LoggingConfigurable):
+    """A cache of the results of the read methods of
+    :class:`nbgrader.apps.api.NbGraderAPI`, shared by the formgrader handlers.
+
+    Each cached result is stored along with a fingerprint of the state it was
+    computed from: the modification times of the course directories (and of
+    their immediate subdirectories, i.e. one per student or assignment), of
+    the watched exchange directories, and of the gradebook database file.
+    A cached result is only returned while the fingerprint is unchanged, so
+    that collecting, autograding or grading from the command line is picked
+    up on the next request. Writes made through the formgrader invalidate the
+    cache directly. Since changes made to a database that is not a SQLite file
+    by other processes cannot be detected, the results are then only cached
+    for a few seconds (see ``unfingerprinted_db_ttl``).
+
+    """
+
+    enabled = Bool(
+        True,
+        help=dedent(
+            """
+            Whether to cache the results of the formgrader API requests that
+            only read the gradebook and the course directory.
+            """
+        )
+    ).tag(config=True)
+
+    ttl = Float(
+        300.0,
+        help=dedent(
+            """
+            The maximum age, in seconds, of a cached result. This bounds how
+            long changes that are not detected (e.g. configuration changes)
+            may go unnoticed.
+            """
+        )
+    ).tag(config=True)
+
+    unfingerprinted_db_ttl = Float(
+        2.0,
+        help=dedent(
+            """
+            The maximum age, in seconds, of a cached result when the gradebook
+            is not a SQLite file, so that the changes made to it by other
+            processes (e.g. autograding from the command line) cannot be
+            detected. A value of zero disables the cache for such databases.
+            """
+        )
+    ).tag(config=True)
+
+    max_entries = Integer(
+        256,
+        help="The maximum number of cached results"
+    ).tag(config=True)
+
+    def __init__(self, coursedir, **kwargs):
+        super(ApiCache, self).__init__(**kwargs)
+        self.coursedir = coursedir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._watched = set()
+        self._lock = threading.Lock()
+
+    def watch(self, path):
+        """Include the modification times of a directory (and of its
+        subdirectories) in the fingerprint of the cached results."""
+        self._watched.add(path)
+
+    def invalidate(self):
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _directory_fingerprint(self, path):
+        try:
+            with os.scandir(path) as it:
+                children = tuple(sorted(
+                    (entry.name, entry.stat().st_mtime_ns) for entry in it
+                    if entry.is_dir()))
+        except OSError:
+            return None
+        return (self._mtime(path), children)
+
+    def _db_fingerprint(self):
+        try:
+            url = make_url(self.coursedir.db_url)
+        except Exception:
+            return None
+        if not url.drivername.startswith("sqlite") or url.database in (None, "", ":memory:"):
+            return None
+        return tuple(
+            self._mtime(url.database + suffix) for suffix in ("", "-wal", "-journal"))
+
+    def fingerprint(self):
+        """Compute the fingerprint of the current state of the course."""
+        directories = [
+            os.path.join(self.coursedir.root, directory)
+            for directory in (
+                self.coursedir.source_directory,
+                self.coursedir.release_directory,
+                self.coursedir.submitted_directory,
+                self.coursedir.autograded_directory,
+                self.coursedir.feedback_directory)
+        ]
+        directories.extend(sorted(self._watched))
+        return (
+            self._db_fingerprint(),
+            tuple(self._directory_fingerprint(path) for path in directories))
+
+    def get(self, key, compute):
+        """Get a cached result, or compute and cache it.
+
+        Arguments
+        ---------
+        key: tuple
+            The key of the result, e.g. the name and the arguments of the
+            API method
+        compute: callable
+            A function computing the result when it is not cached
+
+        Returns
+        -------
+        result:
+            The result
+        hit: bool
+            Whether the result was cached
+
+        """
+        if not self.enabled:
+            return compute(), False
+
+        key = (self.coursedir.course_id, self.coursedir.root) + tuple(key)
+        fingerprint = self.fingerprint()
+        ttl = self.ttl
+        if fingerprint[0] is None:
+            ttl = min(ttl, self.unfingerprinted_db_ttl)
+            if ttl <= 0:
+                return compute(), False
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == fingerprint and now - entry[1] < ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2], True
+
+        result = compute()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (fingerprint, now, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result, False
@@ -1,15 +1,18 @@
 # coding: utf-8
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
 
 from nbconvert.exporters import HTMLExporter
-from traitlets import Bool, default
+from traitlets import Bool, Integer, default
 from tornado import web
 from jinja2 import Environment, FileSystemLoader
 from jupyter_server.utils import url_path_join as ujoin
 
 from . import handlers, apihandlers
+from .cache import ApiCache
+from .jobs import JobManager
 from ...apps.baseapp import NbGrader
 
 
@@ -29,6 +32,18 @@ class FormgradeExtension(NbGrader):
         )
     ).tag(config=True)
 
+    api_threads = Integer(
+        4,
+        help=dedent(
+            """
+            The number of threads in which the formgrader API requests are
+            handled, so that reading the gradebook does not block the server.
+            Long actions (collecting, autograding, generating and releasing
+            feedback) are run as background jobs, one at a time, instead.
+            """
+        )
+    ).tag(config=True)
+
     @property
     def root_dir(self):
         return self._root_dir
@@ -55,6 +70,8 @@ class FormgradeExtension(NbGrader):
     def _classes_default(self):
         classes = super(FormgradeExtension, self)._classes_default()
         classes.append(HTMLExporter)
+        classes.append(ApiCache)
+        classes.append(JobManager)
         return classes
 
     def build_extra_config(self):
@@ -79,12 +96,19 @@ class FormgradeExtension(NbGrader):
         else:
             nbgrader_bad_setup = False
 
+        api_cache = ApiCache(self.coursedir, parent=self)
+
         # Configure the formgrader settings
         tornado_settings = dict(
             nbgrader_formgrader=self,
             nbgrader_authenticator=self.authenticator,
             nbgrader_exporter=HTMLExporter(config=self.config),
             nbgrader_gradebook=None,
+            nbgrader_api_cache=api_cache,
+            nbgrader_executor=ThreadPoolExecutor(
+                max_workers=self.api_threads, thread_name_prefix="nbgrader-api"),
+            nbgrader_jobs=JobManager(
+                on_finish=lambda job: api_cache.invalidate(), parent=self),
             nbgrader_db_url=self.coursedir.db_url,
             nbgrader_jinja2_env=jinja_env,
             nbgrader_bad_setup=nbgrader_bad_setup,
@@ -0,0 +1,246 @@
+import time
+import logging
+import threading
+import traceback
+import uuid
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from textwrap import dedent
+
+from traitlets import Integer
+from traitlets.config import LoggingConfigurable
+
+
+class Job(object):
+    """A long-running formgrader action (e.g. autograding), run in the
+    background by a :class:`JobManager`.
+
+    Besides its status, a job records the events of its run, which are
+    streamed to the formgrader while it runs: its ``progress`` (after each
+    student), the ``log`` messages of the action, and when it is
+    ``finished``. Each event is a dictionary with (at least) an ``id`` (its
+    index), a ``type`` and a ``time``.
+
+    """
+
+    def __init__(self, name, args):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.args = args
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.future = None
+        self._progress = {"done": 0, "total": None, "message": ""}
+        self._events = []
+        self._lock = threading.Lock()
+
+    def add_event(self, type, **data):
+        """Record an event of the job."""
+        with self._lock:
+            self._add_event(type, data)
+
+    def _add_event(self, type, data):
+        event = {"id": len(self._events), "type": type, "time": time.time()}
+        event.update(data)
+        self._events.append(event)
+
+    def events(self, start=0):
+        """Get the events of the job, starting from the event with the id
+        ``start``."""
+        with self._lock:
+            return self._events[start:]
+
+    def set_progress(self, done=None, total=None, message=None, item=None):
+        """Update the progress of the job, and record it as an event;
+        arguments that are None are left unchanged.
+
+        Arguments
+        ---------
+        done: int
+            The number of items (e.g. students) that are done
+        total: int
+            The total number of items
+        message: string
+            A short description of the progress
+        item: dict
+            The item that was just done (e.g. its student id and how long
+            it took)
+
+        """
+        with self._lock:
+            if done is not None:
+                self._progress["done"] = done
+            if total is not None:
+                self._progress["total"] = total
+            if message is not None:
+                self._progress["message"] = message
+            data = dict(self._progress)
+            data["item"] = item
+            data["elapsed"] = time.time() - self.started if self.started else 0.0
+            self._add_event("progress", data)
+
+    @property
+    def progress(self):
+        with self._lock:
+            return dict(self._progress)
+
+    @property
+    def done(self):
+        return self.status in ("success", "error")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "args": self.args,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": self.progress,
+            "result": self.result
+        }
+
+
+class JobLogHandler(logging.Handler):
+    """A logging handler recording the messages logged by the thread in which
+    it was created (i.e. by the action of a job) as events of the job."""
+
+    def __init__(self, job, fmt="[%(levelname)s] %(message)s"):
+        super(JobLogHandler, self).__init__()
+        self.job = job
+        self.thread = threading.get_ident()
+        self.setFormatter(logging.Formatter(fmt))
+
+    def filter(self, record):
+        # the formgrader logger is shared by all the requests
+        return record.thread == self.thread and super(JobLogHandler, self).filter(record)
+
+    def emit(self, record):
+        try:
+            self.job.add_event(
+                "log", level=record.levelname, message=self.format(record),
+                created=record.created)
+        except Exception:
+            self.handleError(record)
+
+
+class JobManager(LoggingConfigurable):
+    """Runs the formgrader actions which modify the course (generating and
+    releasing assignments, collecting, autograding, generating and releasing
+    feedback) in a background thread, so that they do not block the server,
+    and keeps track of their status.
+
+    Jobs are run one at a time, in the order in which they were submitted,
+    since they all work on the same course directory (and the converters
+    change the working directory of the process). The other actions which
+    modify the course (e.g. generating an assignment) are run in the same
+    thread, as jobs or with :meth:`call`.
+
+    """
+
+    max_finished = Integer(
+        100,
+        help=dedent(
+            """
+            The number of finished formgrader jobs whose status and results are
+            kept, so that they can be retrieved after they finished.
+            """
+        )
+    ).tag(config=True)
+
+    def __init__(self, on_finish=None, **kwargs):
+        super(JobManager, self).__init__(**kwargs)
+        self.on_finish = on_finish
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nbgrader-job")
+
+    def submit(self, name, func, **args):
+        """Run ``func(job)`` in the background.
+
+        Arguments
+        ---------
+        name: string
+            The name of the action, e.g. ``autograde``
+        func: callable
+            The action, called with the :class:`Job` (so that it can report
+            its progress). It should return a dictionary with (at least) a
+            ``success`` key, as returned by the methods of
+            :class:`~nbgrader.apps.api.NbGraderAPI`.
+        args:
+            The arguments of the action, reported with the job
+
+        Returns
+        -------
+        job: :class:`Job`
+
+        """
+        job = Job(name, args)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self.log.info("Queued %s job %s (%s)", name, job.id, args)
+        job.future = self._executor.submit(self._run, job, func)
+        return job
+
+    def call(self, func, *args):
+        """Run ``func(*args)`` in the job thread, after the queued jobs,
+        without recording it as a job: for short actions which must not run
+        at the same time as jobs.
+
+        Returns
+        -------
+        future: :class:`concurrent.futures.Future`
+
+        """
+        return self._executor.submit(func, *args)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, func):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            result = func(job)
+        except Exception:
+            self.log.error("The %s job %s failed", job.name, job.id, exc_info=True)
+            result = {"success": False, "error": traceback.format_exc()}
+        job.result = result
+        job.finished = time.time()
+        status = "success" if result.get("success") else "error"
+        # the job is only done once its last event has been recorded
+        job.add_event("finished", status=status, result=result)
+        job.status = status
+        self.log.info(
+            "Finished %s job %s in %.1f seconds (%s)",
+            job.name, job.id, job.finished - job.started, job.status)
+        if self.on_finish is not None:
+            self.on_finish(job)
+        return result
+
+    def get(self, job_id):
+        """Get a job by its id, or None if there is no such job."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """Get all the (running, queued and recently finished) jobs."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self):
+        """Cancel the queued jobs, and wait for the running one to finish."""
+        for job in self.list():
+            if job.future is not None and job.future.cancel():
+                job.result = {"success": False, "error": "Canceled"}
+                job.add_event("finished", status="error", result=job.result)
+                job.status = "error"
+        self._executor.shutdown(wait=True)
@@ -361,14 +361,13 @@ var AssignmentUI = Backbone.View.extend({
     collect: function () {
         this.clear();
         this.$name.text("Please wait...");
-        $.post(base_url + "/formgrader/api/assignment/" + this.model.get("name") + "/collect")
+        runJob(base_url + "/formgrader/api/assignment/" + this.model.get("name") + "/collect")
             .done(_.bind(this.collect_success, this))
             .fail(_.bind(this.collect_failure, this));
     },
 
     collect_success: function (response) {
         this.model.fetch();
-        response = JSON.parse(response);
         if (response["success"]) {
             createLogModal(
                 "success-modal",
@@ -410,17 +409,23 @@ var AssignmentUI = Backbone.View.extend({
         }
     },
 
+    show_progress: function (progress) {
+        if (progress.total) {
+            this.$name.text("Please wait... (" + progress.done + "/" + progress.total + ")");
+        }
+    },
+
     generate_feedback: function () {
         this.clear();
         this.$name.text("Please wait...");
-        $.post(base_url + "/formgrader/api/assignment/" + this.model.get("name") + "/generate_feedback")
+        runJob(base_url + "/formgrader/api/assignment/" + this.model.get("name") + "/generate_feedback")
+            .progress(_.bind(this.show_progress, this))
             .done(_.bind(this.generate_feedback_success, this))
             .fail(_.bind(this.generate_feedback_failure, this));
     },
 
     generate_feedback_success: function (response) {
         this.model.fetch();
-        response = JSON.parse(response);
         if (response["success"]) {
             createLogModal(
                 "success-modal",
@@ -449,14 +454,14 @@ var AssignmentUI = Backbone.View.extend({
     release_feedback: function () {
         this.clear();
         this.$name.text("Please wait...");
-        $.post(base_url + "/formgrader/api/assignment/" + this.model.get("name") + "/release_feedback")
+        runJob(base_url + "/formgrader/api/assignment/" + this.model.get("name") + "/release_feedback")
+            .progress(_.bind(this.show_progress, this))
             .done(_.bind(this.release_feedback_success, this))
             .fail(_.bind(this.release_feedback_failure, this));
     },
 
     release_feedback_success: function (response) {
         this.model.fetch();
-        response = JSON.parse(response);
         if (response["success"]) {
             createLogModal(
                 "success-modal",
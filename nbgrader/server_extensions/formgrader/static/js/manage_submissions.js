@@ -135,14 +135,13 @@ var SubmissionUI = Backbone.View.extend({
         this.$student_name.text("Please wait...");
         var student = this.model.get("student");
         var assignment = this.model.get("name");
-        $.post(base_url + "/formgrader/api/submission/" + assignment + "/" + student + "/autograde")
+        runJob(base_url + "/formgrader/api/submission/" + assignment + "/" + student + "/autograde")
             .done(_.bind(this.autograde_success, this))
             .fail(_.bind(this.autograde_failure, this));
     },
 
     autograde_success: function (response) {
         this.model.fetch();
-        response = JSON.parse(response);
         var student = this.model.get("student");
         var assignment = this.model.get("name");
         if (response["success"]) {
@@ -177,14 +176,13 @@ var SubmissionUI = Backbone.View.extend({
         this.$student_name.text("Please wait...");
         var student = this.model.get("student");
         var assignment = this.model.get("name");
-        $.post(base_url + "/formgrader/api/assignment/" + assignment + "/" + student + "/generate_feedback")
+        runJob(base_url + "/formgrader/api/assignment/" + assignment + "/" + student + "/generate_feedback")
             .done(_.bind(this.generate_feedback_success, this))
             .fail(_.bind(this.generate_feedback_failure, this));
     },
 
     generate_feedback_success: function (response) {
         this.model.fetch();
-        response = JSON.parse(response);
         var student = this.model.get("student");
         var assignment = this.model.get("name");
         if (response["success"]) {
@@ -219,14 +217,13 @@ var SubmissionUI = Backbone.View.extend({
         this.$student_name.text("Please wait...");
         var student = this.model.get("student");
         var assignment = this.model.get("name");
-        $.post(base_url + "/formgrader/api/assignment/" + assignment + "/" + student + "/release_feedback")
+        runJob(base_url + "/formgrader/api/assignment/" + assignment + "/" + student + "/release_feedback")
             .done(_.bind(this.release_feedback_success, this))
             .fail(_.bind(this.release_feedback_failure, this));
     },
 
     release_feedback_success: function (response) {
         this.model.fetch();
-        response = JSON.parse(response);
         var student = this.model.get("student");
         var assignment = this.model.get("name");
         if (response["success"]) {
@@ -71,6 +71,60 @@ var createLogModal = function (id, title, message, log, error) {
     return createModal(id, title, body);
 };
 
+// Run a formgrader action (e.g. autograding) as a background job, and follow
+// the job until it is finished: by streaming its events if the browser
+// supports it, and by polling the job otherwise. The returned promise is
+// notified of the progress of the job, and resolved with the result of the
+// action.
+var runJob = function (url) {
+    var deferred = $.Deferred();
+    var job_url = function (job) {
+        return base_url + "/formgrader/api/job/" + job.id;
+    };
+
+    var poll = function (job) {
+        if (job.status === "success" || job.status === "error") {
+            deferred.resolve(job.result);
+            return;
+        }
+        deferred.notify(job.progress);
+        setTimeout(function () {
+            $.get(job_url(job))
+                .done(function (response) { poll(JSON.parse(response)); })
+                .fail(deferred.reject);
+        }, 1000);
+    };
+
+    var stream = function (job) {
+        var source = new EventSource(job_url(job) + "/events");
+        source.addEventListener("progress", function (e) {
+            deferred.notify(JSON.parse(e.data));
+        });
+        source.addEventListener("finished", function (e) {
+            source.close();
+            deferred.resolve(JSON.parse(e.data).result);
+        });
+        source.onerror = function () {
+            // the browser reconnects by itself, unless the stream failed
+            if (source.readyState === EventSource.CLOSED && deferred.state() === "pending") {
+                poll(job);
+            }
+        };
+    };
+
+    $.post(url)
+        .done(function (response) {
+            var job = JSON.parse(response);
+            if (window.EventSource) {
+                stream(job);
+            } else {
+                poll(job);
+            }
+        })
+        .fail(deferred.reject);
+    return deferred.promise();
+};
+
 var roundToPrecision = function (num, precision) {
     var factor = Math.pow(10, precision);
     return Math.round(num * factor) / factor;
@@ -269,6 +269,28 @@ def test_update_or_create_student(gradebook):
     assert s2.first_name == 'Alyssa'
 
 
+def test_update_or_create_students(gradebook):
+    s1 = gradebook.add_student('hacker123', first_name='Alyssa')
+    students = gradebook.update_or_create_students({
+        'hacker123': {'last_name': 'Hacker'},
+        'bitdiddle': {'first_name': 'Ben', 'last_name': 'Bitdiddle'}})
+    assert students[0] == s1
+    assert s1.first_name == 'Alyssa'
+    assert s1.last_name == 'Hacker'
+    assert gradebook.find_student('bitdiddle') == students[1]
+    assert students[1].first_name == 'Ben'
+
+    # nothing is applied if one of the students is invalid
+    with pytest.raises(TypeError):
+        gradebook.update_or_create_students({
+            'hacker123': {'last_name': 'P. Hacker'},
+            'louisreasoner': {'first_name': 'Louis'},
+            'foo': {'nope': 'bar'}})
+    assert gradebook.find_student('hacker123').last_name == 'Hacker'
+    with pytest.raises(MissingEntry):
+        gradebook.find_student('louisreasoner')
+
+
 # Test assignments
 
 def test_add_assignment(gradebook):
@@ -349,6 +371,28 @@ def test_update_or_create_assignment(gradebook):
     assert a1 == a2
     assert a2.duedate == utils.parse_utc("2015-02-02 14:58:23.948203 America/Los_Angeles")
 
+
+def test_update_or_create_assignments(gradebook):
+    a1 = gradebook.add_assignment('foo')
+    assignments = gradebook.update_or_create_assignments({
+        'foo': {'duedate': "2015-02-02 14:58:23.948203 America/Los_Angeles"},
+        'bar': {'duedate': None}})
+    assert assignments[0] == a1
+    assert a1.duedate == utils.parse_utc("2015-02-02 14:58:23.948203 America/Los_Angeles")
+    assert gradebook.find_assignment('bar') == assignments[1]
+    assert assignments[1].duedate is None
+    assert assignments[1].course_id == gradebook.course_id
+
+    # nothing is applied if one of the assignments is invalid
+    with pytest.raises(ValueError):
+        gradebook.update_or_create_assignments({
+            'foo': {'duedate': None},
+            'baz': {},
+            'qux': {'duedate': "not a date"}})
+    assert gradebook.find_assignment('foo').duedate is not None
+    with pytest.raises(MissingEntry):
+        gradebook.find_assignment('baz')
+
 # Test notebooks
 
 
@@ -681,6 +725,47 @@ def test_update_or_create_source_cell(gradebook):
     assert sc1.checksum == "123456"
 
 
+def test_update_or_create_notebook_cells(gradebook):
+    gradebook.add_assignment('foo')
+    gradebook.add_notebook('p1', 'foo')
+    gradebook.add_grade_cell('grade1', 'p1', 'foo', max_score=1, cell_type='code')
+    gradebook.add_grade_cell('grade2', 'p1', 'foo', max_score=2, cell_type='code')
+    gradebook.add_solution_cell('grade1', 'p1', 'foo')
+    gradebook.add_source_cell('grade1', 'p1', 'foo', cell_type='code', source='1')
+    gc1 = gradebook.find_grade_cell('grade1', 'p1', 'foo')
+    gc1_id = gc1.id
+
+    counts = gradebook.update_or_create_notebook_cells(
+        'p1', 'foo',
+        grade_cells={
+            'grade1': {'max_score': 3, 'cell_type': 'markdown'},
+            'grade3': {'max_score': 4, 'cell_type': 'code'}},
+        solution_cells={},
+        task_cells={'task1': {'max_score': 5, 'cell_type': 'markdown'}},
+        source_cells={'grade1': {'source': '2'}})
+    assert counts == {'created': 2, 'updated': 2, 'removed': 2}
+
+    notebook = gradebook.find_notebook('p1', 'foo')
+    assert sorted(x.name for x in notebook.grade_cells) == ['grade1', 'grade3']
+    assert notebook.solution_cells == []
+    assert [x.name for x in notebook.task_cells] == ['task1']
+    assert notebook.max_score == 12
+
+    # existing cells are updated in place
+    gc1 = gradebook.find_grade_cell('grade1', 'p1', 'foo')
+    assert gc1.id == gc1_id
+    assert (gc1.max_score, gc1.cell_type) == (3, 'markdown')
+    sc1 = gradebook.find_source_cell('grade1', 'p1', 'foo')
+    assert (sc1.source, sc1.cell_type) == ('2', 'code')
+
+    # cell types that are not given are left unchanged
+    counts = gradebook.update_or_create_notebook_cells('p1', 'foo', grade_cells={})
+    assert counts == {'created': 0, 'updated': 0, 'removed': 2}
+    assert [x.name for x in notebook.task_cells] == ['task1']
+
+    with pytest.raises(MissingEntry):
+        gradebook.update_or_create_notebook_cells('p2', 'foo', grade_cells={})
+
 # Test submissions
 
 def test_add_submission(assignment):
@@ -796,6 +881,20 @@ def test_find_grade(assignment):
         assignment.find_grade('asdf', 'p1', 'foo', 'hacker123')
 
 
+def test_find_submission_notebook_grades(assignment):
+    assignment.add_student('hacker123')
+    s = assignment.add_submission('foo', 'hacker123')
+    n1, = s.notebooks
+
+    grades = assignment.find_submission_notebook_grades('p1', 'foo', 'hacker123')
+    assert sorted(grades.keys()) == sorted(g.name for g in n1.grades)
+    for g1 in n1.grades:
+        assert grades[g1.name] == g1
+
+    assert assignment.find_submission_notebook_grades('p1', 'foo', 'asdf') == {}
+    assert assignment.find_submission_notebook_grades('asdf', 'foo', 'hacker123') == {}
+
+
 def test_find_grade_by_id(assignment):
     assignment.add_student('hacker123')
     s = assignment.add_submission('foo', 'hacker123')
@@ -824,6 +923,19 @@ def test_find_comment(assignment):
         assignment.find_comment('asdf', 'p1', 'foo', 'hacker123')
 
 
+def test_find_submission_notebook_comments(assignment):
+    assignment.add_student('hacker123')
+    s = assignment.add_submission('foo', 'hacker123')
+    n1, = s.notebooks
+
+    comments = assignment.find_submission_notebook_comments('p1', 'foo', 'hacker123')
+    assert sorted(comments.keys()) == sorted(c.name for c in n1.comments)
+    for c1 in n1.comments:
+        assert comments[c1.name] == c1
+
+    assert assignment.find_submission_notebook_comments('p1', 'foo', 'asdf') == {}
+
+
 def test_find_comment_by_id(assignment):
     assignment.add_student('hacker123')
     s = assignment.add_submission('foo', 'hacker123')
@@ -1184,6 +1296,25 @@ def test_find_comment_by_id(assignmentWithSubmissionWithMarks):
             assignmentWithSubmissionWithMarks.find_comment_by_id('12345')
 
 
+def test_submission_notebook_grades(assignmentWithSubmissionWithMarks):
+    gb = assignmentWithSubmissionWithMarks
+    for student in ['hacker123', 'bitdiddle']:
+        s = gb.find_submission('foo', student)
+        for n in s.notebooks:
+            n.late_submission_penalty = 1.5
+            gb.db.commit()
+            result = gb.submission_notebook_grades(n.name, 'foo', student)
+
+            assert result['score'] == n.score
+            assert result['max_score'] == n.max_score
+            assert result['late_submission_penalty'] == 1.5
+            assert result['grades'] == {
+                g.name: {'score': g.score, 'max_score': g.max_score} for g in n.grades}
+            assert result['comments'] == {c.name: c.comment for c in n.comments}
+
+    with pytest.raises(MissingEntry):
+        gb.submission_notebook_grades('p1', 'foo', 'asdf')
+
 def test_average_assignment_score_empty(assignment):
     assert assignment.average_assignment_score('foo') == 0.0
     assert assignment.average_assignment_code_score('foo') == 0.0
@@ -1310,3 +1441,269 @@ def test_submission_dicts_multiple_notebooks(FiveNotebooks):
     a = sorted(assign.submission_dicts("a1"), key=lambda x: x["id"])
     b = sorted([x.to_dict() for x in assign.find_assignment("a1").submissions], key=lambda x: x["id"])
     assert a == b
+
+
+def test_score_rollup_submission_dicts(assignmentWithSubmissionWithMarks):
+    assign = assignmentWithSubmissionWithMarks
+    a = sorted(assign.submission_dicts("foo"), key=lambda x: x["id"])
+    assign.use_score_rollup = True
+    b = sorted(assign.submission_dicts("foo"), key=lambda x: x["id"])
+    assert a == b
+
+
+def test_score_rollup_notebook_submission_dicts(assignmentWithSubmissionWithMarks):
+    assign = assignmentWithSubmissionWithMarks
+    a = sorted(assign.notebook_submission_dicts("p1", "foo"), key=lambda x: x["id"])
+    assign.use_score_rollup = True
+    b = sorted(assign.notebook_submission_dicts("p1", "foo"), key=lambda x: x["id"])
+    assert a == b
+
+
+def test_score_rollup_student_dicts(FiveAssignments):
+    assign = FiveAssignments
+    a = sorted(assign.student_dicts(), key=lambda x: x["id"])
+    assign.use_score_rollup = True
+    b = sorted(assign.student_dicts(), key=lambda x: x["id"])
+    assert a == b
+
+
+def test_score_rollup_not_in_use(assignment):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    api.event.listen(assignment.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        assignment.add_student('hacker123')
+        assignment.add_submission('foo', 'hacker123')
+        grade = assignment.find_grade("test1", "p1", "foo", "hacker123")
+        grade.auto_score = 1
+        assignment.db.commit()
+    finally:
+        api.event.remove(assignment.engine, "before_cursor_execute", before_cursor_execute)
+
+    # the score rollup is not maintained until it has been built (its status
+    # was already queried when the fixture created the cells)
+    assert assignment.db.query(api.ScoreRollup).count() == 0
+    assert [x for x in statements if "score_rollup" in x] == []
+
+    # reading it builds it
+    assignment.use_score_rollup = True
+    submission, = assignment.submission_dicts("foo")
+    assert submission["score"] == 1
+    assert assignment.check_score_rollup() == []
+
+
+def test_score_rollup_updated_with_grades(assignment):
+    assignment.rebuild_score_rollup()
+    assignment.add_student('hacker123')
+    assignment.add_submission('foo', 'hacker123')
+    assert assignment.check_score_rollup() == []
+
+    grade = assignment.find_grade("test1", "p1", "foo", "hacker123")
+    grade.auto_score = 1
+    grade.needs_manual_grade = False
+    assignment.db.commit()
+    assert assignment.check_score_rollup() == []
+
+    rollup = assignment.db.query(api.ScoreRollup)\
+        .filter(api.ScoreRollup.level == "student", api.ScoreRollup.entity_id == "hacker123")\
+        .one()
+    assert rollup.score == 1
+    assert rollup.code_score == 1
+    assert rollup.written_score == 0
+    assert rollup.needs_manual_grade
+
+    grade = assignment.find_grade("test2", "p1", "foo", "hacker123")
+    grade.manual_score = 2
+    grade.extra_credit = 0.5
+    assignment.db.commit()
+    assert assignment.check_score_rollup() == []
+    assignment.db.refresh(rollup)
+    assert rollup.score == 3.5
+    assert rollup.written_score == 2.5
+
+    assignment.remove_submission('foo', 'hacker123')
+    assert assignment.check_score_rollup() == []
+    assert assignment.db.query(api.ScoreRollup)\
+        .filter(api.ScoreRollup.level != api.SCORE_ROLLUP_ENABLED).count() == 0
+
+
+def test_check_and_rebuild_score_rollup(FiveStudents):
+    assign = FiveStudents
+    # nothing to check until the table has been built
+    assert assign.check_score_rollup() == []
+    assign.rebuild_score_rollup()
+    assert assign.check_score_rollup() == []
+
+    assign.db.execute(api.delete(api.ScoreRollup).where(api.ScoreRollup.level == "student"))
+    assign.db.execute(
+        api.ScoreRollup.__table__.update()
+        .where(api.ScoreRollup.level == "assignment")
+        .values(score=0.0))
+    assign.db.commit()
+
+    inconsistencies = assign.check_score_rollup()
+    missing = [x for x in inconsistencies if x["level"] == "student"]
+    assert len(missing) == 5 * len(api.SCORE_ROLLUP_FIELDS)
+    assert all(x["stored"] is None for x in missing)
+    stale = [x for x in inconsistencies if x["level"] == "assignment"]
+    assert len(stale) == 5
+    assert all(x["field"] == "score" and x["stored"] == 0.0 for x in stale)
+
+    assert assign.rebuild_score_rollup() == 15
+    assert assign.check_score_rollup() == []
+
+
+def test_grade_dicts(FiveAssignments):
+    gb = FiveAssignments
+    gb.add_student('s2', last_name='Bar')
+    s = gb.find_submission('a1', 's1')
+    s.notebooks[0].late_submission_penalty = 100
+    gb.db.commit()
+
+    expected = []
+    for assignment in gb.assignments:
+        for student in gb.students:
+            try:
+                submission = gb.find_submission(assignment.name, student.id)
+            except MissingEntry:
+                timestamp, raw_score, penalty = None, 0.0, 0.0
+            else:
+                timestamp = submission.timestamp
+                raw_score = submission.score
+                penalty = submission.late_submission_penalty
+            expected.append({
+                "assignment": assignment.name,
+                "duedate": assignment.duedate,
+                "timestamp": timestamp,
+                "student_id": student.id,
+                "last_name": student.last_name,
+                "first_name": student.first_name,
+                "email": student.email,
+                "raw_score": raw_score,
+                "late_submission_penalty": penalty,
+                "score": max(0.0, raw_score - penalty),
+                "max_score": assignment.max_score
+            })
+
+    assert list(gb.grade_dicts()) == expected
+    gb.use_score_rollup = True
+    assert list(gb.grade_dicts(batch_size=2)) == expected
+
+    grades = list(gb.grade_dicts(assignments=['a2', 'a3'], students=['s1']))
+    assert [(x["assignment"], x["student_id"]) for x in grades] == [('a2', 's1'), ('a3', 's1')]
+
+
+def test_grade_dicts_num_queries(gradebook):
+    def count_queries(gb):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        api.event.listen(gb.engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            list(gb.grade_dicts())
+        finally:
+            api.event.remove(gb.engine, "before_cursor_execute", before_cursor_execute)
+        return len(statements)
+
+    makeAssignments(gradebook, 1, 1, 2)
+    num_queries = count_queries(gradebook)
+
+    for i in range(10):
+        gradebook.add_student('t{}'.format(i))
+        gradebook.add_assignment('b{}'.format(i))
+    assert count_queries(gradebook) == num_queries
+
+
+#### Test shared engines
+
+def test_session_shares_engine(tmpdir):
+    db_url = "sqlite:///{}".format(tmpdir.join("gradebook.db"))
+    stats = api.gradebook_stats()
+
+    with Gradebook.session(db_url) as gb:
+        gb.add_assignment('foo')
+        engine = gb.engine
+    with Gradebook.session(db_url) as gb:
+        assert gb.engine is engine
+        assert gb.find_assignment('foo').name == 'foo'
+
+    new_stats = api.gradebook_stats()
+    assert new_stats["engines"] - stats["engines"] == 1
+    assert new_stats["sessions"] - stats["sessions"] == 2
+    assert new_stats["schema_checks"] - stats["schema_checks"] == 1
+
+    # regular gradebooks still create their own engine
+    with Gradebook(db_url) as gb:
+        assert gb.engine is not engine
+    assert api.gradebook_stats()["engines"] - new_stats["engines"] == 1
+
+
+def test_session_recreated_database(tmpdir):
+    db_url = "sqlite:///{}".format(tmpdir.join("gradebook.db"))
+    with Gradebook.session(db_url) as gb:
+        gb.add_assignment('foo')
+        engine = gb.engine
+
+    tmpdir.join("gradebook.db").remove()
+    stats = api.gradebook_stats()
+    with Gradebook.session(db_url) as gb:
+        assert gb.engine is not engine
+        with pytest.raises(MissingEntry):
+            gb.find_assignment('foo')
+        gb.add_assignment('bar')
+    assert api.gradebook_stats()["schema_checks"] - stats["schema_checks"] == 1
+
+
+def test_session_in_memory():
+    with Gradebook.session("sqlite:///:memory:") as gb:
+        gb.add_assignment('foo')
+        assert not gb.shared_engine
+    with Gradebook.session("sqlite:///:memory:") as gb:
+        with pytest.raises(MissingEntry):
+            gb.find_assignment('foo')
+
+
+def test_reset_engine_registry(tmpdir):
+    db_url = "sqlite:///{}".format(tmpdir.join("gradebook.db"))
+    with Gradebook.session(db_url) as gb:
+        engine = gb.engine
+
+    api.reset_engine_registry()
+    assert api.gradebook_stats() == {"engines": 0, "sessions": 0, "schema_checks": 0}
+    with Gradebook.session(db_url) as gb:
+        assert gb.engine is not engine
+    assert api.gradebook_stats() == {"engines": 1, "sessions": 1, "schema_checks": 1}
+
+
+def test_notebook_cells_revision(gradebook):
+    gradebook.add_assignment('foo')
+    gradebook.add_notebook('p1', 'foo')
+    gradebook.add_notebook('p2', 'foo')
+    revision = gradebook.find_notebook_cells_revision('p1', 'foo')
+    other_revision = gradebook.find_notebook_cells_revision('p2', 'foo')
+    assert revision is not None
+
+    # adding, modifying and removing cells changes the revision
+    revisions = [revision]
+    gradebook.add_grade_cell('test1', 'p1', 'foo', max_score=1, cell_type='code')
+    revisions.append(gradebook.find_notebook_cells_revision('p1', 'foo'))
+    gradebook.update_or_create_grade_cell('test1', 'p1', 'foo', max_score=2)
+    revisions.append(gradebook.find_notebook_cells_revision('p1', 'foo'))
+    gradebook.update_or_create_source_cell('test1', 'p1', 'foo', cell_type='code')
+    revisions.append(gradebook.find_notebook_cells_revision('p1', 'foo'))
+    gradebook.update_or_create_notebook_cells('p1', 'foo', grade_cells={})
+    revisions.append(gradebook.find_notebook_cells_revision('p1', 'foo'))
+    assert len(set(revisions)) == len(revisions)
+
+    # other notebooks and changes are not affected
+    gradebook.update_or_create_notebook('p1', 'foo', kernelspec='{}')
+    assert gradebook.find_notebook_cells_revision('p1', 'foo') == revisions[-1]
+    assert gradebook.find_notebook_cells_revision('p2', 'foo') == other_revision
+
+    with pytest.raises(MissingEntry):
+        gradebook.find_notebook_cells_revision('p3', 'foo')
@@ -9,6 +9,7 @@ from traitlets.config import Config
 from datetime import datetime
 
 from ...apps.api import NbGraderAPI
+from ...converters.base import BaseConverter
 from ...coursedir import CourseDirectory
 from ...utils import rmtree, get_username, parse_utc
 from .. import run_nbgrader
@@ -83,6 +84,36 @@ class TestNbGraderAPI(BaseTestApp):
         self._make_file(join(course_dir, "submitted", "foo", "ps1", "timestamp.txt"), contents=timestamp.isoformat())
         assert api.get_submitted_timestamp("ps1", "foo") == timestamp
 
+    def test_get_submitted_timestamps(self, api, course_dir):
+        assert api.get_submitted_timestamps("ps1") == {}
+
+        self._empty_notebook(join(course_dir, "submitted", "foo", "ps1", "problem1.ipynb"))
+        self._empty_notebook(join(course_dir, "submitted", "bar", "ps1", "problem1.ipynb"))
+        self._empty_notebook(join(course_dir, "submitted", "baz", "ps2", "problem1.ipynb"))
+        timestamp = datetime(2023, 1, 2, 3, 4, 5)
+        self._make_file(join(course_dir, "submitted", "foo", "ps1", "timestamp.txt"), contents=timestamp.isoformat())
+        assert api.get_submitted_timestamps("ps1") == {"foo": timestamp, "bar": None}
+        assert api.get_submitted_timestamp("ps1", "foo") == timestamp
+
+        # changed timestamps are read again
+        timestamp = datetime(2023, 1, 2, 3, 4, 5, 678)
+        self._make_file(join(course_dir, "submitted", "foo", "ps1", "timestamp.txt"), contents=timestamp.isoformat())
+        assert api.get_submitted_timestamps("ps1") == {"foo": timestamp, "bar": None}
+        assert api.get_submitted_timestamp("ps1", "foo") == timestamp
+
+    def test_get_submitted_students_custom_directory_structure(self, api, course_dir):
+        api.coursedir.directory_structure = join("{nbgrader_step}", "{assignment_id}", "{student_id}")
+        assert api.get_submitted_students("ps1") == set([])
+
+        self._empty_notebook(join(course_dir, "submitted", "ps1", "foo", "problem1.ipynb"))
+        self._empty_notebook(join(course_dir, "submitted", "ps1", "bar", "problem1.ipynb"))
+        self._empty_notebook(join(course_dir, "submitted", "ps2", "baz", "problem1.ipynb"))
+        timestamp = datetime.now()
+        self._make_file(join(course_dir, "submitted", "ps1", "foo", "timestamp.txt"), contents=timestamp.isoformat())
+        assert api.get_submitted_students("ps1") == {"foo", "bar"}
+        assert api.get_submitted_students("*") == {"foo", "bar", "baz"}
+        assert api.get_submitted_timestamps("ps1") == {"foo": timestamp, "bar": None}
+
     def test_get_autograded_students(self, api, course_dir, db):
         self._empty_notebook(join(course_dir, "source", "ps1", "problem1.ipynb"))
         run_nbgrader(["generate_assignment", "ps1", "--db", db])
@@ -762,6 +793,52 @@ class TestNbGraderAPI(BaseTestApp):
         result = api.generate_feedback("ps2", "foo")
         assert result["success"]
 
+    def test_converters_serial(self, api, course_dir, db, monkeypatch):
+        # the API never forks worker processes, even if the course sets --jobs
+        config = Config(api.config)
+        config.BaseConverter.parallelism = 4
+        api = NbGraderAPI(api.coursedir, config=config)
+
+        def convert_parallel(*args, **kwargs):
+            raise AssertionError("converted in parallel")
+        monkeypatch.setattr(BaseConverter, "_convert_assignments_parallel", convert_parallel)
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        api.generate_assignment("ps1")
+        for student in ["bar", "foo"]:
+            self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", student, "ps1", "p1.ipynb"))
+            assert api.autograde("ps1", student)["success"]
+        result = api.generate_feedback("ps1")
+        assert result["success"], result.get("error")
+        assert os.path.exists(join(course_dir, "feedback", "bar", "ps1", "p1.html"))
+        assert os.path.exists(join(course_dir, "feedback", "foo", "ps1", "p1.html"))
+
+    @notwindows
+    def test_feedback_progress(self, api, course_dir, db, exchange):
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        api.generate_assignment("ps1")
+        for student in ["bar", "foo"]:
+            self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", student, "ps1", "p1.ipynb"))
+            self._copy_file(join("files", "timestamp.txt"), join(course_dir, "submitted", student, "ps1", "timestamp.txt"))
+            self._copy_file(join("files", "submission_secret.txt"),
+                            join(course_dir, "submitted", student, "ps1", "submission_secret.txt"))
+            api.autograde("ps1", student)
+
+        progress = []
+        api.progress_callback = lambda done, total, item: progress.append((done, total, item))
+        result = api.generate_feedback("ps1")
+        assert result["success"]
+        assert [(done, total) for done, total, _ in progress] == [(0, 2), (1, 2), (2, 2)]
+        assert progress[0][2] is None
+        assert [item["student_id"] for _, _, item in progress[1:]] == ["bar", "foo"]
+        assert all(item["processed"] and not item["failed"] for _, _, item in progress[1:])
+
+        del progress[:]
+        result = api.release_feedback("ps1")
+        assert result["success"]
+        assert [(done, total) for done, total, _ in progress] == [(0, 2), (1, 2), (2, 2)]
+        assert sorted(item["student_id"] for _, _, item in progress[1:]) == ["bar", "foo"]
+
     @notwindows
     def test_release_feedback(self, api, course_dir, db, exchange):
         self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
@@ -95,6 +95,137 @@ class TestNbGraderAutograde(BaseTestApp):
             assert comment2.comment == None
 
 
+    def test_grade_parallel(self, db, course_dir):
+        """Can submissions be graded by several worker processes?"""
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db, "--duedate", "2015-02-02 14:58:23.948203 America/Los_Angeles"])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+
+        students = ["foo", "bar", "baz"]
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "baz", "ps1", "p1.ipynb"))
+        output = run_nbgrader(["autograde", "ps1", "--db", db, "--jobs", "2"])
+
+        assert "Converting 3 submissions with 2 worker processes" in output
+        assert "worker utilization" in output
+        for student in students:
+            assert os.path.isfile(join(course_dir, "autograded", student, "ps1", "p1.ipynb"))
+
+        with Gradebook(db) as gb:
+            assert gb.find_submission_notebook("p1", "ps1", "foo").score == 1
+            assert gb.find_submission_notebook("p1", "ps1", "bar").score == 2
+            assert gb.find_submission_notebook("p1", "ps1", "baz").score == 2
+            assert gb.find_submission_notebook("p1", "ps1", "baz").needs_manual_grade
+
+    def test_grade_parallel_failure(self, db, course_dir):
+        """Are failed submissions cleaned up and reported when grading in parallel?"""
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db, "--duedate", "2015-02-02 14:58:23.948203 America/Los_Angeles"])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        self._make_file(join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"), "invalid notebook")
+        output = run_nbgrader(["autograde", "ps1", "--db", db, "--jobs", "2"], retcode=1)
+
+        assert "There was an error processing assignment 'ps1' for student 'bar'" in output
+        assert os.path.isfile(join(course_dir, "autograded", "foo", "ps1", "p1.ipynb"))
+        assert not os.path.exists(join(course_dir, "autograded", "bar", "ps1"))
+
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_grade_profile(self, db, course_dir, jobs):
+        """Are the phases of autograding profiled and written to a trace?"""
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db, "--duedate", "2015-02-02 14:58:23.948203 America/Los_Angeles"])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"))
+        output = run_nbgrader([
+            "autograde", "ps1", "--db", db, "--jobs", jobs,
+            "--profile", "--trace-file", "trace.json"])
+
+        assert "Time spent in each phase" in output
+        assert "execute_cell" in output
+
+        with open(join(course_dir, "trace.json"), "r") as fh:
+            events = json.load(fh)["traceEvents"]
+        names = {(e["cat"], e["name"]) for e in events}
+        for name in [("submission", "init_assignment"), ("submission", "copy_files"),
+                     ("notebook", "autograde"), ("preprocessor", "Execute"),
+                     ("preprocessor", "SaveAutoGrades"), ("cell", "execute_cell")]:
+            assert name in names
+        assert len([e for e in events if e["name"] == "init_assignment"]) == 2
+        assert all(e["ph"] == "X" for e in events)
+
+    @pytest.mark.parametrize("strategy", ["restart", "reset"])
+    def test_grade_kernel_pool(self, db, course_dir, strategy):
+        """Are grades unchanged when using a pool of pre-started kernels?"""
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db, "--duedate", "2015-02-02 14:58:23.948203 America/Los_Angeles"])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "baz", "ps1", "p1.ipynb"))
+        output = run_nbgrader([
+            "autograde", "ps1", "--db", db,
+            "--Execute.kernel_pool_size=1",
+            "--Execute.kernel_reset_strategy={}".format(strategy),
+            "--Execute.kernel_warmup_code=import json"])
+
+        assert "Kernel startup latency" in output
+        assert "Kernel pool 'python3' ran 3 notebooks" in output
+
+        with Gradebook(db) as gb:
+            assert gb.find_submission_notebook("p1", "ps1", "foo").score == 1
+            assert gb.find_submission_notebook("p1", "ps1", "bar").score == 2
+            assert gb.find_submission_notebook("p1", "ps1", "baz").score == 1
+
+    def test_grade_incremental(self, db, course_dir):
+        """Are only submissions whose inputs changed autograded again?"""
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db, "--duedate", "2015-02-02 14:58:23.948203 America/Los_Angeles"])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"))
+        run_nbgrader(["autograde", "ps1", "--db", db])
+
+        with Gradebook(db) as gb:
+            assert gb.find_submission_notebook("p1", "ps1", "foo").fingerprint is not None
+            assert gb.find_submission_notebook("p1", "ps1", "bar").score == 1
+
+        # nothing changed
+        output = run_nbgrader(["autograde", "ps1", "--db", db, "--explain-skip"])
+        assert "Assignment 'ps1' for student 'foo' is unchanged" in output
+        assert "Assignment 'ps1' for student 'bar' is unchanged" in output
+        assert "Skipping existing assignment" in output
+
+        # only the submitted notebook of one student changed
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"))
+        output = run_nbgrader(["autograde", "ps1", "--db", db, "--explain-skip"])
+        assert "Assignment 'ps1' for student 'foo' is unchanged" in output
+        assert "Autograding assignment 'ps1' for student 'bar': p1 changed (submission)" in output
+
+        with Gradebook(db) as gb:
+            assert gb.find_submission_notebook("p1", "ps1", "foo").score == 1
+            assert gb.find_submission_notebook("p1", "ps1", "bar").score == 2
+
+        # the autograder configuration changed
+        output = run_nbgrader(["autograde", "ps1", "--db", db, "--explain-skip", "--Execute.timeout=31"])
+        assert "Autograding assignment 'ps1' for student 'foo': p1 changed (config)" in output
+        assert "Autograding assignment 'ps1' for student 'bar': p1 changed (config)" in output
+
+        # without --incremental, nothing is autograded again
+        output = run_nbgrader(["autograde", "ps1", "--db", db])
+        assert "Skipping existing assignment: {}".format(join(course_dir, "autograded", "foo", "ps1")) in output
+
     def test_grade_autotest(self, db, course_dir):
         """Can files including autotest commands be graded?"""
         run_nbgrader(["db", "assignment", "add", "ps1", "--db", db, "--duedate", "2015-02-02 14:58:23.948203 America/Los_Angeles"])
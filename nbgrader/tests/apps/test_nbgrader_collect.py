@@ -1,5 +1,6 @@
 import datetime
 import os
+import shutil
 import time
 import pytest
 
@@ -9,6 +10,7 @@ from .. import run_nbgrader
 from .base import BaseTestApp
 from .conftest import notwindows
 from ...api import Gradebook
+from ...exchange.default.index import SubmissionIndex
 from ...utils import parse_utc, get_username
 
 
@@ -104,6 +106,31 @@ class TestNbGraderCollect(BaseTestApp):
         self._collect("ps1", exchange, ["--update"])
         assert self._read_timestamp(root) != timestamp
 
+    def test_collect_with_index(self, exchange, course_dir, cache):
+        self._release_and_fetch("ps1", exchange, course_dir)
+        self._submit("ps1", exchange, cache)
+        run_nbgrader([
+            "list", "--inbound", "--rebuild-index",
+            "--course", "abc101",
+            "--Exchange.root={}".format(exchange)
+        ])
+        inbound = os.path.join(exchange, "abc101", "inbound")
+        assert os.path.isfile(os.path.join(inbound, SubmissionIndex.filename))
+
+        # submissions that are in the index but were deleted are skipped
+        filename, = SubmissionIndex(inbound).records()
+        shutil.rmtree(os.path.join(inbound, filename))
+        self._collect("ps1", exchange)
+        assert not os.path.isdir(os.path.join(course_dir, "submitted"))
+
+        # submissions missing from the index are still collected
+        time.sleep(1)
+        self._submit("ps1", exchange, cache)
+        open(os.path.join(inbound, SubmissionIndex.filename), "w").close()
+        self._collect("ps1", exchange)
+        root = os.path.join(course_dir, "submitted", get_username(), "ps1")
+        assert os.path.isfile(os.path.join(root, "p1.ipynb"))
+
     def test_collect_assignment_flag(self, exchange, course_dir, cache):
         self._release_and_fetch("ps1", exchange, course_dir)
         self._submit("ps1", exchange, cache)
@@ -6,7 +6,7 @@ import os
 from textwrap import dedent
 from os.path import join
 
-from ...api import Gradebook, MissingEntry
+from ...api import Gradebook, MissingEntry, ScoreRollup
 from .. import run_nbgrader
 from .base import BaseTestApp
 
@@ -26,6 +26,8 @@ class TestNbGraderDb(BaseTestApp):
         run_nbgrader(["db", "assignment", "remove", "--help-all"])
         run_nbgrader(["db", "assignment", "add", "--help-all"])
         run_nbgrader(["db", "assignment", "import", "--help-all"])
+        run_nbgrader(["db", "rebuild-scores", "--help-all"])
+        run_nbgrader(["db", "check-scores", "--help-all"])
 
     def test_no_args(self):
         """Is there an error if no arguments are given?"""
@@ -203,6 +205,43 @@ class TestNbGraderDb(BaseTestApp):
             assert student.email is None
 
 
+    def test_student_import_invalid(self, db, temp_cwd):
+        run_nbgrader(["db", "student", "add", "foo", "--last-name=xyz", "--db", db])
+
+        # nothing is imported if one of the rows is invalid
+        with open("students.csv", "w") as fh:
+            fh.write(dedent(
+                """
+                id,first_name,last_name,email
+                foo,abc,uvw,foo@bar.com
+                ,def,,
+                bar,,,
+                """
+            ).strip())
+
+        output = run_nbgrader(["db", "student", "import", "students.csv", "--db", db], retcode=1)
+        assert "line 3: no id given" in output
+        with Gradebook(db) as gb:
+            assert gb.find_student("foo").last_name == "xyz"
+            with pytest.raises(MissingEntry):
+                gb.find_student("bar")
+
+        # the last row of a student is imported
+        with open("students.csv", "w") as fh:
+            fh.write(dedent(
+                """
+                id,first_name,last_name,email
+                foo,abc,uvw,foo@bar.com
+                bar,,,
+                foo,abc,rst,foo@bar.com
+                """
+            ).strip())
+
+        run_nbgrader(["db", "student", "import", "students.csv", "--db", db])
+        with Gradebook(db) as gb:
+            assert gb.find_student("foo").last_name == "rst"
+            assert gb.find_student("bar").last_name is None
+
     def test_student_import_csv_spaces(self, db, temp_cwd):
         with open("students.csv", "w") as fh:
             fh.write(dedent(
@@ -331,6 +370,23 @@ class TestNbGraderDb(BaseTestApp):
             assert assignment.duedate is None
 
 
+    def test_assignment_import_invalid(self, db, temp_cwd):
+        # nothing is imported if one of the due dates is invalid
+        with open("assignments.csv", "w") as fh:
+            fh.write(dedent(
+                """
+                name,duedate
+                foo,Sun Jan 8 2017 4:31:22 PM
+                bar,not a date
+                """
+            ).strip())
+
+        output = run_nbgrader(["db", "assignment", "import", "assignments.csv", "--db", db], retcode=1)
+        assert "line 3: invalid duedate 'not a date'" in output
+        with Gradebook(db) as gb:
+            with pytest.raises(MissingEntry):
+                gb.find_assignment("foo")
+
     def test_assignment_import_csv_spaces(self, db, temp_cwd):
         with open("assignments.csv", "w") as fh:
             fh.write(dedent(
@@ -421,3 +477,29 @@ class TestNbGraderDb(BaseTestApp):
 
         # check that nbgrader generate_assignment passes
         run_nbgrader(["generate_assignment", "ps1"])
+
+    def test_rebuild_scores(self, db, course_dir):
+        run_nbgrader(["db", "student", "add", "foo", "--db", db])
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db])
+        # start using the precomputed scores
+        run_nbgrader(["db", "rebuild-scores", "--db", db])
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        run_nbgrader(["autograde", "ps1", "--db", db])
+
+        # the precomputed scores are kept up to date by autograding
+        run_nbgrader(["db", "check-scores", "--db", db])
+
+        with Gradebook(db) as gb:
+            score = gb.find_submission("ps1", "foo").score
+            gb.db.execute(ScoreRollup.__table__.update().values(score=score + 1))
+            gb.db.commit()
+
+        run_nbgrader(["db", "check-scores", "--db", db], retcode=1)
+        run_nbgrader(["db", "rebuild-scores", "--db", db])
+        run_nbgrader(["db", "check-scores", "--db", db])
+
+        with Gradebook(db, use_score_rollup=True) as gb:
+            submission, = gb.submission_dicts("ps1")
+            assert submission["score"] == score
@@ -1,4 +1,6 @@
 import os
+import json
+import pytest
 
 from os.path import join
 from ...utils import remove
@@ -63,3 +65,39 @@ class TestNbGraderExport(BaseTestApp):
         with open("grades.csv", "r") as fh:
             contents = fh.readlines()
         assert len(contents) == 2
+
+    def test_export_json_lines(self, db, course_dir):
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db, "--duedate",
+                      "2015-02-02 14:58:23.948203 America/Los_Angeles"])
+        run_nbgrader(["db", "student", "add", "foo", "--db", db])
+        run_nbgrader(["db", "student", "add", "bar", "--db", db])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+        self._copy_file(join("files", "submitted-changed.ipynb"), join(course_dir, "submitted", "bar", "ps1", "p1.ipynb"))
+        run_nbgrader(["autograde", "ps1", "--db", db])
+
+        run_nbgrader(["export", "--db", db])
+        run_nbgrader(["export", "--db", db, "--exporter", "nbgrader.plugins.JsonLinesExportPlugin"])
+        assert os.path.isfile("grades.jsonl")
+        with open("grades.jsonl", "r") as fh:
+            grades = [json.loads(line) for line in fh]
+        with open("grades.csv", "r") as fh:
+            contents = fh.readlines()
+
+        assert [x["student_id"] for x in grades] == ["bar", "foo"]
+        assert grades[0]["duedate"] == "2015-02-02T22:58:23.948203"
+        assert grades[1]["score"] == 0.0
+        assert contents[1].split(",")[3] == "bar"
+        assert contents[1].split(",")[9] == str(grades[0]["score"])
+
+    def test_export_parquet(self, db, course_dir):
+        pq = pytest.importorskip("pyarrow.parquet")
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db])
+        run_nbgrader(["db", "student", "add", "foo", "--db", db])
+        run_nbgrader(["db", "student", "add", "bar", "--db", db])
+
+        run_nbgrader(["export", "--db", db, "--exporter", "nbgrader.plugins.ParquetExportPlugin"])
+        assert os.path.isfile("grades.parquet")
+        table = pq.read_table("grades.parquet")
+        assert table.column("student_id").to_pylist() == ["bar", "foo"]
@@ -381,3 +381,41 @@ class TestNbGraderFeedback(BaseTestApp):
         assert exists(join(course_dir, "feedback", "foo", "ps1", "p2.html"))
         assert not exists(join(course_dir, "feedback", "bar", "ps1", "p1.html"))
         assert not exists(join(course_dir, "feedback", "bar", "ps1", "p2.html"))
+
+    def test_parallel(self, db, course_dir):
+        """Is the feedback of every student generated with several jobs?"""
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db])
+        for student in ["foo", "bar", "baz"]:
+            run_nbgrader(["db", "student", "add", student, "--db", db])
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+
+        for student in ["foo", "bar", "baz"]:
+            self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", student, "ps1", "p1.ipynb"))
+        run_nbgrader(["autograde", "ps1", "--db", db])
+        run_nbgrader(["generate_feedback", "ps1", "--db", db, "--jobs", "2"])
+
+        for student in ["foo", "bar", "baz"]:
+            html = self._file_contents(join(course_dir, "feedback", student, "ps1", "p1.html"))
+            assert "bootstrap" in html.lower()
+
+    def test_shared_stylesheet(self, db, course_dir):
+        """Is the stylesheet written once and linked from the feedback?"""
+        run_nbgrader(["db", "assignment", "add", "ps1", "--db", db])
+        run_nbgrader(["db", "student", "add", "foo", "--db", db])
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "source", "ps1", "p1.ipynb"))
+        run_nbgrader(["generate_assignment", "ps1", "--db", db])
+
+        self._copy_file(join("files", "submitted-unchanged.ipynb"), join(course_dir, "submitted", "foo", "ps1", "p1.ipynb"))
+        run_nbgrader(["autograde", "ps1", "--db", db])
+        run_nbgrader(["generate_feedback", "ps1", "--db", db])
+        inlined = self._file_contents(join(course_dir, "feedback", "foo", "ps1", "p1.html"))
+
+        run_nbgrader(["generate_feedback", "ps1", "--db", db, "--force", "--shared-stylesheet"])
+        linked = self._file_contents(join(course_dir, "feedback", "foo", "ps1", "p1.html"))
+        stylesheet = self._file_contents(join(course_dir, "feedback", "feedback.css"))
+
+        assert 'href="../../feedback.css"' in linked
+        assert len(linked) < len(inlined) - 100000
+        assert "Bootstrap" in stylesheet
+        assert ".highlight" in stylesheet
@@ -1,4 +1,6 @@
+import json
 import os
+import shutil
 import time
 
 from textwrap import dedent
@@ -7,6 +9,7 @@ from .. import run_nbgrader
 from .base import BaseTestApp
 from .conftest import notwindows
 
+from ...exchange.default.index import SubmissionIndex
 from ...utils import get_username
 
 
@@ -359,6 +362,102 @@ class TestNbGraderList(BaseTestApp):
     def test_list_cached_and_inbound(self, exchange, cache):
         self._list(exchange, cache, flags=["--inbound", "--cached"], retcode=1)
 
+    def test_list_inbound_index(self, exchange, cache, course_dir):
+        self._release("ps1", exchange, cache, course_dir)
+        self._fetch("ps1", exchange, cache)
+        self._submit("ps1", exchange, cache)
+
+        inbound = os.path.join(exchange, "abc101", "inbound")
+        index = SubmissionIndex(inbound)
+        assert not index.exists()
+
+        self._list(exchange, cache, "ps1", flags=["--inbound", "--rebuild-index"])
+        assert index.exists()
+        assert len(index.records()) == 1
+
+        # new submissions are appended to the index
+        time.sleep(1)
+        self._submit("ps1", exchange, cache)
+        records = index.records()
+        filenames = sorted(x for x in os.listdir(inbound) if x != SubmissionIndex.filename)
+        assert sorted(records) == filenames
+        assert records[filenames[0]]["notebooks"] == ["p1.ipynb"]
+
+        timestamps = [x.split("+")[2] for x in filenames]
+        assert self._list(exchange, cache, "ps1", flags=["--inbound"]) == dedent(
+            """
+            [ListApp | INFO] Submitted assignments:
+            [ListApp | INFO] abc101 {} ps1 {} (no feedback available)
+            [ListApp | INFO] abc101 {} ps1 {} (no feedback available)
+            """.format(get_username(), timestamps[0], get_username(), timestamps[1])
+        ).lstrip()
+
+        # submissions missing from the index are listed, with a warning,
+        # until it is rebuilt
+        shutil.copytree(
+            os.path.join(inbound, filenames[0]),
+            os.path.join(inbound, "foo+ps1+" + timestamps[0]))
+        output = self._list(exchange, cache, "ps1", flags=["--inbound"])
+        assert "abc101 foo ps1" in output
+        assert "missing from the submission index" in output
+        self._list(exchange, cache, "ps1", flags=["--inbound", "--rebuild-index"])
+        output = self._list(exchange, cache, "ps1", flags=["--inbound"])
+        assert "abc101 foo ps1" in output
+        assert "missing from the submission index" not in output
+
+        # the index cannot hide submissions
+        open(index.path, "w").close()
+        assert len(index.records()) == 3
+
+        # removed submissions are removed from the index
+        self._list(exchange, cache, "ps1", flags=["--inbound", "--remove"])
+        assert index.records() == {}
+        assert os.listdir(inbound) == [SubmissionIndex.filename]
+
+    def test_list_cached_index(self, exchange, cache, course_dir):
+        self._release("ps1", exchange, cache, course_dir)
+        self._fetch("ps1", exchange, cache)
+        self._submit("ps1", exchange, cache)
+
+        self._list(exchange, cache, "ps1", flags=["--cached", "--rebuild-index"])
+        index = SubmissionIndex(os.path.join(cache, "abc101"))
+        assert len(index.records()) == 1
+
+        time.sleep(1)
+        self._submit("ps1", exchange, cache)
+        assert len(index.records()) == 2
+        output = self._list(exchange, cache, "ps1", flags=["--cached"])
+        assert len(output.splitlines()) == 3
+
+    def test_list_inbound_index_untrusted(self, exchange, cache, course_dir):
+        self._release("ps1", exchange, cache, course_dir)
+        self._fetch("ps1", exchange, cache)
+        self._submit("ps1", exchange, cache)
+        self._list(exchange, cache, "ps1", flags=["--inbound", "--rebuild-index"])
+
+        inbound = os.path.join(exchange, "abc101", "inbound")
+        filename, = [x for x in os.listdir(inbound) if x != SubmissionIndex.filename]
+        timestamp = filename.split("+")[2]
+        with open(os.path.join(inbound, SubmissionIndex.filename), "a") as fh:
+            for entry in [
+                    # removals, paths, missing submissions and the ids in the
+                    # entries are ignored
+                    {"op": "remove", "filename": filename},
+                    {"filename": os.path.join("..", "foo+ps1+" + timestamp)},
+                    {"filename": "foo+ps1+" + timestamp},
+                    {"filename": filename, "student_id": "foo", "notebooks": ["p1.ipynb"]},
+                    {"filename": filename, "notebooks": [os.path.join("..", "p1.ipynb")]}]:
+                fh.write(json.dumps(entry) + "\n")
+
+        records = SubmissionIndex(inbound).records()
+        assert list(records) == [filename]
+        assert records[filename]["student_id"] == get_username()
+        assert records[filename]["notebooks"] == ["p1.ipynb"]
+        assert "abc101 foo" not in self._list(exchange, cache, "ps1", flags=["--inbound"])
+
+    def test_list_rebuild_index_outbound(self, exchange, cache):
+        self._list(exchange, cache, flags=["--rebuild-index"], retcode=1)
+
     def test_list_without_random_string(self, exchange, cache, course_dir):
         self._release("ps1", exchange, cache, course_dir)
         self._fetch("ps1", exchange, cache)
@@ -437,6 +536,49 @@ class TestNbGraderList(BaseTestApp):
             """.format(get_username(), timestamps[0], get_username(), timestamps[1])
         ).lstrip()
 
+    def test_list_feedback_inbound_unchecked(self, exchange, cache, course_dir):
+        self._release_full("ps1", exchange, cache, course_dir)
+        self._fetch("ps1", exchange, cache)
+        self._submit("ps1", exchange, cache)
+        self._make_feedback("ps1", exchange, cache, course_dir)
+        time.sleep(1)
+        self._submit("ps1", exchange, cache)
+
+        filenames = sorted(os.listdir(os.path.join(exchange, "abc101", "inbound")))
+        timestamps = [x.split("+")[2] for x in filenames]
+        assert self._list(exchange, cache, "ps1", flags=["--inbound", "--no-feedback"]) == dedent(
+            """
+            [ListApp | INFO] Submitted assignments:
+            [ListApp | INFO] abc101 {} ps1 {}
+            [ListApp | INFO] abc101 {} ps1 {}
+            """.format(get_username(), timestamps[0], get_username(), timestamps[1])
+        ).lstrip()
+
+    def test_list_feedback_cached_unlistable(self, exchange, cache, course_dir, monkeypatch):
+        self._release_full("ps1", exchange, cache, course_dir)
+        self._fetch("ps1", exchange, cache)
+        self._submit("ps1", exchange, cache)
+        self._make_feedback("ps1", exchange, cache, course_dir)
+
+        # students cannot list the feedback directory (its mode is 0o711), but
+        # can still check whether their own feedback exists
+        feedback_dir = os.path.join(exchange, "abc101", "feedback")
+        listdir = os.listdir
+
+        def fake_listdir(path):
+            if os.path.abspath(path) == os.path.abspath(feedback_dir):
+                raise PermissionError(13, "Permission denied", path)
+            return listdir(path)
+
+        monkeypatch.setattr(os, "listdir", fake_listdir)
+        timestamp = listdir(os.path.join(exchange, "abc101", "inbound"))[0].split("+")[2]
+        assert self._list(exchange, cache, "ps1", flags=["--cached"]) == dedent(
+            """
+            [ListApp | INFO] Submitted assignments:
+            [ListApp | INFO] abc101 {} ps1 {} (feedback ready to be fetched)
+            """.format(get_username(), timestamp)
+        ).lstrip()
+
     def test_list_feedback_cached(self, exchange, cache, course_dir):
         self._release_full("ps1", exchange, cache, course_dir)
         self._fetch("ps1", exchange, cache)
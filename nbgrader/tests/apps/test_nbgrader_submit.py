@@ -6,7 +6,7 @@ import pytest
 
 from os.path import join, isfile, exists
 
-from ...utils import parse_utc, get_username
+from ...utils import parse_utc, get_username, compute_file_hash
 from .. import run_nbgrader
 from .base import BaseTestApp
 from .conftest import notwindows
@@ -120,6 +120,86 @@ class TestNbGraderSubmit(BaseTestApp):
         with open(join(cache, "abc101", filename, "timestamp.txt"), "r") as fh:
             assert fh.read() == timestamp2
 
+    def test_submit_blob_store(self, exchange, cache, course_dir):
+        flags = ["--Exchange.use_blob_store=True"]
+        self._copy_file(join("files", "test.ipynb"), join(course_dir, "release", "ps1", "p1.ipynb"))
+        run_nbgrader([
+            "release_assignment", "ps1",
+            "--course", "abc101",
+            "--Exchange.cache={}".format(cache),
+            "--Exchange.root={}".format(exchange)
+        ] + flags)
+        blobs = join(exchange, "abc101", "blobs")
+        assert os.path.isdir(blobs)
+        self._fetch("ps1", exchange, cache)
+
+        self._submit("ps1", exchange, cache, flags=flags)
+        time.sleep(1)
+        self._submit("ps1", exchange, cache, flags=flags)
+
+        inbound = join(exchange, "abc101", "inbound")
+        filenames = sorted(os.listdir(inbound))
+        assert len(filenames) == 2
+        st1 = os.stat(join(inbound, filenames[0], "p1.ipynb"))
+        st2 = os.stat(join(inbound, filenames[1], "p1.ipynb"))
+        assert st1.st_ino == st2.st_ino
+        assert st1.st_nlink == 3
+        # the mode of the shared blob is not changed by the submissions
+        assert stat.S_IMODE(st1.st_mode) == 0o444
+        timestamps = [x.split("+")[2] for x in filenames]
+        for filename, timestamp in zip(filenames, timestamps):
+            with open(join(inbound, filename, "timestamp.txt"), "r") as fh:
+                assert fh.read() == timestamp
+
+        cached = sorted(x for x in os.listdir(join(cache, "abc101")) if x != ".blobs")
+        assert len(cached) == 2
+        assert os.stat(join(cache, "abc101", cached[0], "p1.ipynb")).st_nlink == 3
+
+        # the submissions can be collected as usual
+        run_nbgrader([
+            "collect", "ps1",
+            "--course", "abc101",
+            "--Exchange.root={}".format(exchange),
+            "--CourseDirectory.root={}".format(course_dir)
+        ])
+        submitted = join(course_dir, "submitted", get_username(), "ps1")
+        assert isfile(join(submitted, "p1.ipynb"))
+        with open(join(submitted, "timestamp.txt"), "r") as fh:
+            assert fh.read() == timestamps[1]
+
+        # removing the submissions removes the blobs that are not used anymore
+        assert len(os.listdir(blobs)) == 1
+        run_nbgrader([
+            "list", "ps1", "--inbound", "--remove",
+            "--course", "abc101",
+            "--Exchange.root={}".format(exchange)
+        ] + flags)
+        assert os.listdir(inbound) == []
+        assert os.listdir(blobs) == []
+
+    def test_submit_blob_store_untrusted(self, exchange, cache, course_dir):
+        flags = ["--Exchange.use_blob_store=True"]
+        self._release_and_fetch("ps1", exchange, cache, course_dir)
+        blobs = join(exchange, "abc101", "blobs")
+        os.makedirs(blobs)
+
+        # a blob that others can write to is not used, even if its name is
+        # the digest of the submitted file
+        blob = join(blobs, compute_file_hash(join("ps1", "p1.ipynb")))
+        with open(blob, "w") as fh:
+            fh.write("not the notebook")
+        os.chmod(blob, 0o666)
+
+        self._submit("ps1", exchange, cache, flags=flags)
+        inbound = join(exchange, "abc101", "inbound")
+        filename, = os.listdir(inbound)
+        submitted = join(inbound, filename, "p1.ipynb")
+        assert os.stat(submitted).st_nlink == 1
+        with open(submitted, "r") as fh, open(join("ps1", "p1.ipynb"), "r") as fh2:
+            assert fh.read() == fh2.read()
+        with open(blob, "r") as fh:
+            assert fh.read() == "not the notebook"
+
     def test_submit_extra(self, exchange, cache, course_dir):
         self._release_and_fetch("ps1", exchange, cache, course_dir)
         self._copy_file(join("files", "test.ipynb"), join("ps1", "p2.ipynb"))
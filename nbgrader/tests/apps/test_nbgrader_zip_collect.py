@@ -126,6 +126,44 @@ class TestNbGraderZipCollect(BaseTestApp):
             cnt += len(files)
         assert cnt == nfiles
 
+    def test_collect_stream_archive(self, course_dir, archive_dir):
+        extracted_dir = join(archive_dir, "..", "extracted")
+        submitted_dir = join(course_dir, "submitted")
+        archive = join(archive_dir, "notebooks.zip")
+        self._copy_file(join("files", "notebooks.zip"), archive)
+        self._make_notebook(archive_dir,
+            'ps1', 'bitdiddle', '2016-02-10-15-30-10', 'problem1')
+
+        with open("nbgrader_config.py", "a") as fh:
+            fh.write(dedent(
+                """
+                c.FileNameCollectorPlugin.named_regexp = (
+                    r".+_(?P<student_id>\w+)_attempt_(?P<timestamp>[0-9\-]+)_(?P<file_id>\w+)"
+                )
+                """
+            ))
+
+        run_nbgrader(["zip_collect", "--stream", "--jobs=2", "ps1"])
+
+        # the archive is not extracted, only the other file is copied
+        copied = 'ps1_bitdiddle_attempt_2016-02-10-15-30-10_problem1.ipynb'
+        assert os.listdir(extracted_dir) == [copied]
+
+        for student in ["bitdiddle", "hacker"]:
+            assert os.path.isfile(join(submitted_dir, student, "ps1", 'problem1.ipynb'))
+            assert os.path.isfile(join(submitted_dir, student, "ps1", 'problem2.ipynb'))
+            assert os.path.isfile(join(submitted_dir, student, "ps1", 'timestamp.txt'))
+
+        # files are read from the archive, unless a newer submission exists
+        with zipfile.ZipFile(archive) as zf:
+            expected = zf.read('ps1_hacker_attempt_2016-01-30-15-00-00_problem2.ipynb')
+        with open(join(submitted_dir, "hacker", "ps1", 'problem2.ipynb'), 'rb') as fh:
+            assert fh.read() == expected
+        with open(join(extracted_dir, copied), 'rb') as fh:
+            expected = fh.read()
+        with open(join(submitted_dir, "bitdiddle", "ps1", 'problem1.ipynb'), 'rb') as fh:
+            assert fh.read() == expected
+
     def test_collect_no_regexp(self, course_dir, archive_dir):
         extracted_dir = join(archive_dir, "..", "extracted")
         submitted_dir = join(course_dir, "submitted")
@@ -322,6 +360,30 @@ class TestNbGraderZipCollect(BaseTestApp):
         msg = "Replacing previously collected submission file"
         assert sum([msg in line for line in output.splitlines()]) == 2
 
+    def test_collect_dry_run(self, course_dir, archive_dir):
+        submitted_dir = join(course_dir, "submitted")
+        for timestamp in ['2016-01-30-15-30-10', '2016-02-10-15-30-10']:
+            for student in ['bitdiddle', 'hacker']:
+                self._make_notebook(archive_dir,
+                    'ps1', student, timestamp, 'problem1')
+        self._make_notebook(archive_dir,
+            'ps1', 'hacker', '2016-01-30-15-30-10', 'problem2')
+
+        with open("nbgrader_config.py", "a") as fh:
+            fh.write(dedent(
+                """
+                c.FileNameCollectorPlugin.named_regexp = (
+                    r".+_(?P<student_id>\w+)_attempt_(?P<timestamp>[0-9\-]+)_(?P<file_id>\w+)"
+                )
+                """
+            ))
+
+        output = run_nbgrader(["zip_collect", "--dry-run", "ps1"])
+        assert not os.path.isdir(submitted_dir)
+        assert "bitdiddle: 1 collected, 0 skipped, 1 replaced" in output
+        assert "hacker: 2 collected, 0 skipped, 1 replaced" in output
+        assert "Total: 3 files collected for 2 students, 0 skipped, 2 replaced" in output
+
     def test_collect_sub_dir_single_notebook(self, course_dir, archive_dir):
         extracted_dir = join(archive_dir, "..", "extracted")
         submitted_dir = join(course_dir, "submitted")
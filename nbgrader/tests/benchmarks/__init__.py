@@ -0,0 +1,27 @@
+"""Performance benchmarks of nbgrader.
+
+The benchmarks generate a synthetic course (a course directory, its
+gradebook and an exchange, see :class:`~.course.SyntheticCourse`) and time
+scenarios against it: gradebook aggregations, formgrader API calls, exchange
+listing and collection, autograding and collecting the files of a LMS
+(see :mod:`.scenarios`). They run offline, against SQLite by default or any
+other database (e.g. a local Postgres) with ``--db``. Results are stored as
+JSON files, named after the commit they were obtained with, so that they can
+be compared between commits::
+
+    python -m nbgrader.tests.benchmarks --students 200
+    git checkout my-branch
+    python -m nbgrader.tests.benchmarks --students 200 --compare
+
+"""
+
+from .course import SyntheticCourse, generate_course
+from .runner import compare_results, run_benchmarks, select_scenarios
+
+__all__ = [
+    "SyntheticCourse",
+    "compare_results",
+    "generate_course",
+    "run_benchmarks",
+    "select_scenarios"
+]
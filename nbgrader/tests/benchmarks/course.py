@@ -0,0 +1,288 @@
+"""Generation of synthetic courses for the benchmarks."""
+
+import datetime
+import json
+import os
+import random
+import shutil
+
+from nbformat import write as write_nb
+from nbformat.v4 import new_markdown_cell, new_notebook
+from sqlalchemy import create_engine, text
+from traitlets.config import Config
+from typing import Any, Dict, Optional
+
+from ...api import Base, Gradebook
+from ...preprocessors import ComputeChecksums, SaveCells
+from .. import (
+    create_solution_cell, create_grade_cell, create_grade_and_solution_cell,
+    create_task_cell)
+
+
+class SyntheticCourse(object):
+    """A generated course: its directory, database and exchange.
+
+    Parameters
+    ----------
+    root:
+        the directory in which the course is generated. The course
+        directory is ``{root}/course`` and the exchange ``{root}/exchange``.
+    db_url:
+        the URL of the database of the course (by default, a SQLite database
+        in the course directory)
+    course_id:
+        the id of the course
+    students:
+        the number of students
+    assignments:
+        the number of assignments
+    notebooks:
+        the number of notebooks of each assignment
+    questions:
+        the number of questions of each notebook. Each question has a solution
+        cell and an autograded test cell, and every fourth question also has a
+        manually graded written answer.
+    autograde_students:
+        the number of submissions (of the first assignment) prepared for the
+        autograding benchmarks
+    seed:
+        the seed of the random answers, scores and timestamps, so that the
+        same parameters always give the same course
+
+    """
+
+    def __init__(self,
+                 root: str,
+                 db_url: Optional[str] = None,
+                 course_id: str = "bench101",
+                 students: int = 50,
+                 assignments: int = 4,
+                 notebooks: int = 2,
+                 questions: int = 8,
+                 autograde_students: int = 4,
+                 seed: int = 0) -> None:
+        self.root = os.path.abspath(root)
+        self.course_dir = os.path.join(self.root, "course")
+        self.exchange_dir = os.path.join(self.root, "exchange")
+        self.db_url = db_url or "sqlite:///" + os.path.join(self.course_dir, "gradebook.db")
+        self.course_id = course_id
+        self.num_students = students
+        self.num_assignments = assignments
+        self.num_notebooks = notebooks
+        self.num_questions = questions
+        self.num_autograde_students = min(autograde_students, students)
+        self.seed = seed
+
+        self.students = ["student{:04d}".format(i) for i in range(students)]
+        self.assignments = ["ps{:02d}".format(i + 1) for i in range(assignments)]
+        self.notebooks = ["problem{}".format(i + 1) for i in range(notebooks)]
+
+    @property
+    def parameters(self) -> Dict[str, Any]:
+        """The parameters of the course, as stored with benchmark results."""
+        return {
+            "students": self.num_students,
+            "assignments": self.num_assignments,
+            "notebooks": self.num_notebooks,
+            "questions": self.num_questions,
+            "autograde_students": self.num_autograde_students,
+            "seed": self.seed
+        }
+
+    def duedate(self, assignment: str) -> datetime.datetime:
+        return datetime.datetime(2025, 1, 6) + datetime.timedelta(
+            weeks=self.assignments.index(assignment))
+
+    def source_notebook(self, notebook: str) -> Any:
+        """Create the source (instructor) version of a notebook."""
+        nb = new_notebook()
+        nb.metadata.kernelspec = {
+            "display_name": "Python 3", "language": "python", "name": "python3"}
+        nb.cells.append(new_markdown_cell("# {}".format(notebook)))
+        for i in range(self.num_questions):
+            nb.cells.append(new_markdown_cell("## Question {}".format(i + 1)))
+            nb.cells.append(create_solution_cell(
+                "### BEGIN SOLUTION\nq{0} = {0}\n### END SOLUTION".format(i), "code",
+                "q{}-answer".format(i)))
+            cell = create_grade_cell("assert q{0} == {0}".format(i), "code", "q{}-test".format(i), 1)
+            cell.metadata.nbgrader["locked"] = True
+            nb.cells.append(cell)
+            if i % 4 == 3:
+                nb.cells.append(create_grade_and_solution_cell(
+                    "YOUR ANSWER HERE", "markdown", "q{}-written".format(i), 2))
+        nb.cells.append(create_task_cell(
+            "Describe your approach.", "markdown", "task", 2))
+        return nb
+
+    def submitted_notebook(self, notebook: str, rng: random.Random) -> Any:
+        """Create a student's version of a notebook, with random answers
+        (most of them correct)."""
+        nb = self.source_notebook(notebook)
+        for cell in nb.cells:
+            nbgrader = cell.metadata.get("nbgrader", {})
+            if nbgrader.get("solution") and cell.cell_type == "code":
+                i = int(nbgrader["grade_id"][1:].split("-")[0])
+                cell.source = "q{} = {}".format(i, i if rng.random() < 0.8 else None)
+            elif nbgrader.get("solution"):
+                cell.source = "An answer of {} words.".format(rng.randint(10, 200))
+        return nb
+
+    def _timestamp(self, assignment: str, rng: random.Random) -> datetime.datetime:
+        # most submissions are on time, some are a few hours late
+        return self.duedate(assignment) + datetime.timedelta(minutes=rng.randint(-3 * 24 * 60, 6 * 60))
+
+    def _write_notebook(self, nb: Any, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            write_nb(nb, fh)
+
+    def _write_timestamp(self, directory: str, timestamp: datetime.datetime) -> None:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "timestamp.txt"), "w") as fh:
+            fh.write(timestamp.isoformat(" "))
+
+    def _reset_database(self) -> None:
+        engine = create_engine(self.db_url)
+        try:
+            Base.metadata.drop_all(bind=engine)
+            with engine.begin() as conn:
+                conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        finally:
+            engine.dispose()
+
+    def generate(self, reset_db: bool = False) -> None:
+        """Generate the course directory, the database and the exchange.
+
+        Parameters
+        ----------
+        reset_db:
+            whether to drop the nbgrader tables of the database first. The
+            default SQLite database is always new, but other databases (e.g.
+            Postgres) must be empty or be reset.
+
+        """
+        if os.path.exists(self.root):
+            if os.listdir(self.root) and not os.path.exists(os.path.join(self.root, "course.json")):
+                raise RuntimeError(
+                    "{} is not empty and does not contain a benchmark course".format(self.root))
+            shutil.rmtree(self.root)
+        os.makedirs(self.course_dir)
+        if reset_db:
+            self._reset_database()
+
+        rng = random.Random(self.seed)
+        with Gradebook(self.db_url, self.course_id) as gb:
+            if len(gb.students) > 0:
+                raise RuntimeError(
+                    "The database {} is not empty; benchmark courses must be "
+                    "generated in a dedicated database".format(self.db_url))
+
+            for assignment in self.assignments:
+                gb.add_assignment(assignment, duedate=self.duedate(assignment))
+            for student in self.students:
+                gb.add_student(student, first_name=student.capitalize(), last_name="Bench")
+
+        self._generate_sources()
+        self._generate_submissions(rng)
+        self._generate_exchange(rng)
+        self._write_config()
+
+    def _generate_sources(self) -> None:
+        for assignment in self.assignments:
+            for notebook in self.notebooks:
+                nb = self.source_notebook(notebook)
+                self._write_notebook(nb, os.path.join(
+                    self.course_dir, "source", assignment, notebook + ".ipynb"))
+
+                # record the cells in the database, as generate_assignment does
+                resources = {"nbgrader": {
+                    "db_url": self.db_url, "assignment": assignment, "notebook": notebook}}
+                nb, resources = ComputeChecksums().preprocess(nb, resources)
+                SaveCells().preprocess(nb, resources)
+
+    def _generate_submissions(self, rng: random.Random) -> None:
+        with Gradebook(self.db_url, self.course_id) as gb:
+            for assignment in self.assignments:
+                for index, student in enumerate(self.students):
+                    timestamp = self._timestamp(assignment, rng)
+                    directories = [os.path.join(self.course_dir, "submitted", student, assignment)]
+                    if assignment == self.assignments[0] and index < self.num_autograde_students:
+                        directories.append(os.path.join(
+                            self.course_dir, "autograde_submitted", student, assignment))
+
+                    for directory in directories:
+                        self._write_timestamp(directory, timestamp)
+                    for notebook in self.notebooks:
+                        nb = self.submitted_notebook(notebook, rng)
+                        for directory in directories:
+                            self._write_notebook(nb, os.path.join(directory, notebook + ".ipynb"))
+
+                    # record the submission as if it had been autograded, and
+                    # partially graded by hand
+                    submission = gb.add_submission(assignment, student, timestamp=timestamp)
+                    for submitted_notebook in submission.notebooks:
+                        for grade in submitted_notebook.grades:
+                            if grade.cell.cell_type == "code":
+                                grade.auto_score = grade.max_score if rng.random() < 0.8 else 0
+                            elif rng.random() < 0.5:
+                                grade.manual_score = rng.randint(0, int(grade.max_score))
+                            grade.needs_manual_grade = (
+                                grade.cell.cell_type != "code" and grade.manual_score is None)
+                gb.db.commit()
+
+    def _generate_exchange(self, rng: random.Random) -> None:
+        course_path = os.path.join(self.exchange_dir, self.course_id)
+        for assignment in self.assignments:
+            for notebook in self.notebooks:
+                self._write_notebook(
+                    self.source_notebook(notebook),
+                    os.path.join(course_path, "outbound", assignment, notebook + ".ipynb"))
+
+        for assignment in self.assignments:
+            for student in self.students:
+                # some students submit several times
+                for attempt in range(rng.choice([1, 1, 1, 2, 3])):
+                    timestamp = self._timestamp(assignment, rng)
+                    name = "{}+{}+{}+{:08x}".format(
+                        student, assignment,
+                        timestamp.strftime("%Y-%m-%d %H:%M:%S.%f UTC"),
+                        rng.getrandbits(32))
+                    directory = os.path.join(course_path, "inbound", name)
+                    self._write_timestamp(directory, timestamp)
+                    for notebook in self.notebooks:
+                        self._write_notebook(
+                            self.submitted_notebook(notebook, rng),
+                            os.path.join(directory, notebook + ".ipynb"))
+
+    def _write_config(self) -> None:
+        with open(os.path.join(self.root, "course.json"), "w") as fh:
+            json.dump({"db_url": self.db_url, "course_id": self.course_id,
+                       "parameters": self.parameters}, fh, indent=1)
+
+    def config(self) -> Config:
+        """Create the configuration of nbgrader for this course."""
+        config = Config()
+        config.CourseDirectory.root = self.course_dir
+        config.CourseDirectory.course_id = self.course_id
+        config.CourseDirectory.db_url = self.db_url
+        config.Exchange.root = self.exchange_dir
+        config.Exchange.cache = os.path.join(self.root, "cache")
+        return config
+
+    def sizes(self) -> Dict[str, int]:
+        """Count the rows of the main tables of the database."""
+        with Gradebook(self.db_url, self.course_id) as gb:
+            return {
+                "students": len(gb.students),
+                "assignments": len(gb.assignments),
+                "grades": gb.db.execute(text("SELECT COUNT(*) FROM grade")).scalar()
+            }
+
+
+def generate_course(root: str, **kwargs: Any) -> SyntheticCourse:
+    """Generate a synthetic course (see :class:`SyntheticCourse` for the
+    parameters)."""
+    reset_db = kwargs.pop("reset_db", False)
+    course = SyntheticCourse(root, **kwargs)
+    course.generate(reset_db=reset_db)
+    return course
@@ -0,0 +1,250 @@
+"""Running the scenarios, and storing and comparing their results."""
+
+import argparse
+import datetime
+import fnmatch
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from typing import Any, Dict, List, Optional
+
+from .course import SyntheticCourse
+from .scenarios import SCENARIOS, Scenario
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(__file__),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _backend(db_url: str) -> str:
+    return db_url.split(":", 1)[0].split("+", 1)[0]
+
+
+def select_scenarios(patterns: List[str]) -> List[Scenario]:
+    """Select the scenarios whose names match one of the glob patterns (or
+    whose group is one of the patterns)."""
+    if not patterns:
+        return list(SCENARIOS)
+    return [
+        s for s in SCENARIOS
+        if any(fnmatch.fnmatch(s.name, p) or s.group == p for p in patterns)]
+
+
+def run_scenario(course: SyntheticCourse, scenario: Scenario, repeat: int) -> List[float]:
+    """Run a scenario ``repeat`` times (after an untimed warm-up run), and
+    return the time of each run in seconds."""
+    run = scenario.prepare(course)
+    times = []
+    for i in range(repeat + 1):
+        if scenario.reset is not None:
+            scenario.reset(course)
+        start = time.perf_counter()
+        run()
+        if i > 0:
+            times.append(time.perf_counter() - start)
+    return times
+
+
+def run_benchmarks(course: SyntheticCourse,
+                   scenarios: List[Scenario],
+                   repeat: int = 5,
+                   label: str = "") -> Dict[str, Any]:
+    """Run benchmark scenarios against a generated course.
+
+    Returns
+    -------
+    results: dict
+        The results, with the commit, the database backend and the
+        parameters of the course they were obtained with, and the times of
+        each scenario
+
+    """
+    results = {
+        "commit": _git_commit(),
+        "label": label,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "backend": _backend(course.db_url),
+        "python": platform.python_version(),
+        "parameters": course.parameters,
+        "repeat": repeat,
+        "scenarios": {}
+    }
+    for scenario in scenarios:
+        times = run_scenario(course, scenario, repeat)
+        results["scenarios"][scenario.name] = {
+            "times": times,
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times)
+        }
+        print("{:<36} min {:>9.4f}s  median {:>9.4f}s".format(
+            scenario.name, min(times), statistics.median(times)))
+    return results
+
+
+def save_results(results: Dict[str, Any], directory: str) -> str:
+    """Save results to a new JSON file in a directory, and return its path."""
+    os.makedirs(directory, exist_ok=True)
+    name = "{}-{}-{}.json".format(
+        datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f"),
+        results["commit"][:10], results["backend"])
+    path = os.path.join(directory, name)
+    with open(path, "w") as fh:
+        json.dump(results, fh, indent=1)
+    return path
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, "r") as fh:
+        return json.load(fh)
+
+
+def find_baseline(directory: str, results: Dict[str, Any], exclude: Optional[str] = None) -> Optional[str]:
+    """Find the most recent results in a directory that were obtained with
+    the same database backend and course parameters as ``results``."""
+    for path in sorted(glob.glob(os.path.join(directory, "*.json")), reverse=True):
+        if path == exclude:
+            continue
+        other = load_results(path)
+        if other.get("backend") == results["backend"] and other.get("parameters") == results["parameters"]:
+            return path
+    return None
+
+
+def compare_results(baseline: Dict[str, Any], results: Dict[str, Any], threshold: float = 0.1) -> List[Dict[str, Any]]:
+    """Compare the median times of the scenarios of two sets of results.
+
+    Returns
+    -------
+    rows: list
+        One dictionary per scenario run in both, with the keys ``name``,
+        ``baseline``, ``current``, ``ratio`` and ``status`` (``"slower"``
+        or ``"faster"`` if the times differ by more than ``threshold``, and
+        ``"same"`` otherwise)
+
+    """
+    rows = []
+    for name, current in results["scenarios"].items():
+        if name not in baseline["scenarios"]:
+            continue
+        before = baseline["scenarios"][name]["median"]
+        after = current["median"]
+        ratio = after / before if before > 0 else float("inf")
+        if ratio > 1 + threshold:
+            status = "slower"
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "same"
+        rows.append({"name": name, "baseline": before, "current": after,
+                     "ratio": ratio, "status": status})
+    return rows
+
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    lines = ["{:<36} {:>12} {:>12} {:>8}".format("scenario", "baseline (s)", "current (s)", "ratio")]
+    for row in rows:
+        line = "{:<36} {:>12.4f} {:>12.4f} {:>7.2f}x".format(
+            row["name"], row["baseline"], row["current"], row["ratio"])
+        if row["status"] != "same":
+            line += "  " + row["status"]
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m nbgrader.tests.benchmarks",
+        description=(
+            "Generate a synthetic course and time the gradebook, the "
+            "formgrader API, the exchange and autograding against it."))
+    parser.add_argument("scenarios", nargs="*", help=(
+        "the scenarios to run, as names, groups (db, api, exchange, autograde, "
+        "zipcollect) or glob patterns; all of them by default"))
+    parser.add_argument("--list", action="store_true", help="list the scenarios and exit")
+    parser.add_argument("--root", default=os.path.join(".benchmarks", "course"), help=(
+        "the directory in which the course is generated (default: %(default)s)"))
+    parser.add_argument("--db", default=None, help=(
+        "the database URL, e.g. postgresql://localhost/nbgrader_bench "
+        "(default: a SQLite database in the course directory)"))
+    parser.add_argument("--reset-db", action="store_true", help=(
+        "drop the nbgrader tables of the database before generating the course"))
+    parser.add_argument("--reuse", action="store_true", help=(
+        "reuse the course generated by a previous run with the same parameters"))
+    parser.add_argument("--students", type=int, default=50)
+    parser.add_argument("--assignments", type=int, default=4)
+    parser.add_argument("--notebooks", type=int, default=2)
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--autograde-students", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="the number of timed runs of each scenario")
+    parser.add_argument("--label", default="", help="a label stored with the results")
+    parser.add_argument("--results", default=os.path.join(".benchmarks", "results"), help=(
+        "the directory in which the results are stored (default: %(default)s)"))
+    parser.add_argument("--compare", nargs="?", const="latest", default=None, help=(
+        "compare the results with those in a file, or (without a file) with "
+        "the latest stored results obtained with the same database and parameters"))
+    parser.add_argument("--threshold", type=float, default=0.1, help=(
+        "the relative difference above which scenarios are reported as "
+        "slower or faster (default: %(default)s)"))
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for s in SCENARIOS:
+            print(s.name)
+        return 0
+
+    scenarios = select_scenarios(args.scenarios)
+    if not scenarios:
+        parser.error("no scenario matches {}".format(" ".join(args.scenarios)))
+
+    logging.basicConfig(level=logging.WARNING)
+    course = SyntheticCourse(
+        args.root, db_url=args.db, students=args.students, assignments=args.assignments,
+        notebooks=args.notebooks, questions=args.questions,
+        autograde_students=args.autograde_students, seed=args.seed)
+
+    existing = os.path.join(course.root, "course.json")
+    if args.reuse and os.path.exists(existing) and load_results(existing) == {
+            "db_url": course.db_url, "course_id": course.course_id, "parameters": course.parameters}:
+        print("Reusing the course in {}".format(course.root))
+    else:
+        print("Generating the course in {}".format(course.root))
+        start = time.perf_counter()
+        course.generate(reset_db=args.reset_db)
+        print("Generated {} in {:.1f}s".format(
+            ", ".join("{} {}".format(v, k) for k, v in course.sizes().items()),
+            time.perf_counter() - start))
+
+    results = run_benchmarks(course, scenarios, repeat=args.repeat, label=args.label)
+    path = save_results(results, args.results)
+    print("Results saved to {}".format(path))
+
+    if args.compare:
+        baseline_path = args.compare
+        if baseline_path == "latest":
+            baseline_path = find_baseline(args.results, results, exclude=path)
+        if baseline_path is None:
+            print("No previous results to compare with")
+        else:
+            print("Comparing with {}".format(baseline_path))
+            print(format_comparison(compare_results(
+                load_results(baseline_path), results, threshold=args.threshold)))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
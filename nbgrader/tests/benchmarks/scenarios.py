@@ -0,0 +1,218 @@
+"""The timed scenarios of the benchmarks.
+
+Each scenario is a function which takes a :class:`~.course.SyntheticCourse`,
+prepares whatever does not need to be timed (e.g. opening the API) and
+returns the function to time. Scenarios that modify the course can also
+have a ``reset`` function, which is called (untimed) before every run.
+
+"""
+
+import os
+import shutil
+
+from typing import Any, Callable, List, Optional
+
+from ...api import Gradebook
+from ...apps.api import NbGraderAPI
+from ...apps.zipcollectapp import ZipCollectApp
+from ...auth import Authenticator
+from ...converters import Autograde
+from ...coursedir import CourseDirectory
+from ...exchange.default import ExchangeCollect, ExchangeList
+from .course import SyntheticCourse
+
+
+class Scenario(object):
+
+    def __init__(self,
+                 name: str,
+                 prepare: Callable[[SyntheticCourse], Callable[[], Any]],
+                 reset: Optional[Callable[[SyntheticCourse], None]] = None) -> None:
+        self.name = name
+        self.prepare = prepare
+        self.reset = reset
+
+    @property
+    def group(self) -> str:
+        return self.name.split(".", 1)[0]
+
+
+#: All the scenarios, in the order in which they are run
+SCENARIOS: List[Scenario] = []
+
+
+def scenario(name: str, reset: Optional[Callable[[SyntheticCourse], None]] = None) -> Callable:
+    """Register a scenario under a name of the form ``group.scenario``."""
+    def register(prepare: Callable[[SyntheticCourse], Callable[[], Any]]) -> Callable:
+        SCENARIOS.append(Scenario(name, prepare, reset))
+        return prepare
+    return register
+
+
+def _coursedir(course: SyntheticCourse, **kwargs: Any) -> CourseDirectory:
+    coursedir = CourseDirectory(config=course.config())
+    for key, value in kwargs.items():
+        setattr(coursedir, key, value)
+    return coursedir
+
+
+# database aggregations
+
+@scenario("db.student_dicts")
+def db_student_dicts(course: SyntheticCourse) -> Callable[[], Any]:
+    def run() -> None:
+        with Gradebook(course.db_url, course.course_id) as gb:
+            gb.student_dicts()
+    return run
+
+
+@scenario("db.submission_dicts")
+def db_submission_dicts(course: SyntheticCourse) -> Callable[[], Any]:
+    def run() -> None:
+        with Gradebook(course.db_url, course.course_id) as gb:
+            for assignment in course.assignments:
+                gb.submission_dicts(assignment)
+    return run
+
+
+@scenario("db.notebook_submission_dicts")
+def db_notebook_submission_dicts(course: SyntheticCourse) -> Callable[[], Any]:
+    def run() -> None:
+        with Gradebook(course.db_url, course.course_id) as gb:
+            for notebook in course.notebooks:
+                gb.notebook_submission_dicts(notebook, course.assignments[0])
+    return run
+
+
+# formgrader API calls
+
+def _api(course: SyntheticCourse) -> NbGraderAPI:
+    config = course.config()
+    config.NbGraderAPI.log_level = "WARN"
+    return NbGraderAPI(CourseDirectory(config=config), config=config)
+
+
+@scenario("api.get_assignments")
+def api_get_assignments(course: SyntheticCourse) -> Callable[[], Any]:
+    api = _api(course)
+    return api.get_assignments
+
+
+@scenario("api.get_students")
+def api_get_students(course: SyntheticCourse) -> Callable[[], Any]:
+    api = _api(course)
+    return api.get_students
+
+
+@scenario("api.get_submissions")
+def api_get_submissions(course: SyntheticCourse) -> Callable[[], Any]:
+    api = _api(course)
+    return lambda: api.get_submissions(course.assignments[0])
+
+
+@scenario("api.get_notebook_submissions")
+def api_get_notebook_submissions(course: SyntheticCourse) -> Callable[[], Any]:
+    api = _api(course)
+    return lambda: api.get_notebook_submissions(course.assignments[0], course.notebooks[0])
+
+
+@scenario("api.get_student_submissions")
+def api_get_student_submissions(course: SyntheticCourse) -> Callable[[], Any]:
+    api = _api(course)
+    return lambda: api.get_student_submissions(course.students[0])
+
+
+# exchange
+
+@scenario("exchange.list_inbound")
+def exchange_list_inbound(course: SyntheticCourse) -> Callable[[], Any]:
+    config = course.config()
+    config.ExchangeList.inbound = True
+
+    def run() -> None:
+        lister = ExchangeList(
+            coursedir=_coursedir(course), authenticator=Authenticator(config=config),
+            config=config)
+        lister.start()
+    return run
+
+
+def _reset_collected(course: SyntheticCourse) -> None:
+    path = os.path.join(course.course_dir, "collected")
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+
+@scenario("exchange.collect", reset=_reset_collected)
+def exchange_collect(course: SyntheticCourse) -> Callable[[], Any]:
+    config = course.config()
+    config.ExchangeCollect.check_owner = False
+
+    def run() -> None:
+        coursedir = _coursedir(
+            course, assignment_id=course.assignments[0], submitted_directory="collected")
+        collector = ExchangeCollect(
+            coursedir=coursedir, authenticator=Authenticator(config=config), config=config)
+        collector.start()
+    return run
+
+
+# autograding
+
+def _reset_autograded(course: SyntheticCourse) -> None:
+    path = os.path.join(course.course_dir, "autograde_autograded")
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+
+@scenario("autograde.convert_notebooks", reset=_reset_autograded)
+def autograde_convert_notebooks(course: SyntheticCourse) -> Callable[[], Any]:
+    config = course.config()
+
+    def run() -> None:
+        coursedir = _coursedir(
+            course, assignment_id=course.assignments[0],
+            submitted_directory="autograde_submitted",
+            autograded_directory="autograde_autograded")
+        Autograde(coursedir=coursedir, config=config).start()
+    return run
+
+
+# collecting submissions downloaded from a LMS
+
+#: The number of synthetic submission file names collected by zip_collect
+ZIP_COLLECT_FILES = 100000
+
+
+def zip_collect_filenames(course: SyntheticCourse, count: int = ZIP_COLLECT_FILES) -> List[str]:
+    """Generate the names of ``count`` submitted files of the first
+    assignment, with many resubmissions (attempts at different times) of each
+    notebook by each student, in sorted order. The notebooks of an attempt
+    share its timestamp."""
+    extracted = os.path.join(course.course_dir, "downloaded", course.assignments[0], "extracted")
+    per_attempt = len(course.students) * len(course.notebooks)
+    filenames = []
+    for i in range(count):
+        attempt, rest = divmod(i, per_attempt)
+        student = course.students[rest // len(course.notebooks)]
+        notebook = course.notebooks[rest % len(course.notebooks)]
+        filenames.append(os.path.join(extracted, "{}_{}_attempt_{}_{}.ipynb".format(
+            course.assignments[0], student,
+            "2020-01-01 00:00:{:02d}.{:06d}".format(rest // len(course.notebooks) % 60, attempt),
+            notebook)))
+    filenames.sort()
+    return filenames
+
+
+@scenario("zipcollect.collect_files")
+def zipcollect_collect_files(course: SyntheticCourse) -> Callable[[], Any]:
+    config = course.config()
+    config.ZipCollectApp.log_level = "ERROR"
+    config.FileNameCollectorPlugin.named_regexp = (
+        r".+_(?P<student_id>\w+)_attempt_(?P<timestamp>[0-9\-:. ]+)_(?P<file_id>\w+)")
+    app = ZipCollectApp(config=config)
+    app.coursedir = _coursedir(
+        course, assignment_id=course.assignments[0], release_directory="source")
+    app.init_plugins()
+    filenames = zip_collect_filenames(course)
+    return lambda: app._collect_files(filenames)
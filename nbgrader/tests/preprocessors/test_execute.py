@@ -0,0 +1,102 @@
+import pytest
+
+from ...preprocessors import Execute
+from .base import BaseTestPreprocessor
+
+
+@pytest.fixture
+def preprocessor():
+    pp = Execute()
+    # normally done when the execution of a notebook (and a cell) starts
+    pp.reset_execution_trackers()
+    pp.clear_before_next_output = False
+    return pp
+
+
+def stream(text, name="stdout"):
+    return {
+        "msg_type": "stream",
+        "header": {"msg_type": "stream"},
+        "parent_header": {"msg_id": "1"},
+        "content": {"name": name, "text": text}
+    }
+
+
+def display_data(data):
+    return {
+        "msg_type": "display_data",
+        "header": {"msg_type": "display_data"},
+        "parent_header": {"msg_id": "1"},
+        "content": {"data": data, "metadata": {}}
+    }
+
+
+class TestExecute(BaseTestPreprocessor):
+
+    def test_output_within_limits(self, preprocessor):
+        outs = []
+        preprocessor.output(outs, stream("hello\n"), None, 0)
+        preprocessor.output(outs, display_data({"text/plain": "42"}), None, 0)
+
+        assert [out.output_type for out in outs] == ["stream", "display_data"]
+        assert outs[0].text == "hello\n"
+
+    def test_cell_output_bytes(self, preprocessor):
+        preprocessor.max_cell_output_bytes = 10
+        outs = []
+        for _ in range(1000):
+            preprocessor.output(outs, stream("abcd\n"), None, 0)
+
+        assert len(outs) == 3
+        assert outs[0].text + outs[1].text == "abcd\nabcd\n"
+        assert "Output truncated" in outs[2].text
+        assert "10 bytes per cell" in outs[2].text
+
+        # the budget is per cell
+        preprocessor._reset_output_budget()
+        preprocessor.output(outs, stream("abcd\n"), None, 1)
+        assert len(outs) == 4
+
+    def test_cell_output_lines(self, preprocessor):
+        preprocessor.max_cell_output_lines = 3
+        outs = []
+        preprocessor.output(outs, stream("1\n2\n"), None, 0)
+        preprocessor.output(outs, stream("3\n4\n5\n"), None, 0)
+        preprocessor.output(outs, stream("6\n"), None, 0)
+
+        assert len(outs) == 3
+        assert outs[0].text + outs[1].text == "1\n2\n3\n"
+        assert "3 lines per cell" in outs[2].text
+
+    def test_rich_outputs(self, preprocessor):
+        preprocessor.max_cell_output_bytes = 100
+        outs = []
+        preprocessor.output(outs, display_data({"image/png": "x" * 60}), None, 0)
+        preprocessor.output(outs, display_data({"image/png": "x" * 60}), None, 0)
+        preprocessor.output(outs, stream("hello\n"), None, 0)
+
+        assert [out.output_type for out in outs] == ["display_data", "stream"]
+        assert "Output truncated" in outs[1].text
+
+    def test_notebook_output_bytes(self, preprocessor):
+        preprocessor.max_notebook_output_bytes = 12
+        outs = []
+        for cell_index in range(3):
+            preprocessor._reset_output_budget()
+            preprocessor.output(outs, stream("abcdefgh\n"), None, cell_index)
+
+        assert outs[0].text == "abcdefgh\n"
+        assert outs[1].text == "abc"
+        assert "12 bytes per notebook" in outs[2].text
+        assert "12 bytes per notebook" in outs[3].text
+        assert len(outs) == 4
+
+    def test_no_limits(self, preprocessor):
+        # the limits are disabled by default
+        assert preprocessor.max_cell_output_bytes == -1
+        assert preprocessor.max_cell_output_lines == -1
+        assert preprocessor.max_notebook_output_bytes == -1
+        outs = []
+        for _ in range(100):
+            preprocessor.output(outs, stream("x" * 1000 + "\n"), None, 0)
+        assert len(outs) == 100
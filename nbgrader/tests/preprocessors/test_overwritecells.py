@@ -265,3 +265,30 @@ class TestOverwriteCells(BaseTestPreprocessor):
         nb, resources = preprocessors[1].preprocess(nb, resources)
         result = [cell["metadata"]["nbgrader"]["grade_id"] if "nbgrader" in cell["metadata"] else "markdown" for cell in nb.cells]
         assert expected == result
+
+    def test_master_cells_snapshot(self, preprocessors, resources, gradebook):
+        """Are the master cells loaded once, and reloaded when they change?"""
+        cell = create_grade_cell("hello", "code", "foo", 1)
+        cell.metadata.nbgrader['checksum'] = compute_checksum(cell)
+        nb = new_notebook()
+        nb.cells.append(cell)
+        nb, resources = preprocessors[0].preprocess(nb, resources)
+
+        nb, resources = preprocessors[1].preprocess(nb, resources)
+        snapshot = preprocessors[1].master_cells
+        assert dict(snapshot.grade_cells) == {"foo": 1}
+        with pytest.raises(TypeError):
+            snapshot.grade_cells["foo"] = 2
+
+        # unchanged, so the same snapshot is used for the next notebook
+        nb, resources = preprocessors[1].preprocess(nb, resources)
+        assert preprocessors[1].master_cells is snapshot
+
+        # the assignment is generated again with different points
+        cell.metadata.nbgrader["points"] = 3
+        cell.metadata.nbgrader['checksum'] = compute_checksum(cell)
+        nb, resources = preprocessors[0].preprocess(nb, resources)
+        cell.metadata.nbgrader["points"] = 1
+        nb, resources = preprocessors[1].preprocess(nb, resources)
+        assert preprocessors[1].master_cells is not snapshot
+        assert cell.metadata.nbgrader["points"] == 3
@@ -1,13 +1,24 @@
 import os
+import json
+import time
+import threading
 import pytest
 import requests_mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from traitlets.config import Config
 
 from ..auth import Authenticator, JupyterHubAuthPlugin
-from ..auth.jupyterhub import JupyterhubEnvironmentError, JupyterhubApiError
+from ..auth.jupyterhub import JupyterhubEnvironmentError, JupyterhubApiError, clear_courses_cache, _get_session
 from _pytest.fixtures import SubRequest
 
 
+@pytest.fixture(autouse=True)
+def courses_cache():
+    clear_courses_cache()
+    yield
+    clear_courses_cache()
+
+
 @pytest.fixture
 def env(request: SubRequest) -> dict:
     old_env = os.environ.copy()
@@ -27,6 +38,92 @@ def jupyterhub_auth() -> Authenticator:
     return auth
 
 
+class MockHub(object):
+    """A local JupyterHub API, with users and groups, which records the
+    requests it receives and the connections opened to it."""
+
+    def __init__(self, users, token='abcd1234'):
+        self.token = token
+        self.users = set(users)
+        self.groups = {}
+        self.requests = []
+        self.connections = 0
+
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                hub.connections += 1
+                super(Handler, self).setup()
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or 'null')
+                hub.requests.append((self.command, self.path, body))
+                if self.headers.get('Authorization') != 'token ' + hub.token:
+                    status, data = 403, None
+                else:
+                    status, data = hub.handle(self.command, self.path, body)
+                content = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_DELETE = _handle
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}/hub/api'.format(self.server.server_address[1])
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, method, path, body):
+        parts = path.split('/')[3:]  # /hub/api/...
+        if method == 'GET' and parts[0] == 'users' and len(parts) == 2:
+            if parts[1] not in self.users:
+                return 404, None
+            groups = [g for g, users in self.groups.items() if parts[1] in users]
+            return 200, {'name': parts[1], 'groups': groups}
+        if method == 'GET' and parts == ['groups']:
+            return 200, [{'name': g, 'users': sorted(u)} for g, u in self.groups.items()]
+        if method == 'POST' and parts[0] == 'groups' and len(parts) == 2:
+            if parts[1] in self.groups:
+                return 409, None
+            self.groups[parts[1]] = set()
+            return 201, {'name': parts[1], 'users': []}
+        if parts[0] == 'groups' and len(parts) == 3 and parts[2] == 'users':
+            if parts[1] not in self.groups:
+                return 404, None
+            if any(user not in self.users for user in body['users']):
+                return 400, None
+            if method == 'POST':
+                self.groups[parts[1]].update(body['users'])
+            else:
+                self.groups[parts[1]].difference_update(body['users'])
+            return 200, {'name': parts[1], 'users': sorted(self.groups[parts[1]])}
+        return 404, None
+
+
+@pytest.fixture
+def hub(env):
+    hub = MockHub(['foo'] + ['student{}'.format(i) for i in range(100)])
+    env['JUPYTERHUB_API_TOKEN'] = hub.token
+    env['JUPYTERHUB_USER'] = 'foo'
+    env['JUPYTERHUB_API_URL'] = hub.url
+    yield hub
+    hub.stop()
+
+
 def _mock_api_call(method, path, status_code=None, json=None):
     hub_api_url = 'http://127.0.0.1:8081/hub/api'
     url = hub_api_url + path
@@ -49,6 +146,7 @@ def test_default_authenticator():
 
     # smoke tests, these should just do nothing
     auth.add_student_to_course("foo", "course123")
+    auth.add_students_to_course(["foo", "bar"], "course123")
     auth.remove_student_from_course("bar", "course123")
 
 
@@ -152,6 +250,46 @@ def test_jupyterhub_add_student_to_course_success(env, jupyterhub_auth, caplog):
         assert 'ERROR' not in [rec.levelname for rec in caplog.records]
 
 
+def test_jupyterhub_add_students_to_course(env, jupyterhub_auth, caplog):
+    env['JUPYTERHUB_API_TOKEN'] = 'abcd1234'
+    env['JUPYTERHUB_USER'] = 'foo'
+    with requests_mock.Mocker() as m:
+        _mock_api_call(m.get, '/groups', json=[{'name': 'nbgrader-course123'}])
+        _mock_api_call(m.post, '/groups/nbgrader-course123/users')
+        jupyterhub_auth.add_students_to_course(['foo', 'bar', 'baz'], 'course123')
+        assert 'ERROR' not in [rec.levelname for rec in caplog.records]
+
+        # the students are added with a single request
+        posts = [r for r in m.request_history if r.method == 'POST']
+        assert len(posts) == 1
+        assert posts[0].json() == {'users': ['foo', 'bar', 'baz']}
+
+
+def test_jupyterhub_add_students_to_course_fallback(env, jupyterhub_auth, caplog):
+    env['JUPYTERHUB_API_TOKEN'] = 'abcd1234'
+    env['JUPYTERHUB_USER'] = 'foo'
+
+    def add_users(request, context):
+        # the hub refuses to add users that do not exist
+        users = request.json()['users']
+        context.status_code = 400 if 'nope' in users else 200
+        return []
+
+    with requests_mock.Mocker() as m:
+        _mock_api_call(m.get, '/groups', json=[{'name': 'nbgrader-course123'}])
+        m.post('http://127.0.0.1:8081/hub/api/groups/nbgrader-course123/users', json=add_users)
+        jupyterhub_auth.add_students_to_course(['foo', 'nope', 'bar'], 'course123')
+
+        # the students are then added one at a time
+        posts = [r.json()['users'] for r in m.request_history if r.method == 'POST']
+        assert posts == [['foo', 'nope', 'bar'], ['foo'], ['nope'], ['bar']]
+        # without querying the groups again
+        assert len([r for r in m.request_history if r.method == 'GET']) == 1
+        errors = [rec.getMessage() for rec in caplog.records if rec.levelname == 'ERROR']
+        assert any('nope NOT added' in msg for msg in errors)
+        assert not any('foo NOT added' in msg for msg in errors)
+
+
 def test_jupyterhub_remove_student_from_course_no_token(jupyterhub_auth):
     # this will fail, because the api token hasn't been set
     with pytest.raises(JupyterhubEnvironmentError):
@@ -192,3 +330,76 @@ def test_jupyterhub_remove_student_from_course_success(env, jupyterhub_auth, cap
         _mock_api_call(m.delete, '/groups/nbgrader-course123/users')
         jupyterhub_auth.remove_student_from_course('foo', 'course123')
         assert 'ERROR' not in [rec.levelname for rec in caplog.records]
+
+
+def test_jupyterhub_roster_sync(hub, jupyterhub_auth):
+    students = ['student{}'.format(i) for i in range(100)]
+    jupyterhub_auth.add_students_to_course(students, 'course123')
+    assert hub.groups == {'nbgrader-course123': set(students)}
+    assert [r[:2] for r in hub.requests] == [
+        ('GET', '/hub/api/groups'),
+        ('POST', '/hub/api/groups/nbgrader-course123'),
+        ('POST', '/hub/api/groups/nbgrader-course123/users')]
+
+    jupyterhub_auth.add_students_to_course(students[:10], 'course456')
+    assert hub.groups['nbgrader-course456'] == set(students[:10])
+
+    # the connection to the hub is reused, even by other authenticators
+    config = Config()
+    config.Authenticator.plugin_class = JupyterHubAuthPlugin
+    Authenticator(config=config).remove_student_from_course('student0', 'course123')
+    assert 'student0' not in hub.groups['nbgrader-course123']
+    assert len(hub.requests) == 7
+    assert hub.connections == 1
+
+
+def test_jupyterhub_roster_sync_unknown_user(hub, jupyterhub_auth, caplog):
+    jupyterhub_auth.add_students_to_course(['student0', 'nope', 'student1'], 'course123')
+    assert hub.groups == {'nbgrader-course123': {'student0', 'student1'}}
+    errors = [rec.getMessage() for rec in caplog.records if rec.levelname == 'ERROR']
+    assert any('nope NOT added' in msg for msg in errors)
+
+
+def test_jupyterhub_session_per_thread():
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.extend([_get_session(), _get_session()]))
+    thread.start()
+    thread.join()
+    assert sessions[0] is sessions[1]
+    assert _get_session() is _get_session()
+    assert _get_session() is not sessions[0]
+
+
+def test_jupyterhub_courses_cache(hub, jupyterhub_auth):
+    # the cache is disabled by default
+    jupyterhub_auth.add_student_to_course('foo', 'course123')
+    hub.requests = []
+    jupyterhub_auth.get_student_courses('foo')
+    jupyterhub_auth.get_student_courses('foo')
+    assert len(hub.requests) == 2
+
+    jupyterhub_auth.plugin.courses_cache_ttl = 10
+    hub.requests = []
+
+    assert jupyterhub_auth.get_student_courses('foo') == ['course123']
+    assert jupyterhub_auth.has_access('foo', 'course123')
+    assert not jupyterhub_auth.has_access('foo', 'course456')
+    assert sorted(jupyterhub_auth.get_student_courses('*')) == ['course123']
+    # the courses of "foo" and of the authenticated user ("*") are cached
+    assert len(hub.requests) == 2
+
+    # the courses are fetched again when students are added to courses
+    jupyterhub_auth.add_student_to_course('foo', 'course456')
+    assert sorted(jupyterhub_auth.get_student_courses('foo')) == ['course123', 'course456']
+
+    # or when they expire
+    jupyterhub_auth.plugin.courses_cache_ttl = 0.1
+    hub.groups['nbgrader-course789'] = {'foo'}
+    time.sleep(0.2)
+    assert sorted(jupyterhub_auth.get_student_courses('foo')) == ['course123', 'course456', 'course789']
+
+    # errors are not cached
+    with pytest.raises(JupyterhubApiError):
+        jupyterhub_auth.get_student_courses('nope')
+    hub.users.add('nope')
+    assert jupyterhub_auth.get_student_courses('nope') == []
@@ -0,0 +1,116 @@
+import os
+import json
+import pytest
+
+from traitlets.config import Config
+
+from ..api import Gradebook
+from ..apps.zipcollectapp import ZipCollectApp
+from ..coursedir import CourseDirectory
+from .benchmarks import SyntheticCourse, compare_results, generate_course, run_benchmarks, select_scenarios
+from .benchmarks.runner import find_baseline, main, save_results
+from .benchmarks.scenarios import zip_collect_filenames
+
+
+def test_generate_course(tmpdir):
+    course = generate_course(
+        str(tmpdir.join("bench")), students=3, assignments=2, notebooks=2,
+        questions=4, autograde_students=1)
+
+    with Gradebook(course.db_url, course.course_id) as gb:
+        assert len(gb.students) == 3
+        assert len(gb.assignments) == 2
+        notebook = gb.find_notebook("problem1", "ps01")
+        assert len(notebook.grade_cells) == 5
+        assert len(notebook.solution_cells) == 5
+        assert len(notebook.task_cells) == 1
+        assert gb.find_submission("ps02", "student0002").max_score == 2 * (4 + 2 + 2)
+
+    join = os.path.join
+    assert os.path.isfile(join(course.course_dir, "source", "ps02", "problem2.ipynb"))
+    assert os.path.isfile(join(course.course_dir, "submitted", "student0002", "ps02", "problem2.ipynb"))
+    assert os.path.isfile(join(course.course_dir, "autograde_submitted", "student0000", "ps01", "timestamp.txt"))
+    assert not os.path.exists(join(course.course_dir, "autograde_submitted", "student0001"))
+    assert os.path.isdir(join(course.exchange_dir, course.course_id, "outbound", "ps01"))
+    assert len(os.listdir(join(course.exchange_dir, course.course_id, "inbound"))) >= 6
+
+
+def test_select_scenarios():
+    names = [s.name for s in select_scenarios(["db", "api.get_sub*"])]
+    assert "db.submission_dicts" in names
+    assert "api.get_submissions" in names
+    assert "api.get_students" not in names
+    assert "autograde.convert_notebooks" not in names
+    assert len(select_scenarios([])) > len(names)
+
+
+def test_run_benchmarks(tmpdir):
+    course = generate_course(
+        str(tmpdir.join("bench")), students=2, assignments=1, notebooks=1, questions=2)
+    results = run_benchmarks(
+        course, select_scenarios(["db", "api", "exchange"]), repeat=2, label="test")
+
+    assert results["backend"] == "sqlite"
+    assert results["parameters"] == course.parameters
+    for name in ["db.submission_dicts", "api.get_submissions", "exchange.collect"]:
+        assert len(results["scenarios"][name]["times"]) == 2
+    assert os.path.isfile(os.path.join(
+        course.course_dir, "collected", "student0001", "ps01", "problem1.ipynb"))
+
+    # results are compared with the latest results of the same course
+    directory = str(tmpdir.join("results"))
+    path = save_results(results, directory)
+    assert find_baseline(directory, results) == path
+    assert find_baseline(directory, results, exclude=path) is None
+
+    slower = json.loads(json.dumps(results))
+    slower["scenarios"]["db.submission_dicts"]["median"] *= 2
+    rows = {row["name"]: row for row in compare_results(results, slower)}
+    assert rows["db.submission_dicts"]["status"] == "slower"
+    assert rows["api.get_submissions"]["status"] == "same"
+
+
+def test_main(tmpdir, capsys):
+    root = str(tmpdir.join("bench"))
+    args = ["db.student_dicts", "--root", root, "--results", str(tmpdir.join("results")),
+            "--students", "2", "--assignments", "1", "--notebooks", "1", "--questions", "1",
+            "--repeat", "1"]
+    assert main(args) == 0
+    assert main(args + ["--reuse", "--compare"]) == 0
+
+    out = capsys.readouterr().out
+    assert "Reusing the course" in out
+    assert "Comparing with" in out
+    assert len(os.listdir(str(tmpdir.join("results")))) == 2
+
+    # refuse to delete directories that do not contain a benchmark course
+    other = tmpdir.mkdir("other")
+    other.join("file.txt").write("hello")
+    course = SyntheticCourse(str(other), students=1)
+    with pytest.raises(RuntimeError):
+        course.generate()
+    assert other.join("file.txt").check()
+
+
+def test_zip_collect_filenames(tmpdir):
+    course = SyntheticCourse(str(tmpdir.join("bench")), students=2, notebooks=2)
+    filenames = zip_collect_filenames(course, 20)
+    assert len(filenames) == 20
+    assert filenames == sorted(filenames)
+
+    config = Config()
+    config.FileNameCollectorPlugin.named_regexp = (
+        r".+_(?P<student_id>\w+)_attempt_(?P<timestamp>[0-9\-:. ]+)_(?P<file_id>\w+)")
+    app = ZipCollectApp(config=config)
+    app.coursedir = CourseDirectory(root=course.course_dir, assignment_id=course.assignments[0])
+    app.init_plugins()
+    data = app._collect_files(filenames)
+
+    # the last attempt of each notebook of each student is collected
+    assert sorted(data) == course.students
+    assert app.report["collected"] == 4
+    assert app.report["replaced"] == 16
+    assert app.report["skipped"] == 0
+    for student in course.students:
+        assert data[student]["file_ids"] == ["problem1.ipynb", "problem2.ipynb"]
+        assert all("000004_problem" in f for f in data[student]["src_files"])
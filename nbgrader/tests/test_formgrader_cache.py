@@ -0,0 +1,129 @@
+import os
+import time
+import pytest
+
+from traitlets.config import Config
+
+from ..api import Gradebook
+from ..coursedir import CourseDirectory
+from ..server_extensions.formgrader.cache import ApiCache
+
+
+@pytest.fixture
+def coursedir(tmpdir):
+    coursedir = CourseDirectory(root=str(tmpdir))
+    os.makedirs(os.path.join(coursedir.root, "submitted", "foo", "ps1"))
+    with Gradebook(coursedir.db_url) as gb:
+        gb.add_assignment("ps1")
+    return coursedir
+
+
+def _touch(path, offset):
+    # set an explicit modification time, so that the change is detected
+    # regardless of the resolution of the file system timestamps
+    t = time.time() + offset
+    os.utime(path, (t, t))
+
+
+class Counter(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+
+def test_hit_and_miss(coursedir):
+    cache = ApiCache(coursedir)
+    compute = Counter()
+
+    assert cache.get(("get_submissions", "ps1"), compute) == ({"calls": 1}, False)
+    assert cache.get(("get_submissions", "ps1"), compute) == ({"calls": 1}, True)
+    assert cache.get(("get_submissions", "ps2"), compute) == ({"calls": 2}, False)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_disabled(coursedir):
+    cache = ApiCache(coursedir, config=Config({"ApiCache": {"enabled": False}}))
+    compute = Counter()
+
+    assert cache.get(("get_students",), compute) == ({"calls": 1}, False)
+    assert cache.get(("get_students",), compute) == ({"calls": 2}, False)
+
+
+def test_invalidate(coursedir):
+    cache = ApiCache(coursedir)
+    compute = Counter()
+
+    cache.get(("get_students",), compute)
+    cache.invalidate()
+    assert cache.get(("get_students",), compute) == ({"calls": 2}, False)
+
+
+def test_filesystem_change(coursedir):
+    cache = ApiCache(coursedir)
+    compute = Counter()
+
+    cache.get(("get_submissions", "ps1"), compute)
+
+    # a new submission of an existing student
+    _touch(os.path.join(coursedir.root, "submitted", "foo"), 10)
+    assert cache.get(("get_submissions", "ps1"), compute) == ({"calls": 2}, False)
+    assert cache.get(("get_submissions", "ps1"), compute) == ({"calls": 2}, True)
+
+    # autograding creates the autograded directory
+    os.makedirs(os.path.join(coursedir.root, "autograded", "foo", "ps1"))
+    assert cache.get(("get_submissions", "ps1"), compute) == ({"calls": 3}, False)
+
+
+def test_watched_directory(coursedir, tmpdir):
+    cache = ApiCache(coursedir)
+    compute = Counter()
+    outbound = str(tmpdir.mkdir("outbound"))
+    cache.watch(outbound)
+
+    cache.get(("get_assignments",), compute)
+    os.makedirs(os.path.join(outbound, "ps1"))
+    assert cache.get(("get_assignments",), compute) == ({"calls": 2}, False)
+
+
+def test_database_change(coursedir):
+    cache = ApiCache(coursedir)
+    compute = Counter()
+
+    cache.get(("get_students",), compute)
+    with Gradebook(coursedir.db_url) as gb:
+        gb.add_student("bar")
+    _touch(os.path.join(coursedir.root, "gradebook.db"), 10)
+    assert cache.get(("get_students",), compute) == ({"calls": 2}, False)
+
+
+def test_ttl_and_max_entries(coursedir):
+    cache = ApiCache(coursedir, config=Config({"ApiCache": {"ttl": 0.0, "max_entries": 2}}))
+    compute = Counter()
+
+    cache.get(("get_students",), compute)
+    assert cache.get(("get_students",), compute) == ({"calls": 2}, False)
+
+    cache.ttl = 300
+    for i in range(3):
+        cache.get(("get_student", str(i)), compute)
+    assert len(cache._entries) == 2
+
+
+def test_unfingerprinted_database(coursedir):
+    # changes made to other databases by other processes cannot be detected
+    coursedir.db_url = "postgresql://nbgrader@localhost/gradebook"
+    cache = ApiCache(coursedir, config=Config({"ApiCache": {"unfingerprinted_db_ttl": 0.1}}))
+    compute = Counter()
+
+    cache.get(("get_students",), compute)
+    assert cache.get(("get_students",), compute) == ({"calls": 1}, True)
+    time.sleep(0.2)
+    assert cache.get(("get_students",), compute) == ({"calls": 2}, False)
+
+    cache.unfingerprinted_db_ttl = 0
+    cache.get(("get_students",), compute)
+    assert cache.get(("get_students",), compute) == ({"calls": 4}, False)
@@ -0,0 +1,165 @@
+import logging
+import threading
+import pytest
+
+from traitlets.config import Config
+
+from ..coursedir import CourseDirectory
+from ..server_extensions.formgrader.base import _copy_coursedir
+from ..server_extensions.formgrader.jobs import JobLogHandler, JobManager
+
+
+@pytest.fixture
+def jobs():
+    jobs = JobManager()
+    yield jobs
+    jobs.shutdown()
+
+
+def test_success(jobs):
+    finished = []
+    jobs.on_finish = finished.append
+
+    def action(job):
+        job.set_progress(done=1, total=2, message="half way")
+        return {"success": True, "log": "done"}
+
+    job = jobs.submit("autograde", action, assignment_id="ps1")
+    assert job.future.result(timeout=10) == {"success": True, "log": "done"}
+    assert job.status == "success"
+    assert job.done
+    assert job.progress == {"done": 1, "total": 2, "message": "half way"}
+    assert finished == [job]
+
+    data = job.to_dict()
+    assert data["id"] == job.id
+    assert data["name"] == "autograde"
+    assert data["args"] == {"assignment_id": "ps1"}
+    assert data["result"] == {"success": True, "log": "done"}
+    assert data["started"] <= data["finished"]
+
+
+def test_error(jobs):
+    job = jobs.submit("collect", lambda job: {"success": False, "error": "oops"})
+    assert job.future.result(timeout=10) == {"success": False, "error": "oops"}
+    assert job.status == "error"
+
+
+def test_exception(jobs):
+    def action(job):
+        raise ValueError("oops")
+
+    job = jobs.submit("collect", action)
+    result = job.future.result(timeout=10)
+    assert not result["success"]
+    assert "ValueError: oops" in result["error"]
+    assert job.status == "error"
+
+
+def test_one_at_a_time(jobs):
+    event = threading.Event()
+
+    def block(job):
+        event.wait(10)
+        return {"success": True}
+
+    first = jobs.submit("autograde", block)
+    second = jobs.submit("autograde", lambda job: {"success": True})
+    assert second.status == "queued"
+    event.set()
+    second.future.result(timeout=10)
+    assert first.finished <= second.started
+
+
+def test_call(jobs):
+    event = threading.Event()
+
+    def block(job):
+        event.wait(10)
+        return {"success": True}
+
+    job = jobs.submit("autograde", block)
+    # calls run in the job thread, after the queued jobs, but are not jobs
+    future = jobs.call(lambda x: (job.done, threading.current_thread().name, x), 1)
+    assert not future.done()
+    event.set()
+    done, thread, x = future.result(timeout=10)
+    assert done
+    assert thread.startswith("nbgrader-job")
+    assert x == 1
+    assert jobs.list() == [job]
+
+
+def test_copy_coursedir(tmpdir):
+    coursedir = CourseDirectory(root=str(tmpdir), assignment_id="ps1")
+    copy = _copy_coursedir(coursedir)
+    assert copy is not coursedir
+    assert copy.root == coursedir.root
+    assert copy.assignment_id == "ps1"
+    copy.assignment_id = "ps2"
+    assert coursedir.assignment_id == "ps1"
+
+
+def test_get_and_list(jobs):
+    job = jobs.submit("collect", lambda job: {"success": True})
+    job.future.result(timeout=10)
+    assert jobs.get(job.id) is job
+    assert jobs.get("nope") is None
+    assert jobs.list() == [job]
+
+
+def test_prune():
+    jobs = JobManager(config=Config({"JobManager": {"max_finished": 2}}))
+    try:
+        done = []
+        for i in range(4):
+            job = jobs.submit("collect", lambda job: {"success": True})
+            job.future.result(timeout=10)
+            done.append(job)
+        # finished jobs are pruned when new jobs are submitted
+        assert jobs.list() == done[1:]
+    finally:
+        jobs.shutdown()
+
+
+def test_events(jobs):
+    def action(job):
+        job.set_progress(done=0, total=2)
+        job.set_progress(done=1, message="foo", item={"student_id": "foo"})
+        return {"success": True}
+
+    job = jobs.submit("generate_feedback", action)
+    job.future.result(timeout=10)
+    events = job.events()
+    assert [e["id"] for e in events] == [0, 1, 2]
+    assert [e["type"] for e in events] == ["progress", "progress", "finished"]
+    assert events[1]["done"] == 1
+    assert events[1]["total"] == 2
+    assert events[1]["item"] == {"student_id": "foo"}
+    assert events[1]["elapsed"] >= 0
+    assert events[2]["status"] == "success"
+    assert events[2]["result"] == {"success": True}
+    assert job.events(2) == events[2:]
+
+
+def test_log_handler(jobs):
+    log = logging.getLogger("nbgrader-test-jobs")
+    log.setLevel(logging.INFO)
+
+    def action(job):
+        handler = JobLogHandler(job)
+        log.addHandler(handler)
+        try:
+            log.info("from the job")
+            # messages logged by other threads are not part of the job
+            thread = threading.Thread(target=log.info, args=("from another thread",))
+            thread.start()
+            thread.join()
+        finally:
+            log.removeHandler(handler)
+        return {"success": True}
+
+    job = jobs.submit("autograde", action)
+    job.future.result(timeout=10)
+    logs = [e for e in job.events() if e["type"] == "log"]
+    assert [(e["level"], e["message"]) for e in logs] == [("INFO", "[INFO] from the job")]
@@ -0,0 +1,106 @@
+import os
+import json
+import threading
+
+from .. import tracing
+
+
+def test_span_disabled():
+    assert tracing.get_tracer() is None
+    with tracing.span("foo", "phase"):
+        pass
+    assert tracing.get_tracer() is None
+
+
+def test_span_enabled():
+    tracer = tracing.start_tracing()
+    try:
+        with tracing.span("foo", "phase", notebook="p1"):
+            with tracing.span("bar", "phase"):
+                pass
+    finally:
+        assert tracing.stop_tracing() is tracer
+
+    assert [s["name"] for s in tracer.spans] == ["bar", "foo"]
+    assert tracer.spans[1]["args"] == {"notebook": "p1"}
+    assert tracer.spans[1]["dur"] >= tracer.spans[0]["dur"]
+    assert tracer.spans[1]["pid"] == os.getpid()
+
+
+def test_tracer_per_thread():
+    tracer = tracing.start_tracing()
+    try:
+        other = []
+
+        def run():
+            # other threads (e.g. formgrader requests) do not share the tracer
+            other.append(tracing.get_tracer())
+            with tracing.span("other", "phase"):
+                pass
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        with tracing.span("foo", "phase"):
+            pass
+    finally:
+        tracing.stop_tracing()
+
+    assert other == [None]
+    assert [s["name"] for s in tracer.spans] == ["foo"]
+
+
+def test_drain_and_extend():
+    tracer = tracing.Tracer()
+    for name in ["a", "b", "c"]:
+        with tracer.span(name, "phase"):
+            pass
+
+    spans = tracer.drain(1)
+    assert [s["name"] for s in spans] == ["b", "c"]
+    assert [s["name"] for s in tracer.spans] == ["a"]
+
+    tracer.extend(spans)
+    assert [s["name"] for s in tracer.spans] == ["a", "b", "c"]
+
+
+def test_summary():
+    tracer = tracing.Tracer()
+    for i in range(1, 101):
+        tracer.spans.append({
+            "name": "execute_cell", "cat": "cell", "ts": 0, "dur": i / 100.0,
+            "pid": 1, "tid": 1, "args": {}})
+    tracer.spans.append({
+        "name": "write", "cat": "notebook", "ts": 0, "dur": 0.5,
+        "pid": 1, "tid": 1, "args": {}})
+
+    summary = tracer.summary()
+    assert [(x["cat"], x["name"]) for x in summary] == [("cell", "execute_cell"), ("notebook", "write")]
+    assert summary[0]["count"] == 100
+    assert summary[0]["p50"] == 0.5
+    assert summary[0]["p95"] == 0.95
+    assert summary[0]["max"] == 1.0
+    assert summary[1]["p95"] == 0.5
+    assert "execute_cell" in tracer.format_summary()
+
+
+def test_write(tmpdir):
+    tracer = tracing.Tracer()
+    with tracer.span("foo", "phase", notebook="p1"):
+        pass
+
+    path = str(tmpdir.join("trace.json"))
+    tracer.write(path)
+    with open(path, "r") as fh:
+        events = json.load(fh)["traceEvents"]
+    assert len(events) == 1
+    assert events[0]["ph"] == "X"
+    assert events[0]["name"] == "foo"
+    assert events[0]["args"] == {"notebook": "p1"}
+
+    path = str(tmpdir.join("trace.jsonl"))
+    tracer.write(path)
+    with open(path, "r") as fh:
+        lines = fh.readlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["name"] == "foo"
@@ -1,8 +1,10 @@
 # coding: utf-8
 
+import logging
 import os
 import pytest
 import tempfile
+import threading
 import shutil
 import zipfile
 
@@ -322,6 +324,38 @@ def test_compute_checksum_utf8():
     utils.compute_checksum(create_solution_cell("\u03b8", "markdown", "foo"))
     utils.compute_checksum(create_solution_cell(u'$$\\int^\u221e_0 x^2dx$$', "markdown", "foo"))
 
+def test_file_cache(temp_cwd):
+    calls = []
+
+    def compute(path):
+        calls.append(path)
+        with open(path, 'r') as fh:
+            return fh.read()
+
+    cache = utils.FileCache(compute, max_size=2)
+    with open("foo.txt", "w") as fh:
+        fh.write("foo")
+    assert cache("foo.txt") == "foo"
+    assert cache("foo.txt") == "foo"
+    assert calls == ["foo.txt"]
+
+    # a changed file is read again
+    with open("foo.txt", "w") as fh:
+        fh.write("foobar")
+    assert cache("foo.txt") == "foobar"
+    assert calls == ["foo.txt", "foo.txt"]
+
+    # the cache is cleared when it is full
+    for name in ("bar.txt", "baz.txt"):
+        with open(name, "w") as fh:
+            fh.write(name)
+        cache(name)
+    assert len(cache._cache) == 1
+
+    with pytest.raises(FileNotFoundError):
+        cache("missing.txt")
+
+
 def test_ignore_patterns(temp_cwd):
     dir = "foo"
     os.mkdir(dir)
@@ -444,3 +478,20 @@ def test_get_username():
     assert utils.get_username() == os.environ["USER"]
     # Can't test get_username's support for JUPYTERHUB_USER, as
     # this would require actually running the tests as 'jovyan'.
+
+
+def test_capture_log_thread():
+    class App(object):
+        log = logging.getLogger("nbgrader-test-capture-log")
+
+        def start(self):
+            self.log.warning("from the app")
+            # messages logged by other threads are not captured
+            thread = threading.Thread(target=self.log.warning, args=("from another thread",))
+            thread.start()
+            thread.join()
+
+    result = utils.capture_log(App())
+    assert result["success"]
+    assert "from the app" in result["log"]
+    assert "from another thread" not in result["log"]
@@ -0,0 +1,170 @@
+"""Lightweight instrumentation of the conversion pipeline.
+
+Code that wants to be profiled wraps its phases in :func:`span`, which does
+nothing unless a :class:`Tracer` was activated with :func:`start_tracing`
+(e.g. by ``BaseConverter.profile``). The recorded spans can be written as a
+Chrome trace (viewable in ``chrome://tracing`` or https://ui.perfetto.dev) or
+as JSON lines, and summarized per phase.
+
+The active tracer is a context variable, so that the spans of concurrent
+conversions (e.g. of formgrader requests running in different threads) are
+not mixed up.
+
+"""
+
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class Tracer(object):
+    """A recorder of timed spans."""
+
+    def __init__(self) -> None:
+        self.spans: List[Dict[str, Any]] = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **args: Any) -> Iterator[None]:
+        """Record the time spent in a block of code."""
+        ts = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append({
+                "name": name,
+                "cat": category,
+                "ts": ts,
+                "dur": time.perf_counter() - start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args
+            })
+
+    def drain(self, start: int = 0) -> List[Dict[str, Any]]:
+        """Remove and return the spans recorded since the ``start``-th one."""
+        spans = self.spans[start:]
+        del self.spans[start:]
+        return spans
+
+    def extend(self, spans: List[Dict[str, Any]]) -> None:
+        """Add spans recorded by another tracer (e.g. of a worker process)."""
+        self.spans.extend(spans)
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Write the spans in the Chrome trace event format."""
+        events = []
+        for s in self.spans:
+            events.append({
+                "name": s["name"],
+                "cat": s["cat"],
+                "ph": "X",
+                "ts": int(s["ts"] * 1e6),
+                "dur": int(s["dur"] * 1e6),
+                "pid": s["pid"],
+                "tid": s["tid"],
+                "args": s["args"]
+            })
+        with open(path, "w") as fh:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, fh)
+
+    def write_jsonl(self, path: str) -> None:
+        """Write the spans as JSON lines, one span per line."""
+        with open(path, "w") as fh:
+            for s in self.spans:
+                fh.write(json.dumps(s, default=str) + "\n")
+
+    def write(self, path: str) -> None:
+        """Write the spans to a file, as JSON lines if its extension is
+        ``.jsonl`` and as a Chrome trace otherwise."""
+        if path.endswith(".jsonl"):
+            self.write_jsonl(path)
+        else:
+            self.write_chrome_trace(path)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Summarize the durations of the spans of each phase.
+
+        Returns
+        -------
+        summary:
+            A list of dictionaries with the keys ``cat``, ``name``,
+            ``count``, ``total``, ``p50``, ``p95`` and ``max`` (in seconds),
+            sorted by decreasing total time
+
+        """
+        durations: Dict[Any, List[float]] = {}
+        for s in self.spans:
+            durations.setdefault((s["cat"], s["name"]), []).append(s["dur"])
+
+        summary = []
+        for (category, name), values in durations.items():
+            values.sort()
+            summary.append({
+                "cat": category,
+                "name": name,
+                "count": len(values),
+                "total": sum(values),
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "max": values[-1]
+            })
+        summary.sort(key=lambda x: x["total"], reverse=True)
+        return summary
+
+    def format_summary(self) -> str:
+        """Format the summary of the spans as a table."""
+        lines = ["{:<12} {:<32} {:>7} {:>10} {:>9} {:>9} {:>9}".format(
+            "category", "phase", "count", "total (s)", "p50 (s)", "p95 (s)", "max (s)")]
+        for row in self.summary():
+            lines.append("{:<12} {:<32} {:>7d} {:>10.3f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+                row["cat"], row["name"], row["count"], row["total"],
+                row["p50"], row["p95"], row["max"]))
+        return "\n".join(lines)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    # nearest-rank percentile of sorted values
+    index = max(int(math.ceil(percent / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+# the active tracer of the current context (e.g. thread), if any
+_tracer: "ContextVar[Optional[Tracer]]" = ContextVar("nbgrader_tracer", default=None)
+
+
+def start_tracing() -> Tracer:
+    """Activate (and return) a new tracer for the current context."""
+    tracer = Tracer()
+    _tracer.set(tracer)
+    return tracer
+
+
+def stop_tracing() -> Optional[Tracer]:
+    """Deactivate the tracer of the current context and return it."""
+    tracer = _tracer.get()
+    _tracer.set(None)
+    return tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Get the active tracer of the current context, or None if tracing is
+    off."""
+    return _tracer.get()
+
+
+@contextlib.contextmanager
+def span(name: str, category: str, **args: Any) -> Iterator[None]:
+    """Record the time spent in a block of code, if tracing is on."""
+    tracer = _tracer.get()
+    if tracer is None:
+        yield
+    else:
+        with tracer.span(name, category, **args):
+            yield
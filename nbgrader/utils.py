@@ -7,6 +7,7 @@ import sys
 import shutil
 import stat
 import logging
+import threading
 import traceback
 import contextlib
 import fnmatch
@@ -19,7 +20,7 @@ from dateutil.tz import gettz
 from datetime import datetime
 from nbformat.notebooknode import NotebookNode
 from logging import Logger
-from typing import Optional, Tuple, Union, List, Iterator, Any
+from typing import Optional, Tuple, Union, List, Iterator, Any, Callable, Dict
 
 # pwd is for unix passwords only, so we shouldn't import it on
 # windows machines
@@ -187,6 +188,46 @@ def compute_checksum(cell: NotebookNode) -> str:
     return m.hexdigest()
 
 
+def compute_file_hash(path: str) -> str:
+    """Compute the SHA-256 hash of the contents of a file."""
+    m = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(65536), b''):
+            m.update(chunk)
+    return m.hexdigest()
+
+
+class FileCache:
+    """Cache a value computed from a file, keyed by the path of the file.
+
+    The value is computed again if the modification time or the size of the
+    file changed since it was cached. The cache is simply cleared when it
+    holds ``max_size`` entries. Raises the errors of :func:`os.stat` (e.g.
+    FileNotFoundError) if the file does not exist.
+    """
+
+    def __init__(self, compute: Callable[[str], Any], max_size: int = 100000) -> None:
+        self.compute = compute
+        self.max_size = max_size
+        self._cache: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+
+    def __call__(self, path: str) -> Any:
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        value = self.compute(path)
+        if len(self._cache) >= self.max_size:
+            self._cache.clear()
+        self._cache[path] = (key, value)
+        return value
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
 def parse_utc(ts: Union[datetime, str]) -> datetime:
     """Parses a timestamp into datetime format, converting it to UTC if necessary."""
     if ts is None:
@@ -514,7 +555,9 @@ def temp_attrs(app, **newvals):
 def capture_log(app, fmt="[%(levelname)s] %(message)s"):
     """Adds an extra handler to the given application the logs to a string
     buffer, calls ``app.start()``, and returns the log output. The extra
-    handler is removed from the application before returning.
+    handler is removed from the application before returning. Only the
+    messages logged by the calling thread are captured, since the logger may
+    be shared with other threads (e.g. by the formgrader).
 
     Arguments
     ---------
@@ -536,6 +579,8 @@ def capture_log(app, fmt="[%(levelname)s] %(message)s"):
     handler = logging.StreamHandler(log_buff)
     formatter = LogFormatter(fmt="[%(levelname)s] %(message)s")
     handler.setFormatter(formatter)
+    thread = threading.get_ident()
+    handler.addFilter(lambda record: record.thread == thread)
     app.log.addHandler(handler)
 
     try:
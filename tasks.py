@@ -109,6 +109,10 @@ def tests(ns, args):
         raise ValueError("Invalid test group: {}".format(ns.group))
 
 
+def benchmarks(ns, args):
+    run('python -m nbgrader.tests.benchmarks {}'.format(' '.join(args)))
+
+
 def aftersuccess(ns, args):
     if ns.group in ('python'):
         run('codecov')
@@ -154,6 +158,10 @@ if __name__ == '__main__':
     tests_parser.add_argument('--junitxml', type=str, default=None)
     tests_parser.set_defaults(func=tests)
 
+    # benchmarks
+    benchmarks_parser = subparsers.add_parser('benchmarks')
+    benchmarks_parser.set_defaults(func=benchmarks)
+
     # aftersuccess
     aftersuccess_parser = subparsers.add_parser('aftersuccess')
     aftersuccess_parser.add_argument('--group', type=str, required=True)